@@ -0,0 +1,405 @@
+# cdcl.py
+# -------
+# Licensing Information:
+# Please DO NOT DISTRIBUTE OR PUBLISH solutions to this project.
+# You are free to use and extend these projects for EDUCATIONAL PURPOSES ONLY.
+# The Hunt The Wumpus AI project was developed at University of Arizona
+# by Clay Morrison (clayton@sista.arizona.edu), spring 2013.
+# This project extends the python code provided by Peter Norvig as part of
+# the Artificial Intelligence: A Modern Approach (AIMA) book example code;
+# see http://aima.cs.berkeley.edu/code.html
+# In particular, the following files come directly from the AIMA python
+# code: ['agents.py', 'logic.py', 'search.py', 'utils.py']
+# ('logic.py' has been modified by Clay Morrison in locations with the
+# comment 'CTM')
+# The file ['minisat.py'] implements a slim system call wrapper to the minisat
+# (see http://minisat.se) SAT solver, and is directly based on the satispy
+# python project, see https://github.com/netom/satispy .
+
+"""An in-process, incremental conflict-driven clause-learning SAT solver.
+
+The solver talks DIMACS-style integer literals (v or -v for v >= 1), so it
+can be fed directly from AIMA_to_Dimacs_Translator.  Unlike the external
+minisat binary it is long-lived: clauses can be added between calls to
+solve(), and every clause learned from a conflict is kept, so work done
+answering one query carries over to the next.
+
+Search follows MiniSat: two-watched-literal propagation, first-UIP clause
+learning, VSIDS branching with phase saving, Luby restarts, and periodic
+reduction of the learned clause database.
+
+    >>> s = Solver()
+    >>> s.add_clause([1, 2])
+    True
+    >>> s.solve([-1])
+    True
+    >>> s.model_value(2)
+    True
+    >>> s.add_clause([-2])
+    True
+    >>> s.solve([-1])
+    False
+    >>> s.solve()
+    True
+"""
+
+import heapq
+
+
+class Learnt(list):
+    "A learned clause; carries an activity used to decide which to forget."
+    __slots__ = ('activity',)
+
+
+def luby(y, i):
+    "The i-th term of the Luby sequence scaled by powers of y, as in MiniSat."
+    size, seq = 1, 0
+    while size < i + 1:
+        seq += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        seq -= 1
+        i = i % size
+    return y ** seq
+
+
+class Solver(object):
+
+    var_decay = 0.95
+    clause_decay = 0.999
+    restart_first = 100     # conflicts before the first restart
+    restart_inc = 2         # Luby base
+    learntsize_factor = 1.0 / 3   # initial learned clause limit / problem clauses
+    learntsize_inc = 1.1    # growth of that limit at each reduction
+
+    def __init__(self):
+        self.num_vars = 0
+        self.ok = True          # False once the clauses are UNSAT on their own
+        self.clauses = []       # problem clauses (lists of internal literals)
+        self.learnts = []       # learned clauses
+        # Internal literals: variable v is 2*v (positive) and 2*v+1 (negative),
+        # so the complement of literal p is p ^ 1.
+        self.watches = [[], []]
+        self.vals = [None, None]  # per internal literal: True, False or None
+        self.level = [0]
+        self.reason = [None]
+        self.polarity = [False]   # saved phase per variable
+        self.activity = [0.0]     # VSIDS score per variable
+        self.var_inc = 1.0
+        self.clause_inc = 1.0
+        self.order_heap = []      # (-activity, var); may hold stale entries
+        self.max_learnts = None
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.model = None
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        self.restarts = 0
+        self.reductions = 0
+
+    #---------------------------------------------------------------------------
+    # Variables and clauses
+
+    def new_var(self):
+        self.num_vars += 1
+        self.watches.extend(([], []))
+        self.vals.extend((None, None))
+        self.level.append(0)
+        self.reason.append(None)
+        self.polarity.append(False)
+        self.activity.append(0.0)
+        heapq.heappush(self.order_heap, (0.0, self.num_vars))
+        return self.num_vars
+
+    def ensure_vars(self, n):
+        while self.num_vars < n:
+            self.new_var()
+
+    def _internal(self, lit):
+        v = abs(lit)
+        if v > self.num_vars:
+            self.ensure_vars(v)
+        return 2 * v + (lit < 0)
+
+    def add_clause(self, lits):
+        """Add a clause of DIMACS literals.  May be called between solves.
+        Returns False if the clause set has become unsatisfiable."""
+        if not self.ok:
+            return False
+        self._cancel_until(0)
+        vals = self.vals
+        clause = []
+        for lit in lits:
+            p = self._internal(lit)
+            if vals[p] is True or (p ^ 1) in clause:
+                return True     # satisfied at the top level, or a tautology
+            if vals[p] is None and p not in clause:
+                clause.append(p)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self._enqueue(clause[0], None)
+            self.ok = self._propagate() is None
+        else:
+            self.clauses.append(clause)
+            self._attach(clause)
+        return self.ok
+
+    def _attach(self, clause):
+        self.watches[clause[0] ^ 1].append(clause)
+        self.watches[clause[1] ^ 1].append(clause)
+
+    #---------------------------------------------------------------------------
+    # Assignment trail
+
+    def _enqueue(self, p, reason):
+        self.vals[p] = True
+        self.vals[p ^ 1] = False
+        v = p >> 1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(p)
+
+    def _cancel_until(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        vals, polarity, reason = self.vals, self.polarity, self.reason
+        activity, heap = self.activity, self.order_heap
+        start = self.trail_lim[level]
+        for p in self.trail[start:]:
+            v = p >> 1
+            vals[p] = vals[p ^ 1] = None
+            reason[v] = None
+            polarity[v] = bool(p & 1)
+            heapq.heappush(heap, (-activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = start
+
+    def _propagate(self):
+        """Two-watched-literal unit propagation.  Watch lists are indexed by
+        the literal whose becoming True forces a look at the clause, and each
+        clause keeps its two watched literals in positions 0 and 1.
+        Returns a conflicting clause, or None."""
+        vals, watches, trail = self.vals, self.watches, self.trail
+        while self.qhead < len(trail):
+            p = trail[self.qhead]
+            self.qhead += 1
+            false_lit = p ^ 1
+            ws = watches[p]
+            watches[p] = kept = []
+            self.propagations += 1
+            i, n = 0, len(ws)
+            while i < n:
+                c = ws[i]
+                i += 1
+                if c[0] == false_lit:
+                    c[0], c[1] = c[1], false_lit
+                first = c[0]
+                if vals[first] is True:
+                    kept.append(c)
+                    continue
+                for k in xrange(2, len(c)):
+                    if vals[c[k]] is not False:
+                        c[1], c[k] = c[k], false_lit
+                        watches[c[1] ^ 1].append(c)
+                        break
+                else:
+                    kept.append(c)
+                    if vals[first] is False:
+                        kept.extend(ws[i:])
+                        self.qhead = len(trail)
+                        return c
+                    self._enqueue(first, c)
+        return None
+
+    #---------------------------------------------------------------------------
+    # Conflict analysis
+
+    def _analyze(self, confl):
+        """First-UIP learning.  Returns (learnt clause, backtrack level); the
+        asserting literal is learnt[0]."""
+        seen = {}
+        level, reason, trail = self.level, self.reason, self.trail
+        current = len(self.trail_lim)
+        learnt = [None]
+        counter = 0
+        p = None
+        index = len(trail) - 1
+        while True:
+            if type(confl) is Learnt:
+                self._bump_clause(confl)
+            for q in (confl if p is None else confl[1:]):
+                v = q >> 1
+                if v not in seen and level[v] > 0:
+                    seen[v] = True
+                    self._bump_var(v)
+                    if level[v] >= current:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while (trail[index] >> 1) not in seen:
+                index -= 1
+            p = trail[index]
+            index -= 1
+            confl = reason[p >> 1]
+            counter -= 1
+            if counter == 0:
+                break
+        learnt[0] = p ^ 1
+        if len(learnt) == 1:
+            return learnt, 0
+        # the second watch must be the literal assigned at the highest level
+        best = 1
+        for k in xrange(2, len(learnt)):
+            if level[learnt[k] >> 1] > level[learnt[best] >> 1]:
+                best = k
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, level[learnt[1] >> 1]
+
+    #---------------------------------------------------------------------------
+    # VSIDS
+
+    def _bump_var(self, v):
+        activity = self.activity
+        activity[v] += self.var_inc
+        if activity[v] > 1e100:
+            for u in xrange(1, self.num_vars + 1):
+                activity[u] *= 1e-100
+            self.var_inc *= 1e-100
+            self._rebuild_order_heap()
+        elif self.vals[2 * v] is None:
+            heapq.heappush(self.order_heap, (-activity[v], v))
+
+    def _bump_clause(self, c):
+        c.activity += self.clause_inc
+        if c.activity > 1e20:
+            for learnt in self.learnts:
+                learnt.activity *= 1e-20
+            self.clause_inc *= 1e-20
+
+    def _decay_activities(self):
+        self.var_inc /= self.var_decay
+        self.clause_inc /= self.clause_decay
+
+    def _rebuild_order_heap(self):
+        vals, activity = self.vals, self.activity
+        self.order_heap = [(-activity[v], v) for v in xrange(1, self.num_vars + 1)
+                           if vals[2 * v] is None]
+        heapq.heapify(self.order_heap)
+
+    def _pick_branch_literal(self):
+        vals, heap = self.vals, self.order_heap
+        if len(heap) > 4 * self.num_vars + 100:
+            self._rebuild_order_heap()
+            heap = self.order_heap
+        while heap:
+            v = heapq.heappop(heap)[1]
+            if vals[2 * v] is None:
+                return 2 * v + self.polarity[v]
+        return None
+
+    #---------------------------------------------------------------------------
+    # Learned clause database
+
+    def _reduce_db(self):
+        """Forget the less active half of the learned clauses (binary clauses
+        are always kept).  Only called at decision level 0, where no learned
+        clause can be the reason for a literal that analysis will look at."""
+        self.learnts.sort(key=lambda c: c.activity)
+        half = len(self.learnts) // 2
+        keep, forget = [], set()
+        for k, c in enumerate(self.learnts):
+            if k < half and len(c) > 2:
+                forget.add(id(c))
+            else:
+                keep.append(c)
+        self.learnts = keep
+        reason = self.reason
+        for p in self.trail:
+            if id(reason[p >> 1]) in forget:
+                reason[p >> 1] = None
+        self.watches = [[c for c in ws if id(c) not in forget] for ws in self.watches]
+        self.reductions += 1
+
+    #---------------------------------------------------------------------------
+    # Search
+
+    def solve(self, assumptions=()):
+        """Search for a model of the clauses in which every literal in
+        <assumptions> is True.  Assumptions only hold for this call, but any
+        clauses learned while answering it are kept for later calls.
+        On success the model is available through model_value()."""
+        self.model = None
+        if not self.ok:
+            return False
+        assumptions = [self._internal(a) for a in assumptions]
+        self._cancel_until(0)
+        if self._propagate() is not None:
+            self.ok = False
+            return False
+        if self.max_learnts is None:
+            self.max_learnts = max(len(self.clauses) * self.learntsize_factor, 100)
+        vals = self.vals
+        restart_limit = self.restart_first * luby(self.restart_inc, self.restarts)
+        conflicts_since_restart = 0
+        while True:
+            confl = self._propagate()
+            if confl is not None:
+                self.conflicts += 1
+                conflicts_since_restart += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, backtrack_level = self._analyze(confl)
+                self._cancel_until(backtrack_level)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    learnt = Learnt(learnt)
+                    learnt.activity = 0.0
+                    self._bump_clause(learnt)
+                    self.learnts.append(learnt)
+                    self._attach(learnt)
+                    self._enqueue(learnt[0], learnt)
+                self._decay_activities()
+                continue
+            if conflicts_since_restart >= restart_limit:
+                self.restarts += 1
+                self._cancel_until(0)
+                if len(self.learnts) >= self.max_learnts:
+                    self._reduce_db()
+                    self.max_learnts *= self.learntsize_inc
+                restart_limit = self.restart_first * luby(self.restart_inc, self.restarts)
+                conflicts_since_restart = 0
+                continue
+            next_lit = None
+            while len(self.trail_lim) < len(assumptions):
+                p = assumptions[len(self.trail_lim)]
+                if vals[p] is True:
+                    self.trail_lim.append(len(self.trail)) # dummy decision level
+                elif vals[p] is False:
+                    self._cancel_until(0)
+                    return False
+                else:
+                    next_lit = p
+                    break
+            if next_lit is None:
+                next_lit = self._pick_branch_literal()
+                if next_lit is None:
+                    self.model = [vals[2 * v] for v in xrange(self.num_vars + 1)]
+                    self._cancel_until(0)
+                    return True
+                self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self._enqueue(next_lit, None)
+
+    def model_value(self, lit):
+        """Value of DIMACS literal <lit> in the last model found."""
+        if self.model is None or abs(lit) >= len(self.model):
+            return None
+        value = self.model[abs(lit)]
+        return value if lit > 0 else not value
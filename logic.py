@@ -42,7 +42,8 @@ And a few other functions:
     diff, simp       Symbolic differentiation and simplification
 """
 
-import itertools, re
+import itertools, re, weakref
+from collections import OrderedDict
 import agents
 from utils import *
 
@@ -131,7 +132,7 @@ def KB_AgentProgram(KB):
 
 #______________________________________________________________________________
 
-class Expr:
+class Expr(object):
     """A symbolic mathematical expression.  We use this class for logical
     expressions, and for terms within logical expressions. In general, an
     Expr has an op (operator) and a list of args.  The op can be:
@@ -175,13 +176,38 @@ class Expr:
     1 doesn't know how to add an Expr.  (Adding an __radd__ method to Expr
     wouldn't help, because int.__add__ is still called first.) Therefore,
     you should use Expr(1) + x instead, or ONE + x, or expr('1 + x').
+
+    Atoms (symbols or numbers with no args, such as Expr('P')) are
+    interned: while an atom is in use there is one object for it, and
+    Expr('P') or expr('P') returns that same object, so equality of atoms
+    is identity.
+    The hash of an Expr is computed once and kept; Exprs must therefore
+    not be changed after construction.
     """
 
+    def __new__(cls, op, *args):
+        if args or cls is not Expr:
+            return object.__new__(cls)
+        op = num_or_str(op)
+        if not (is_symbol(op) or isnumber(op)):
+            return object.__new__(cls)
+        key = (op.__class__, op)
+        atom = interned_atoms.get(key)
+        if atom is None:
+            atom = interned_atoms[key] = object.__new__(cls)
+        return atom
+
     def __init__(self, op, *args):
         "Op is a string or number; args are Exprs (or are coerced to Exprs)."
+        if not args and 'op' in self.__dict__:
+            return  # an interned atom, already initialized
         assert isinstance(op, str) or (isnumber(op) and not args)
         self.op = num_or_str(op)
         self.args = map(expr, args) ## Coerce args to Exprs
+        self.hashval = None
+
+    def __getnewargs__(self):
+        return (self.op,) + tuple(self.args)
 
     def __call__(self, *args):
         """Self must be a symbol with no args, such as Expr('F').  Create a new
@@ -210,7 +236,9 @@ class Expr:
 
     def __hash__(self):
         "Need a hash method so Exprs can live in dicts."
-        return hash(self.op) ^ hash(tuple(self.args))
+        if self.hashval is None:
+            self.hashval = hash(self.op) ^ hash(tuple(self.args))
+        return self.hashval
 
     # See http://www.python.org/doc/current/lib/module-operator.html
     # Not implemented: not, abs, pos, concat, contains, *item, *slice
@@ -233,6 +261,10 @@ class Expr:
     def __xor__(self, other):    return Expr('^',  self, other)
     def __mod__(self, other):    return Expr('<=>',  self, other)
 
+# The interned atoms (see Expr), by (type of op, op); held weakly, so that
+# the atoms no KB uses any more (those of the KBs replaced by compaction, or
+# the Aux symbols of dropped clauses) are freed rather than kept forever
+interned_atoms = weakref.WeakValueDictionary()
 
 
 def expr(s):
@@ -249,16 +281,134 @@ def expr(s):
     (P <=> Q(1))
     >>> expr('P & Q | ~R(x, F(x))')
     ((P & Q) | ~R(x, F(x)))
+    >>> expr('A & B <=> C ==> D')
+    (A & ((B <=> C) >> D))
     """
     if isinstance(s, Expr): return s
     if isnumber(s): return Expr(s)
-    ## Replace the alternative spellings of operators with canonical spellings
-    s = s.replace('==>', '>>').replace('<==', '<<')
-    s = s.replace('<=>', '%').replace('=/=', '^')
-    ## Replace a symbol or number, such as 'P' with 'Expr("P")'
-    s = re.sub(r'([a-zA-Z0-9_.]+)', r'Expr("\1")', s)
-    ## Now eval the string.  (A security hole; do not use with an adversary.)
-    return eval(s, {'Expr':Expr})
+    # The string is parsed by ExprParser rather than rewritten to Python
+    # and eval'ed; the most recently parsed strings are cached (Exprs are
+    # not changed after construction, so they can be shared)
+    e = expr_cache.pop(s, None)
+    if e is None:
+        e = ExprParser(s).parse()
+        if len(expr_cache) >= expr_cache_size:
+            expr_cache.popitem(last=False)
+    expr_cache[s] = e
+    return e
+
+# LRU cache of expr, from source string to Expr
+expr_cache = OrderedDict()
+expr_cache_size = 4096
+
+# A symbol or number (the same runs of characters that expr used to
+# wrap in Expr("...") before eval), or an operator or punctuation
+expr_token = re.compile(r'\s*(?:([a-zA-Z0-9_.]+)|(\*\*|<<|>>|<=|>=|[-+~%&|^*/<>(),]))')
+
+class ExprParser(object):
+    """Precedence-climbing parser for expr.  It builds the same Exprs
+    that evaluating the string as Python with overloaded Expr operators
+    did, including Python's operator precedence, in which % (<=>) binds
+    tighter than & and |, and >> (==>) tighter than & but looser than +."""
+
+    # binary operator token -> (precedence, Expr op)
+    binary_ops = {'|': (1, '|'), '^': (2, '^'), '&': (3, '&'),
+                  '<<': (4, '<<'), '>>': (4, '>>'), '+': (5, '+'), '-': (5, '-'),
+                  '*': (6, '*'), '/': (6, '/'), '%': (6, '<=>')}
+    comparison_ops = ('<', '>', '<=', '>=')
+
+    def __init__(self, s):
+        self.source = s
+        ## Replace the alternative spellings of operators with canonical spellings
+        s = s.replace('==>', '>>').replace('<==', '<<')
+        s = s.replace('<=>', '%').replace('=/=', '^')
+        # tokens are strings; an atom never has the same text as an operator
+        self.tokens = []
+        self.atoms = set()
+        pos, end = 0, len(s.rstrip())
+        while pos < end:
+            m = expr_token.match(s, pos)
+            if not m:
+                self.error('unexpected character %r' % s[pos:].lstrip()[:1])
+            atom, op = m.groups()
+            if atom:
+                self.tokens.append(atom)
+                self.atoms.add(atom)
+            else:
+                self.tokens.append(op)
+            pos = m.end()
+        self.tokens.append(None) # end of input
+        self.pos = 0
+
+    def error(self, message):
+        raise Exception("Syntax error in expr(%r): %s" % (self.source, message))
+
+    def take(self, token):
+        if self.tokens[self.pos] != token:
+            self.error('expected %r' % token)
+        self.pos += 1
+
+    def parse(self):
+        e = self.parse_comparison()
+        if self.tokens[self.pos] is not None:
+            self.error('unexpected %r' % self.tokens[self.pos])
+        return e
+
+    def parse_comparison(self):
+        """Python chains comparisons: x < y < z is (x < y) and (y < z),
+        which (as Exprs are true) is just (y < z)"""
+        left = self.parse_binary(1)
+        result = left
+        while self.tokens[self.pos] in self.comparison_ops:
+            op = self.tokens[self.pos]
+            self.pos += 1
+            right = self.parse_binary(1)
+            result = Expr(op, left, right)
+            left = right
+        return result
+
+    def parse_binary(self, min_precedence):
+        e = self.parse_unary()
+        tokens, binary_ops = self.tokens, self.binary_ops
+        while True:
+            op = binary_ops.get(tokens[self.pos])
+            if op is None or op[0] < min_precedence:
+                return e
+            self.pos += 1
+            e = Expr(op[1], e, self.parse_binary(op[0] + 1))
+
+    def parse_unary(self):
+        token = self.tokens[self.pos]
+        if token == '~' or token == '-':
+            self.pos += 1
+            return Expr(token, self.parse_unary())
+        e = self.parse_call()
+        if self.tokens[self.pos] == '**':
+            self.pos += 1
+            e = Expr('**', e, self.parse_unary()) # right associative
+        return e
+
+    def parse_call(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        if token in self.atoms:
+            e = Expr(token)
+        elif token == '(':
+            e = self.parse_comparison()
+            self.take(')')
+        else:
+            self.error('unexpected %s' % ('end of input' if token is None else repr(token)))
+        while self.tokens[self.pos] == '(':
+            self.pos += 1
+            args = []
+            if self.tokens[self.pos] != ')':
+                args.append(self.parse_comparison())
+                while self.tokens[self.pos] == ',':
+                    self.pos += 1
+                    args.append(self.parse_comparison())
+            self.take(')')
+            e = e(*args)
+        return e
 
 def is_symbol(s):
     "A string s is a symbol if it starts with an alphabetic char."
@@ -422,7 +572,7 @@ def pl_true(exp, model={}):
 
 ## Convert to Conjunctive Normal Form (CNF)
 
-def to_cnf(s):
+def to_cnf(s, definitional=False):
     """Convert a propositional logical sentence s to conjunctive normal form.
     That is, to the form ((A | ~B | ...) & (B | C | ...) & ...) [p. 253]
     >>> to_cnf("~(B|C)")
@@ -435,8 +585,12 @@ def to_cnf(s):
     (A & (D | B) & (E | B))
     >>> to_cnf("A | (B | (C | (D & E)))")
     ((D | A | B | C) & (E | A | B | C))
+
+    With definitional=True, the (equisatisfiable) definitional CNF
+    of s is returned instead; see definitional_cnf.
     """
     if isinstance(s, str): s = expr(s)
+    if definitional: return definitional_cnf(s)
     s = eliminate_implications(s) # Steps 1, 2 from p. 253
     s = move_not_inwards(s) # Step 3
     return distribute_and_over_or(s) # Step 4
@@ -512,6 +666,116 @@ def distribute_and_over_or(s):
     else:
         return s
 
+# Definitional CNF
+
+aux_symbol_prefix = 'Aux_'
+aux_symbol_count = itertools.count(1)
+
+def new_aux_symbol():
+    "A fresh auxiliary symbol, for definitional_cnf"
+    return Expr(aux_symbol_prefix + str(next(aux_symbol_count)))
+
+def is_aux_symbol(s):
+    """Is Expr s an auxiliary symbol?  These are introduced by CNF
+    encodings to stand for subformulas, and are named Aux_..."""
+    return isinstance(s.op, str) and s.op.startswith(aux_symbol_prefix)
+
+def definitional_cnf(s):
+    """Convert s to CNF with auxiliary symbols (Plaisted-Greenbaum),
+    so that the number of clauses is linear in the size of s, where
+    distribute_and_over_or can be exponential.  Every non-literal
+    subformula below the top-level clauses is replaced by a new symbol
+    (see new_aux_symbol), which is defined by clauses only in the
+    direction(s) in which the subformula occurs: positively, negatively
+    or both (under <=> and ^).  Equal subformulas share one symbol.
+    The result is not equivalent to s, but every model of it is a model
+    of s, and every model of s extends to one of it.
+    >>> len(conjuncts(to_cnf('(A & B) | (C & D) | (E & F) | (G & H)')))
+    16
+    >>> len(conjuncts(definitional_cnf(expr('(A & B) | (C & D) | (E & F) | (G & H)'))))
+    9
+    """
+    clauses = []
+    defined = {} # subformula -> [symbol, defined positively, defined negatively]
+
+    def negate(literal):
+        if literal.op == '~': return literal.args[0]
+        return ~literal
+
+    def literal(e, positive, negative):
+        "A literal standing for e, defined in the polarities asked for"
+        if e.op == '~':
+            return negate(literal(e.args[0], negative, positive))
+        if is_symbol(e.op) or not e.args:
+            return e
+        entry = defined.get(e)
+        if entry is None:
+            entry = defined[e] = [new_aux_symbol(), False, False]
+        positive, negative = positive and not entry[1], negative and not entry[2]
+        entry[1] |= positive
+        entry[2] |= negative
+        if positive or negative:
+            define(entry[0], e, positive, negative)
+        return entry[0]
+
+    def define(x, e, positive, negative):
+        "Add the clauses for literal x >> e (if positive) and e >> x (if negative)"
+        op, args = e.op, e.args
+        if op == '~':
+            return define(negate(x), args[0], negative, positive)
+        if op == '>>':
+            op, args = '|', [~args[0], args[1]]
+        elif op == '<<':
+            op, args = '|', [args[0], ~args[1]]
+        if op == '&':
+            args = dissociate('&', args)
+            if positive:
+                clauses.extend([negate(x), literal(a, True, False)] for a in args)
+            if negative:
+                clauses.append([x] + [negate(literal(a, False, True)) for a in args])
+        elif op == '|':
+            args = dissociate('|', args)
+            if positive:
+                clauses.append([negate(x)] + [literal(a, True, False) for a in args])
+            if negative:
+                clauses.extend([x, negate(literal(a, False, True))] for a in args)
+        else:
+            assert op in ('<=>', '^') and len(args) == 2
+            a, b = [literal(arg, True, True) for arg in args]
+            if op == '^': b = negate(b)
+            if positive:
+                clauses.extend([[negate(x), negate(a), b], [negate(x), a, negate(b)]])
+            if negative:
+                clauses.extend([[x, a, b], [x, negate(a), negate(b)]])
+
+    def clause_literals(e):
+        "The literals of a top-level clause for e"
+        if e.op == '|':
+            return [lit for a in e.args for lit in clause_literals(a)]
+        if e.op == '>>':
+            return clause_literals(~e.args[0]) + clause_literals(e.args[1])
+        if e.op == '<<':
+            return clause_literals(e.args[0]) + clause_literals(~e.args[1])
+        return [literal(e, True, False)]
+
+    def is_literal(e):
+        return not e.args or is_symbol(e.op) or (e.op == '~' and is_literal(e.args[0]))
+
+    for c in dissociate('&', [s]):
+        if c.op == '<=>':
+            # a definition already, such as B <=> (P1 | P2): no symbol for it
+            a, b = c.args
+            if is_literal(b) and not is_literal(a):
+                a, b = b, a
+            if is_literal(a) and not is_literal(b):
+                define(literal(a, True, True), b, True, True)
+            else:
+                a, b = literal(a, True, True), literal(b, True, True)
+                clauses.extend([[negate(a), b], [a, negate(b)]])
+        else:
+            clauses.append(clause_literals(c))
+    return associate('&', [associate('|', clause) for clause in clauses])
+
 def associate(op, args):
     """Given an associative op, return an expression with the same
     meaning as Expr(op, *args), but flattened -- that is, with nested
@@ -1161,9 +1425,7 @@ def literal_name(literal):
 
 def clauses_to_conjunct(clause_list):
     """ coerce a list of clauses into a conjunction """
-    conj = Expr('&')
-    conj.args = clause_list
-    return conj
+    return Expr('&', *clause_list)
     #return ' & '.join(map(lambda(i): '{0}'.format(KB.clauses[i]), list))
 
 def prop_symbols_from_KB(kb):
@@ -17,19 +17,260 @@
 # python project, see https://github.com/netom/satispy .
 
 from logic import *
-from subprocess import call
+from subprocess import call, Popen, PIPE
+from array import array
 from tempfile import NamedTemporaryFile
+from threading import Lock
+import os
+import time
+import cdcl
 
 # The following is a fairly direct adaptation of the very nice,
 # slim wrapper to minisat provided by https://github.com/netom/satispy
 # I'm not using satispy directly b/c it implements its own cnf rep.
 # so I'm adapting the aima rep to communication with minisat.
 
+class ClauseStore(object):
+    """
+    Append-only store of clauses of int (Dimacs) literals, kept flat as in
+    a CSR matrix: the literals of clause i are lits[offsets[i]:offsets[i+1]].
+    Indexing or iterating gives each clause as an array('i') of literals.
+    """
+
+    def __init__(self):
+        self.lits = array('i')
+        self.offsets = array('l', [0])
+
+    def append(self, clause):
+        self.lits.extend(clause)
+        self.offsets.append(len(self.lits))
+
+    def extend(self, lits, ends):
+        """ Append the clauses kept flat in <lits>, clause i ending at
+        ends[i] """
+        base = len(self.lits)
+        self.lits.extend(lits)
+        self.offsets.extend(array('l', [base + end for end in ends]))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('clause index out of range')
+        return self.lits[self.offsets[i]:self.offsets[i+1]]
+
+    def __iter__(self):
+        return self.clauses_from(0)
+
+    def clauses_from(self, start):
+        """ Iterate over the clauses from index <start> on """
+        lits, offsets = self.lits, self.offsets
+        for i in xrange(start, len(offsets) - 1):
+            yield lits[offsets[i]:offsets[i+1]]
+
+    def nbytes(self):
+        """ Memory taken by the literals and offsets """
+        return len(self.lits) * self.lits.itemsize + len(self.offsets) * self.offsets.itemsize
+
+
+class ClauseView(object):
+    """
+    Read-only sequence of the clauses encoded by translator <io>, as AIMA
+    cnf clauses (Exprs) decoded on demand, e.g. for printing or saving.
+    """
+
+    def __init__(self, io):
+        self.io = io
+
+    def __len__(self):
+        return len(self.io.int_clauses)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return map(self.io.decode_clause, self.io.int_clauses[i])
+        return self.io.decode_clause(self.io.int_clauses[i])
+
+    def __iter__(self):
+        return (self.io.decode_clause(clause) for clause in self.io.int_clauses)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class ClauseIndex(object):
+    """
+    Index of the int-literal clauses held by a translator, which decides
+    whether a new clause is worth storing.  A clause is dropped if it is
+    a duplicate of a held clause (as a set of literals), a tautology
+    (holds both a literal and its negation), or is subsumed by a held
+    clause (contains all of its literals; for a unit, the literal).
+    Forward subsumption uses one watched literal per held clause: a held
+    clause D that subsumes C has its watched literal in C, so only the
+    clauses watched on the literals of C need to be compared.
+    duplicates, tautologies, subsumed := number of clauses dropped so far
+    """
+
+    def __init__(self):
+        self.keys = set()    # frozensets of literals of the held clauses
+        self.units = set()   # literals of the held unit clauses
+        self.watches = {}    # literal -> keys of the clauses watched on it
+        self.duplicates = 0
+        self.tautologies = 0
+        self.subsumed = 0
+
+    def dropped(self):
+        return self.duplicates + self.tautologies + self.subsumed
+
+    def add(self, clause):
+        """ Index <clause> and return True, or return False if it should
+        be dropped """
+        key = frozenset(clause)
+        if key in self.keys:
+            self.duplicates += 1
+            return False
+        for lit in key:
+            if -lit in key:
+                self.tautologies += 1
+                return False
+        units = self.units
+        watches = self.watches
+        for lit in key:
+            if lit in units:
+                self.subsumed += 1
+                return False
+        for lit in key:
+            for other in watches.get(lit, ()):
+                if other <= key:
+                    self.subsumed += 1
+                    return False
+        self.keys.add(key)
+        if len(key) == 1:
+            units.update(key)
+        elif key:
+            # watch the literal with the fewest watchers, to keep lists short
+            lit = min(key, key=lambda lit: len(watches.get(lit, ())))
+            watches.setdefault(lit, []).append(key)
+        return True
+
+    def __repr__(self):
+        return '<ClauseIndex: {0} held, dropped {1} duplicate, {2} tautological, {3} subsumed>'.format(
+            len(self.keys), self.duplicates, self.tautologies, self.subsumed)
+
+
+class KnownLiterals(object):
+    """
+    The literals made true by the int-literal clauses held by a translator,
+    closed under unit propagation, against which new clauses are simplified:
+    a clause with a known literal is satisfied, so dropped, and the
+    literals whose negation is known are removed from it.  A clause left
+    with one literal makes it known, and propagation follows.
+    Propagation uses two watched literals (the first two) per clause of
+    more than one literal; a clause is visited only when one of its
+    watched literals becomes false.
+    satisfied := number of clauses dropped so far
+    falsified := number of literals removed so far
+    conflict := True once a clause has had all of its literals falsified,
+                i.e. the clauses are unsatisfiable
+    """
+
+    def __init__(self):
+        self.literals = set()
+        self.watches = {}    # literal -> clauses watching it
+        self.satisfied = 0
+        self.falsified = 0
+        self.conflict = False
+
+    def add(self, clause):
+        """ Return <clause> simplified by the known literals (a new list),
+        or None if it is satisfied.  A clause whose literals are all
+        falsified is returned as given, so the solver sees the conflict. """
+        known = self.literals
+        for lit in clause:
+            if lit in known:
+                self.satisfied += 1
+                return None
+        lits = [lit for lit in clause if -lit not in known]
+        self.falsified += len(clause) - len(lits)
+        if not lits:
+            self.conflict = True
+            return list(clause)
+        watched = []
+        for lit in lits:
+            if lit not in watched:
+                watched.append(lit)
+        if len(watched) == 1:
+            self.assign(watched[0])
+        else:
+            self.watches.setdefault(watched[0], []).append(watched)
+            self.watches.setdefault(watched[1], []).append(watched)
+        return lits
+
+    def assign(self, lit):
+        """ Make <lit> known, and everything unit propagation then gives """
+        known = self.literals
+        watches = self.watches
+        queue = [lit]
+        while queue:
+            lit = queue.pop()
+            if lit in known:
+                continue
+            if -lit in known:
+                self.conflict = True
+                continue
+            known.add(lit)
+            false = -lit
+            keep = []
+            for clause in watches.pop(false, ()):
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if clause[0] in known:
+                    keep.append(clause)
+                    continue
+                for i in xrange(2, len(clause)):
+                    if -clause[i] not in known:
+                        clause[1], clause[i] = clause[i], clause[1]
+                        watches.setdefault(clause[1], []).append(clause)
+                        break
+                else:
+                    # all but clause[0] are false
+                    keep.append(clause)
+                    if -clause[0] in known:
+                        self.conflict = True
+                    else:
+                        queue.append(clause[0])
+            if keep:
+                watches.setdefault(false, []).extend(keep)
+
+    def __repr__(self):
+        return '<KnownLiterals: {0} known, {1} clauses satisfied, {2} literals falsified{3}>'.format(
+            len(self.literals), self.satisfied, self.falsified,
+            ', conflict' if self.conflict else '')
+
+
 class AIMA_to_Dimacs_Translator(object):
 
     def __init__(self):
         self.varname_dict = {}
         self.varobj_dict = {}
+        self.num_vars = 0
+        # Incremental encoding (see add_clauses): append-only store of the
+        # clauses as int literals, and list of the Dimacs lines made from them
+        self.int_clauses = ClauseStore()
+        self.dimacs_lines = []
+        # int literal of each literal string seen by add_literal_clauses
+        self.literal_ids = {}
+        # the auxiliary symbols (see logic.is_aux_symbol) numbered so far
+        self.aux_symbols = []
+        # optional ClauseIndex filtering the clauses added (see use_clause_index)
+        self.clause_index = None
+        # optional KnownLiterals simplifying the clauses added
+        # (see use_known_literals)
+        self.known_literals = None
 
     def varname(self, vo):
         return self.varname_dict[vo]
@@ -37,6 +278,150 @@ class AIMA_to_Dimacs_Translator(object):
     def varobj(self, v):
         return self.varobj_dict[v]
 
+    def symbol_id(self, vo):
+        """ Return the (positive int) id of symbol <vo>, allocating the
+        next free id if the symbol is new.  Ids are never renumbered. """
+        v = self.varname_dict.get(vo)
+        if v is None:
+            self.num_vars += 1
+            v = self.num_vars
+            self.varname_dict[vo] = v
+            self.varobj_dict[v] = vo
+            if is_aux_symbol(vo):
+                self.aux_symbols.append(vo)
+        return v
+
+    def encode_literal(self, literal):
+        if literal.op == '~':
+            return -self.symbol_id(literal.args[0])
+        return self.symbol_id(literal)
+
+    def decode_literal(self, lit):
+        return self.varobj_dict[lit] if lit > 0 else ~self.varobj_dict[-lit]
+
+    def decode_clause(self, clause):
+        """ AIMA cnf clause for a clause of int literals """
+        return associate('|', map(self.decode_literal, clause))
+
+    def add_clauses(self, clauses):
+        """
+        Incremental alternative to to_dimacs_string: encode AIMA cnf
+        <clauses> to int literals once, numbering symbols in the order they
+        are first seen, and append them to int_clauses.  A translator that
+        is used this way must not also be used with to_dimacs_string,
+        to_dimacs_clauses or number_variables, which renumber from scratch.
+        Use clause_view() to read the clauses back as AIMA cnf.
+        """
+        for clause in clauses:
+            self.add_int_clause([self.encode_literal(lit) for lit in disjuncts(clause)])
+
+    def add_literal_clauses(self, clauses):
+        """
+        As add_clauses, for clauses given as sequences of literal strings:
+        a symbol name, or '~' followed by one (see the clause generators in
+        wumpus_kb.py).  Each distinct string is turned into a symbol only
+        once, so this skips the Expr work of add_clauses altogether.
+        """
+        ids = self.literal_ids
+        for clause in clauses:
+            lits = []
+            for literal in clause:
+                v = ids.get(literal)
+                if v is None:
+                    v = self.literal_id(literal)
+                lits.append(v)
+            self.add_int_clause(lits)
+
+    def literal_id(self, literal):
+        """ The int literal of literal string <literal> (see
+        add_literal_clauses) """
+        v = self.literal_ids.get(literal)
+        if v is None:
+            if literal[0] == '~':
+                v = -self.symbol_id(Expr(literal[1:]))
+            else:
+                v = self.symbol_id(Expr(literal))
+            self.literal_ids[literal] = v
+        return v
+
+    def add_mapped_clauses(self, lits, ends, names):
+        """
+        Add the clauses of int literals over symbols numbered from 1, kept
+        flat in <lits> with clause i ending at ends[i] (see ClauseStore),
+        where symbol i is named names[i-1]: each number is mapped to the id
+        of the symbol in this translator (see wumpus_kb.ClauseTemplate), so
+        the clauses need no encoding beyond one lookup per symbol.  Without
+        a clause index or known literals to filter them, they are appended
+        to int_clauses in bulk.
+        """
+        literal_id = self.literal_id
+        ids = [literal_id(name) for name in names]
+        # ids[v] for v > 0 and -ids[-v] for v < 0 are both mapping[v]
+        mapping = [0] + ids + [-v for v in reversed(ids)]
+        mapped = array('i', map(mapping.__getitem__, lits))
+        if self.clause_index is None and self.known_literals is None:
+            self.int_clauses.extend(mapped, ends)
+            return
+        start = 0
+        for end in ends:
+            self.add_int_clause(mapped[start:end])
+            start = end
+
+    def add_int_clause(self, lits):
+        """ Append the clause of int literals <lits> to int_clauses, once
+        simplified by the known literals and unless it is dropped by them
+        or by the clause index """
+        if self.known_literals is not None:
+            lits = self.known_literals.add(lits)
+            if lits is None:
+                return
+        if self.clause_index is None or self.clause_index.add(lits):
+            self.int_clauses.append(lits)
+
+    def use_clause_index(self):
+        """
+        From now on, have add_clauses and add_literal_clauses drop the
+        clauses that are duplicates, tautologies or subsumed by clauses
+        already held (see ClauseIndex).  Returns the index.
+        """
+        if self.clause_index is None:
+            index = ClauseIndex()
+            for clause in self.int_clauses:
+                index.add(clause)
+            # count only the clauses dropped from now on
+            index.duplicates = index.tautologies = index.subsumed = 0
+            self.clause_index = index
+        return self.clause_index
+
+    def use_known_literals(self):
+        """
+        From now on, have add_clauses and add_literal_clauses simplify the
+        clauses by the literals known from those already held, and drop
+        those that are satisfied (see KnownLiterals).  Returns the store.
+        """
+        if self.known_literals is None:
+            known = KnownLiterals()
+            for clause in self.int_clauses:
+                known.add(clause)
+            # count only the clauses simplified from now on
+            known.satisfied = known.falsified = 0
+            self.known_literals = known
+        return self.known_literals
+
+    def dimacs_body(self):
+        """
+        Return the Dimacs lines (newline-terminated, no header) of all of
+        int_clauses.  Only the clauses added since the last call are
+        converted to text; earlier lines are kept from previous calls.
+        """
+        for clause in self.int_clauses.clauses_from(len(self.dimacs_lines)):
+            self.dimacs_lines.append(' '.join(map(str, clause)) + ' 0\n')
+        return self.dimacs_lines
+
+    def clause_view(self):
+        """ The clauses of the incremental encoding, as AIMA cnf """
+        return ClauseView(self)
+
     def to_dimacs_string(self, clauses):
         """Convert AIMA cnf expression to Dimacs cnf string
         
@@ -46,33 +431,48 @@ class AIMA_to_Dimacs_Translator(object):
         variable names. The conversion guarantees that the
         variables will be numbered alphabetically.
         """
+        num_vars, lines = self.to_dimacs_clauses(clauses)
+        return '\n'.join(['p cnf %d %d' % (num_vars, len(lines))] + lines)
+
+    def to_dimacs_clauses(self, clauses, variables = ()):
+        """
+        Same numbering as to_dimacs_string, but returns the number of
+        variables and the list of Dimacs clause lines without a header,
+        so one encoding can be reused with different unit clauses appended.
+        variables: extra symbols (e.g. query symbols) to number even if
+             no clause mentions them
+        """
+        num_vars = self.number_variables(clauses, variables)
+        lines = []
+        for clause in clauses:
+            if clause.op == '|':
+                line = ' '.join(map(self.dimacs_literal, clause.args))
+            else:
+                line = self.dimacs_literal(clause)
+            lines.append(line + ' 0')
+        return num_vars, lines
+
+    def number_variables(self, clauses, variables = ()):
+        """ Number the symbols of <clauses> (and <variables>) alphabetically;
+        returns the number of variables """
         self.varname_dict = {}
         self.varobj_dict = {}
-        variables = prop_symbols_from_clause_list(clauses)
-        ret = 'p cnf %d %d' % (len(variables), len(clauses))
+        variables = set(prop_symbols_from_clause_list(clauses)).union(variables)
         varis = dict(zip(sorted(variables, key=lambda v: v.op),
-                         map(str, range(1, len(variables) + 1))))
+                         range(1, len(variables) + 1)))
         for var in varis:
             self.varname_dict[var] = varis[var]
             self.varobj_dict[varis[var]] = var
+        self.num_vars = len(variables)
+        return self.num_vars
 
-        for clause in clauses:
-            ret += '\n'
-            dimacs_vlist = []
-            if clause.op == '|':
-                for var in clause.args:
-                    dimacs_vlist.append(('-' if var.op == '~' else '') \
-                                        + self.varname_dict[var.args[0]
-                                                            if var.op == '~' else var])
-
-                ret += ' '.join(dimacs_vlist)
-            elif clause.op == '~':
-                ret += '-' + self.varname_dict[clause.args[0]]
-            else:
-                ret += self.varname_dict[clause]
-            ret += ' 0'
+    def dimacs_literal(self, literal):
+        return str(self.int_literal(literal))
 
-        return ret
+    def int_literal(self, literal):
+        if literal.op == '~':
+            return -self.varname_dict[literal.args[0]]
+        return self.varname_dict[literal]
 
     def to_dimacs_string_set_variable_value(self, clauses, variable, value):
         """
@@ -91,7 +491,7 @@ class AIMA_to_Dimacs_Translator(object):
         if variable in variables:
             variables.remove(variable)
         varis = dict(zip(sorted(variables, key=lambda v: v.op),
-                         map(str, range(1, len(variables) + 1))))
+                         range(1, len(variables) + 1)))
         for var in varis:
             self.varname_dict[var] = varis[var]
             self.varobj_dict[varis[var]] = var
@@ -108,9 +508,7 @@ class AIMA_to_Dimacs_Translator(object):
                         if value and not var.op == '~' or not value and var.op == '~':
                             clause_exists = False
                     else:
-                        dimacs_vlist.append(('-' if var.op == '~' else '') \
-                                            + self.varname_dict[var.args[0]
-                                                                if var.op == '~' else var])
+                        dimacs_vlist.append(self.dimacs_literal(var))
 
                 if clause_exists:
                     ret_clause += ' '.join(dimacs_vlist)
@@ -120,14 +518,14 @@ class AIMA_to_Dimacs_Translator(object):
                         return None
                     clause_exists = False
                 else:
-                    ret_clause += '-' + self.varname_dict[clause.args[0]]
+                    ret_clause += self.dimacs_literal(clause)
             elif literal_name(clause) == literal_name(variable):
                 if value:
                     clause_exists = False
                 else:
                     return None
             else:
-                ret_clause += self.varname_dict[clause]
+                ret_clause += self.dimacs_literal(clause)
             if clause_exists:
                 clause_count += 1
                 ret_clauses += ret_clause + ' 0\n'
@@ -138,9 +536,9 @@ class AIMA_to_Dimacs_Translator(object):
 
 class Solution(object):
 
-    def __init__(self, success = False, varmap = {}):
+    def __init__(self, success = False, varmap = None):
         self.success = success
-        self.varmap = varmap
+        self.varmap = varmap if varmap is not None else {}
 
     def __repr__(self):
         return '<mSat.Sol {0}>'.format(self.success)
@@ -153,7 +551,85 @@ class Solution(object):
         print self.varmap
 
 
-class Minisat(object):
+#-------------------------------------------------------------------------------
+# SAT backends
+
+# Registered SAT backends, by name (see register_backend); all have
+# Minisat's solve, solve_assuming and solve_encoded methods
+backends = {}
+
+# BackendStats of the SAT tests run so far, by backend name
+backend_stats = {}
+
+def register_backend(backend):
+    """ Make SATBackend subclass <backend> selectable as backend.name """
+    backends[backend.name] = backend
+
+def print_backend_stats():
+    for name in sorted(backend_stats):
+        print '   {0}'.format(backend_stats[name])
+
+
+class BackendStats(object):
+    """ Totals over the SAT tests run by one backend """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.solve_time = 0.0    # seconds
+        self.clauses = 0         # summed over calls
+        self.max_clauses = 0
+        self.max_vars = 0
+        self.lock = Lock()       # SAT tests may run in worker threads
+
+    def record(self, elapsed, num_clauses, num_vars):
+        with self.lock:
+            self.calls += 1
+            self.solve_time += elapsed
+            self.clauses += num_clauses
+            self.max_clauses = max(self.max_clauses, num_clauses)
+            self.max_vars = max(self.max_vars, num_vars)
+
+    def __repr__(self):
+        calls = max(self.calls, 1)
+        return '{0}: {1} calls, {2:.3f}s ({3:.2f}ms per call),'.format(self.name, self.calls,
+                                                                    self.solve_time,
+                                                                    1000 * self.solve_time / calls) \
+               + ' cnf size: mean {0:.0f} clauses, max {1} clauses / {2} vars'.format(
+                   float(self.clauses) / calls, self.max_clauses, self.max_vars)
+
+
+class SATBackend(object):
+    """
+    Base of the SAT backends: each SAT test is counted, with its time and
+    cnf size, in backend_stats[name].
+    """
+    name = None
+
+    def record(self, start, num_clauses, num_vars):
+        """ Record a SAT test that began at time.time() <start> """
+        if self.name not in backend_stats:
+            backend_stats.setdefault(self.name, BackendStats(self.name))
+        backend_stats[self.name].record(time.time() - start, num_clauses, num_vars)
+
+    def solve_cdcl(self, solver, io, units, num_clauses):
+        """ One solve of cdcl.Solver <solver> per list of int assumptions
+        in <units>; <io> is the translator that numbered the variables """
+        solutions = []
+        for unit_lits in units:
+            start = time.time()
+            s = Solution(varmap = {})
+            if solver.solve(unit_lits):
+                s.success = True
+                for v in xrange(1, io.num_vars + 1):
+                    s.varmap[io.varobj(v)] = solver.model_value(v)
+            solutions.append(s)
+            self.record(start, num_clauses + len(unit_lits), io.num_vars)
+        return solutions
+
+
+class Minisat(SATBackend):
+    name = 'minisat'
     COMMAND = 'minisat %s %s > /dev/null'
 
     def __init__(self, command = COMMAND):
@@ -169,18 +645,69 @@ class Minisat(object):
         #     and therefore will also return None
         if not cnf: return Solution(None)
         
-        s = Solution()
-        infile = NamedTemporaryFile(mode='w')
-        outfile = NamedTemporaryFile(mode='r')
         io = translator()
         if variable:
             dimacs = io.to_dimacs_string_set_variable_value(cnf, variable, value)
-            if dimacs:
-                infile.write(dimacs)
-            else:
-                return s
+            if not dimacs:
+                return Solution()
         else:
-            infile.write(io.to_dimacs_string(cnf))
+            dimacs = io.to_dimacs_string(cnf)
+        start = time.time()
+        s = self.run([dimacs], io)
+        self.record(start, len(cnf), io.num_vars)
+        return s
+
+    def solve_assuming(self, cnf, assumption_sets,
+                       translator = AIMA_to_Dimacs_Translator):
+        """
+        Run one SAT test per entry of <assumption_sets>, each a list of
+        literals assumed True on top of <cnf>.  The cnf is translated to
+        Dimacs once; each test only appends its assumptions as unit clauses.
+        Returns a list of Solutions, in the order of <assumption_sets>.
+        """
+        if not cnf: return [Solution(None) for assumptions in assumption_sets]
+
+        io = translator()
+        num_vars, lines = io.to_dimacs_clauses(cnf, [literal_symbol(lit)
+                                                     for assumptions in assumption_sets
+                                                     for lit in assumptions])
+        body = '\n'.join(lines)
+        solutions = []
+        for assumptions in assumption_sets:
+            units = ''.join('\n' + io.dimacs_literal(lit) + ' 0' for lit in assumptions)
+            header = 'p cnf %d %d\n' % (num_vars, len(lines) + len(assumptions))
+            start = time.time()
+            solutions.append(self.run([header, body, units], io))
+            self.record(start, len(lines) + len(assumptions), num_vars)
+        return solutions
+
+    def solve_encoded(self, io, assumption_sets):
+        """
+        As solve_assuming, but for clauses already encoded incrementally
+        by translator <io> (see AIMA_to_Dimacs_Translator.add_clauses);
+        only the clauses added since the last call are turned into text.
+        """
+        if not io.int_clauses: return [Solution(None) for assumptions in assumption_sets]
+
+        units = [[io.encode_literal(lit) for lit in assumptions]
+                 for assumptions in assumption_sets]
+        lines = io.dimacs_body()
+        solutions = []
+        for unit_lits in units:
+            header = 'p cnf %d %d\n' % (io.num_vars, len(lines) + len(unit_lits))
+            tail = ''.join('%d 0\n' % lit for lit in unit_lits)
+            start = time.time()
+            solutions.append(self.run([header] + lines + [tail], io))
+            self.record(start, len(lines) + len(unit_lits), io.num_vars)
+        return solutions
+
+    def run(self, dimacs, io):
+        """ Run minisat on Dimacs text, given as a list of strings;
+        <io> is the translator that made it """
+        s = Solution(varmap = {})
+        infile = NamedTemporaryFile(mode='w')
+        outfile = NamedTemporaryFile(mode='r')
+        infile.writelines(dimacs)
         infile.flush()
         ret = call(self.command % (infile.name, outfile.name), shell=True)
         infile.close()
@@ -194,8 +721,209 @@ class Minisat(object):
                 v = v.strip()
                 value = v[0] != '-'
                 v = v.lstrip('-')
-                vo = io.varobj(v)
+                vo = io.varobj(int(v))
                 s.varmap[vo] = value
 
         outfile.close()
         return s
+
+
+class MinisatPipe(Minisat):
+    """
+    Minisat with a different transport: the Dimacs is streamed to the
+    solver's stdin and the result parsed line by line from its stdout,
+    with no shell and no temp files.  minisat takes one problem per
+    process, so there is still one process per solver call.
+    Besides minisat's own result format (see Minisat.run), 'v ...' model
+    lines, as printed by SAT-competition style solvers, are understood.
+    """
+    name = 'minisat_pipe'
+    COMMAND = ['minisat', '-verb=0', '/dev/stdin', '/dev/stdout']
+
+    def __init__(self, command = COMMAND):
+        self.command = command
+
+    def run(self, dimacs, io):
+        """ Run minisat on Dimacs text, given as a list of strings;
+        <io> is the translator that made it """
+        s = Solution()
+        devnull = open(os.devnull, 'w')
+        proc = Popen(self.command, stdin=PIPE, stdout=PIPE, stderr=devnull,
+                     close_fds=True)
+        try:
+            proc.stdin.writelines(dimacs)
+            proc.stdin.close()
+        except IOError:
+            # solver exited without reading all of its input
+            pass
+        for line in iter(proc.stdout.readline, ''):
+            fields = line.split()
+            if fields and fields[0] == 'v':
+                fields = fields[1:]
+            elif not fields or not fields[0].lstrip('-').isdigit():
+                # 'SAT', 'UNSAT', 'SATISFIABLE', 's SATISFIABLE', ...
+                continue
+            for field in fields:
+                lit = int(field)
+                if lit:
+                    s.varmap[io.varobj(abs(lit))] = lit > 0
+        ret = proc.wait()
+        devnull.close()
+        if ret != 10:
+            return Solution()
+        s.success = True
+        return s
+
+
+class CDCL(SATBackend):
+    """
+    Drop-in replacement for Minisat that solves in-process with a fresh
+    cdcl.Solver per call (one solver is shared by the tests of a
+    solve_assuming batch), so no external binary is needed.
+    """
+    name = 'cdcl'
+
+    def solve(self, cnf, variable = None, value = True,
+              translator = AIMA_to_Dimacs_Translator):
+        assumptions = []
+        if variable:
+            assumptions.append(variable if value else ~variable)
+        return self.solve_assuming(cnf, [assumptions], translator)[0]
+
+    def solve_assuming(self, cnf, assumption_sets,
+                       translator = AIMA_to_Dimacs_Translator):
+        if not cnf: return [Solution(None) for assumptions in assumption_sets]
+
+        io = translator()
+        num_vars = io.number_variables(cnf, [literal_symbol(lit)
+                                             for assumptions in assumption_sets
+                                             for lit in assumptions])
+        solver = cdcl.Solver()
+        solver.ensure_vars(num_vars)
+        for clause in cnf:
+            solver.add_clause(map(io.int_literal, disjuncts(clause)))
+        return self.solve_cdcl(solver, io, [map(io.int_literal, assumptions)
+                                            for assumptions in assumption_sets], len(cnf))
+
+    def solve_encoded(self, io, assumption_sets):
+        """ As Minisat.solve_encoded; the solver is given the int clauses
+        of <io> directly """
+        if not io.int_clauses: return [Solution(None) for assumptions in assumption_sets]
+
+        units = [[io.encode_literal(lit) for lit in assumptions]
+                 for assumptions in assumption_sets]
+        solver = cdcl.Solver()
+        solver.ensure_vars(io.num_vars)
+        for clause in io.int_clauses:
+            solver.add_clause(clause)
+        return self.solve_cdcl(solver, io, units, len(io.int_clauses))
+
+
+class DPLL(SATBackend):
+    """
+    Same interface as Minisat, backed by logic.dpll.  Far too slow for
+    the agent's KB; kept as a reference point for benchmarking.
+    """
+    name = 'dpll'
+
+    def solve(self, cnf, variable = None, value = True, translator = None):
+        assumptions = []
+        if variable:
+            assumptions.append(variable if value else ~variable)
+        return self.solve_assuming(cnf, [assumptions])[0]
+
+    def solve_assuming(self, cnf, assumption_sets, translator = None):
+        if not cnf: return [Solution(None) for assumptions in assumption_sets]
+
+        symbols = prop_symbols_from_clause_list(cnf)
+        solutions = []
+        for assumptions in assumption_sets:
+            clauses = cnf + list(assumptions)
+            extra = [literal_symbol(lit) for lit in assumptions
+                     if literal_symbol(lit) not in symbols]
+            start = time.time()
+            model = dpll(clauses, symbols + extra, {})
+            self.record(start, len(clauses), len(symbols) + len(extra))
+            if model is False:
+                solutions.append(Solution(varmap = {}))
+            else:
+                solutions.append(Solution(True, model))
+        return solutions
+
+    def solve_encoded(self, io, assumption_sets):
+        """ As Minisat.solve_encoded; the int clauses of <io> are turned
+        back into AIMA cnf for logic.dpll """
+        return self.solve_assuming(list(io.clause_view()), assumption_sets)
+
+
+class MinisatSession(SATBackend):
+    """
+    A long-lived, in-process alternative to Minisat for a growing KB.
+    Clauses are encoded once when they are added (add_clauses, via the
+    incremental AIMA_to_Dimacs_Translator in self.translator), and handed
+    to an incremental cdcl.Solver at the next solve, which keeps its
+    learned clauses from one solve to the next.  solve() takes the same
+    <variable>/<value> arguments as Minisat.solve, but sets the variable
+    with a solver assumption rather than rewriting the cnf.
+    Not a registered backend (it holds the KB itself, so has a different
+    interface), but its SAT tests are counted in backend_stats['session'].
+    """
+    name = 'session'
+
+    def __init__(self, clauses = None, translator = AIMA_to_Dimacs_Translator):
+        self.solver = cdcl.Solver()
+        self.translator = translator()
+        self.num_sent = 0    # number of translator.int_clauses given to solver
+        if clauses:
+            self.add_clauses(clauses)
+
+    def varname(self, vo):
+        """ Return the (positive int) id of symbol <vo>, allocating one if new """
+        return self.translator.symbol_id(vo)
+
+    def varobj(self, v):
+        return self.translator.varobj(v)
+
+    def literal(self, lit):
+        return self.translator.encode_literal(lit)
+
+    @property
+    def num_clauses(self):
+        return len(self.translator.int_clauses)
+
+    def add_clauses(self, clauses):
+        """ Add AIMA cnf clauses to the session """
+        self.translator.add_clauses(clauses)
+
+    def send_clauses(self):
+        """ Give the solver the clauses encoded since the last call """
+        io = self.translator
+        self.solver.ensure_vars(io.num_vars)
+        for clause in io.int_clauses.clauses_from(self.num_sent):
+            self.solver.add_clause(clause)
+        self.num_sent = len(io.int_clauses)
+
+    def solve(self, variable = None, value = True):
+        assumptions = []
+        if variable:
+            assumptions.append(variable if value else ~variable)
+        return self.solve_assuming([assumptions])[0]
+
+    def solve_assuming(self, assumption_sets):
+        """
+        As Minisat.solve_assuming, against the clauses in the session.
+        The assumptions are handed to the solver, not added as clauses.
+        """
+        # as in Minisat.solve, an empty session can't infer anything
+        if not self.num_clauses: return [Solution(None) for assumptions in assumption_sets]
+
+        io = self.translator
+        units = [[io.encode_literal(lit) for lit in assumptions]
+                 for assumptions in assumption_sets]
+        self.send_clauses()
+        return self.solve_cdcl(self.solver, io, units, self.num_clauses)
+
+register_backend(Minisat)       # external minisat binary
+register_backend(MinisatPipe)   # same, over pipes, no shell
+register_backend(CDCL)          # in-process CDCL solver (cdcl.py)
+register_backend(DPLL)          # logic.dpll; slow, for comparison
@@ -171,22 +171,25 @@ class WumpusWorldScenario(object):
 
 #-------------------------------------------------------------------------------
 
-def world_scenario_hybrid_wumpus_agent_from_layout(layout_filename):
+def world_scenario_hybrid_wumpus_agent_from_layout(layout_filename, **agent_options):
     """
     Create WumpusWorldScenario with an automated agent_program that will
         try to solve the Hunt The Wumpus game on its own.
     layout_filename := name of layout file to load
+    agent_options := other HybridWumpusAgent options, e.g. sat_solver
     """
     return WumpusWorldScenario(layout_file = layout_filename,
-                               agent = HybridWumpusAgent('north', verbose=True),
+                               agent = HybridWumpusAgent('north', verbose=True,
+                                                         **agent_options),
                                trace=False)
 
 #------------------------------------
 # examples of constructing HybridWumpusAgent scenario
 # specifying objects as list
 
-def wscenario_4x4_HybridWumpusAgent():
-    return WumpusWorldScenario(agent = HybridWumpusAgent('north', verbose=True),
+def wscenario_4x4_HybridWumpusAgent(**agent_options):
+    return WumpusWorldScenario(agent = HybridWumpusAgent('north', verbose=True,
+                                                         **agent_options),
                                objects = [(Wumpus(),(1,3)),
                                           (Pit(),(3,3)),
                                           (Pit(),(3,1)),
@@ -196,23 +199,26 @@ def wscenario_4x4_HybridWumpusAgent():
 
 #-------------------------------------------------------------------------------
 
-def world_scenario_manual_with_kb_from_layout(layout_filename):
+def world_scenario_manual_with_kb_from_layout(layout_filename, **agent_options):
     """
     Create WumpusWorldScenario with a manual agent_program and Knowledge Base
         (see with_manual_kb_program)
     layout_filename := name of layout file to load
+    agent_options := other HybridWumpusAgent options, e.g. sat_solver
     """
     return WumpusWorldScenario(layout_file = layout_filename,
                                agent = with_manual_kb_program(HybridWumpusAgent('north',
-                                                                                verbose=True)),
+                                                                                verbose=True,
+                                                                                **agent_options)),
                                trace=False)
 
 #------------------------------------
 # examples of constructing manual wumpus agent with KB scenario
 # specifying objects as list
 
-def wscenario_4x4_manual_HybridWumpusAgent():
-    return WumpusWorldScenario(agent = with_manual_kb_program(HybridWumpusAgent('north', verbose=True)),
+def wscenario_4x4_manual_HybridWumpusAgent(**agent_options):
+    return WumpusWorldScenario(agent = with_manual_kb_program(HybridWumpusAgent('north', verbose=True,
+                                                                                **agent_options)),
                                objects = [(Wumpus(),(1,3)),
                                           (Pit(),(3,3)),
                                           (Pit(),(3,1)),
@@ -380,8 +386,8 @@ def with_manual_kb_program(agent):
         If not, that means the KB contains a contradiction that needs fixing.
         However, being satisfiable does not mean the KB is correct.
         """
-        result = minisat(agent.kb.clauses)
-        if result:
+        result = agent.kb.solve_assuming([[]])[0]
+        if result.success != False:
             print "Agent KB is satisfiable"
         else:
             print "Agent KB is NOT satisfiable!!  There is contradiction that needs fixing!"
@@ -396,6 +402,18 @@ def with_manual_kb_program(agent):
         else:
             print "{0}: {1}".format(proposition,result)
 
+    def simple_queries(propositions):
+        """
+        As simple_query, for each of <propositions>, with the queries
+        answered together by agent.kb.ask_many.
+        """
+        results = agent.kb.ask_many(propositions)
+        for proposition in propositions:
+            if results[proposition] == None:
+                print "{0}: Unknown!".format(proposition)
+            else:
+                print "{0}: {1}".format(proposition,results[proposition])
+
     def location_based_query(proposition_base):
         """
         Executes queries for the specified type of proposition, for
@@ -410,14 +428,12 @@ def with_manual_kb_program(agent):
         display_env = WumpusEnvironment(agent.width, agent.height)
         start_time = clock()
         print "Running queries for: {0}<x>_<y>".format(proposition_base)
-        for x in range(1,agent.width+1):
-            for y in range(1,agent.height+1):
-                query = expr('{0}{1}_{2}'.format(proposition_base,x,y))
-                result = agent.kb.ask(query)
-                if result == None:
-                    display_env.add_thing(Proposition(query,'?'),(x,y))
-                else:
-                    display_env.add_thing(Proposition(query,result),(x,y))
+        for (x,y), query, result in \
+                agent.query_locations(lambda x,y: '{0}{1}_{2}'.format(proposition_base,x,y)):
+            if result == None:
+                display_env.add_thing(Proposition(query,'?'),(x,y))
+            else:
+                display_env.add_thing(Proposition(query,result),(x,y))
         end_time = clock()
         print "          >>> time elapsed while making queries:" \
               + " {0}".format(end_time-start_time)
@@ -438,14 +454,13 @@ def with_manual_kb_program(agent):
         display_env = WumpusEnvironment(agent.width, agent.height)
         start_time = clock()
         print "Running queries for: {0}<x>_<y>_{1}".format(proposition_base,time)
-        for x in range(1,agent.width+1):
-            for y in range(1,agent.height+1):
-                query = expr('{0}{1}_{2}_{3}'.format(proposition_base,x,y,time))
-                result = agent.kb.ask(query)
-                if result == None:
-                    display_env.add_thing(Proposition(query,'?'),(x,y))
-                else:
-                    display_env.add_thing(Proposition(query,result),(x,y))
+        for (x,y), query, result in \
+                agent.query_locations(lambda x,y: '{0}{1}_{2}_{3}'.format(proposition_base,
+                                                                          x,y,time)):
+            if result == None:
+                display_env.add_thing(Proposition(query,'?'),(x,y))
+            else:
+                display_env.add_thing(Proposition(query,result),(x,y))
         end_time = clock()
         print "          >>> time elapsed while making queries:" \
               + " {0}".format(end_time-start_time)
@@ -455,14 +470,12 @@ def with_manual_kb_program(agent):
 
     def run_all_queries(time):
         check_kb_status()
-        for p in proposition_bases_perceptual_fluents:
-            simple_query(p + '{0}'.format(time))
+        simple_queries([p + '{0}'.format(time) for p in proposition_bases_perceptual_fluents])
         for p in proposition_bases_atemporal_location:
             location_based_query(p)
         for p in proposition_bases_location_fluents:
             location_time_based_query(p,time)
-        for p in proposition_bases_state_fluents:
-            simple_query(p + '{0}'.format(time))
+        simple_queries([p + '{0}'.format(time) for p in proposition_bases_state_fluents])
         # remove the quotes below and add quotes to the following if-statement
         # in order to query all actions from time 0 to now
         '''
@@ -473,8 +486,7 @@ def with_manual_kb_program(agent):
         '''
         if time-1 > 0:
             print "Actions from previous time: {0}".format(time-1)
-            for p in proposition_bases_actions:
-                simple_query(p + '{0}'.format(time-1))
+            simple_queries([p + '{0}'.format(time-1) for p in proposition_bases_actions])
             
         print "FINISHED running all queries for time {0}".format(time)
 
@@ -573,9 +585,10 @@ def with_manual_kb_program(agent):
 # Test MiniSat connection
 #-------------------------------------------------------------------------------
 
-def run_minisat_test():
+def run_minisat_test(solver='minisat'):
     """
     Test connection to MiniSat
+    (or, with <solver>, to one of the other engines in sat_solvers)
     """
     import logic
 
@@ -592,7 +605,7 @@ def run_minisat_test():
         print "Test {0}".format(t)
         print "  Query:      '{0}'".format(query)
         query = logic.conjuncts(logic.to_cnf(logic.expr(query)))
-        result = minisat(query, None, variable=None, value=True, verbose=False)
+        result = minisat(query, None, variable=None, value=True, verbose=False, solver=solver)
         print "  Query CNF:  {0}".format(query)
         print "  Result:     {0}   (Expected: {1})".format(result.success, expected_result)
         if result.success != expected_result:
@@ -628,6 +641,9 @@ def readCommand( argv ):
                (2) python wumpus.py -k OR python wumpus.py --kb
                    - starts simple manual Hunt The Wumpus game with
                    knowledge base and interactive queries possible
+               (3) python wumpus.py -y -s cdcl --solver-stats
+                   - runs the hybrid wumpus agent with the in-process
+                   CDCL solver, then reports the SAT calls it made
     """
     parser = OptionParser(usageStr)
 
@@ -639,6 +655,43 @@ def readCommand( argv ):
     parser.add_option('-l', '--layout', dest='layout', default=None,
                       help=default("Load layout file"))
 
+    parser.add_option('-s', '--solver', dest='sat_solver', default='minisat',
+                      help=default("SAT backend of the agent KB, one of: " \
+                                   + ', '.join(sorted(sat_solvers) + ['session'])))
+    parser.add_option('--solver-stats', action='store_true', dest='solver_stats',
+                      default=False,
+                      help=default("Report calls, time and cnf size per SAT backend"))
+    parser.add_option('--cnf-axioms', action='store_true', dest='cnf_axioms',
+                      default=False,
+                      help=default("Tell the agent KB axioms as directly generated clauses"))
+    parser.add_option('--definitional-cnf', action='store_true', dest='definitional_cnf',
+                      default=False,
+                      help=default("Convert agent KB axioms to CNF with auxiliary symbols"))
+    parser.add_option('--full-location-ssa', action='store_true', dest='full_location_ssa',
+                      default=False,
+                      help=default("Assert the at_location SSA for every location"))
+    parser.add_option('--axiom-templates', action='store_true', dest='axiom_templates',
+                      default=False,
+                      help=default("Add the temporal axioms as instances of precompiled clause templates"))
+    parser.add_option('--amo-encoding', dest='amo_encoding', default='auto',
+                      help=default("Encoding of the at-most-one constraints of the generated" \
+                                   + " clauses, one of: " + ', '.join(amo_encodings + ['auto'])
+                                   + "; auto is pairwise up to " + str(amo_pairwise_max)
+                                   + " literals. Without --cnf-axioms or --axiom-templates"
+                                   + " it only applies to the at most one wumpus; the heading"
+                                   + " and action axioms stay pairwise"))
+    parser.add_option('--compact-kb', type='int', dest='compact_every', default=0,
+                      help=default("Summarise the agent KB every N steps (0: never)"))
+    parser.add_option('--step-budget', type='float', dest='step_budget', default=None,
+                      help=default("Seconds the agent may take per step before planning" \
+                                   + " with what it knows"))
+    parser.add_option('--trace', dest='trace', default='trace',
+                      help=default("Level of the agent trace, one of: " \
+                                   + ', '.join(trace_levels)))
+    parser.add_option('--trace-file', dest='trace_file', default=None,
+                      help=default("Write the agent trace to this file as JSON lines" \
+                                   + " rather than to the console"))
+
     parser.add_option('-t', '--test', action='store_true', dest='test_minisat',
                       default=False,
                       help=default("Test connection to command-line MiniSat"))
@@ -647,29 +700,55 @@ def readCommand( argv ):
     
     if len(otherjunk) != 0:
         raise Exception("Command line input not understood: " + str(otherjunk))
+    if options.sat_solver != 'session' and options.sat_solver not in sat_solvers:
+        raise Exception("Unknown SAT backend: " + options.sat_solver)
+    trace_level(options.trace)
 
     return options
 
 def run_command(options):
     if options.test_minisat:
-        run_minisat_test()
+        if options.sat_solver == 'session':
+            raise Exception("The minisat test needs a per-call SAT backend, not 'session'")
+        run_minisat_test(options.sat_solver)
         return
+    agent_options = {'sat_solver': options.sat_solver,
+                     'cnf_axioms': options.cnf_axioms,
+                     'definitional_cnf': options.definitional_cnf,
+                     'full_location_ssa': options.full_location_ssa,
+                     'compact_every': options.compact_every,
+                     'axiom_templates': options.axiom_templates,
+                     'amo_encoding': options.amo_encoding,
+                     'step_budget': options.step_budget}
+    if options.trace_file:
+        tracer = Tracer(options.trace, [JSONLinesSink(options.trace_file)])
+    else:
+        tracer = console_tracer(options.trace)
+    agent_options['tracer'] = tracer
     if options.hybrid:
         if options.layout:
-            s = world_scenario_hybrid_wumpus_agent_from_layout(options.layout)
+            s = world_scenario_hybrid_wumpus_agent_from_layout(options.layout, **agent_options)
         else:
-            s = wscenario_4x4_HybridWumpusAgent()
+            s = wscenario_4x4_HybridWumpusAgent(**agent_options)
     elif options.kb:
         if options.layout:
-            s = world_scenario_manual_with_kb_from_layout(options.layout)
+            s = world_scenario_manual_with_kb_from_layout(options.layout, **agent_options)
         else:
-            s = wscenario_4x4_manual_HybridWumpusAgent()
+            s = wscenario_4x4_manual_HybridWumpusAgent(**agent_options)
     else:
         if options.layout:
             s = world_scenario_manual_from_layout(options.layout)
         else:
             s = wscenario_4x4_manual()
     s.run()
+    tracer.close()
+    if options.hybrid and options.step_budget:
+        print "Step deadline hit: {0} (waits: {1})".format(
+            ', '.join('{0}={1}'.format(tier, s.agent.deadline_tiers[tier])
+                      for tier in deadline_tiers), s.agent.holds)
+    if options.solver_stats:
+        print "SAT backend stats:"
+        msat.print_backend_stats()
 
 #-------------------------------------------------------------------------------
 
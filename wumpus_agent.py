@@ -20,14 +20,28 @@ from logic import *
 from wumpus_environment import *
 from wumpus_kb import *
 from wumpus_planners import *
+from wumpus_trace import *
 import minisat as msat
-from time import clock
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from time import clock, time as wall_clock
 import sys
 
 
 #-------------------------------------------------------------------------------
 
-def minisat(clauses, query = None, variable = None, value = True, verbose = False):
+# SAT solvers that minisat() can be asked to use: the backend registry in
+# minisat.py (msat.register_backend adds to it); all share Minisat's interface
+sat_solvers = msat.backends
+
+# points of HybridWumpusAgent.agent_program at which the step deadline (see
+# step_budget) can be found passed, in order: after inferring the belief
+# location and heading, while querying OK locations, and before the
+# planning queries
+deadline_tiers = ['belief', 'OK', 'planning']
+
+def minisat(clauses, query = None, variable = None, value = True, verbose = False,
+            solver = 'minisat'):
     """ Interface to minisat
     <query> is simply added as to the list of <clauses>
     
@@ -35,6 +49,8 @@ def minisat(clauses, query = None, variable = None, value = True, verbose = Fals
     assuming any instance of that variable has that value.
     
     Otherwise, with defaults, will perform normal SAT on <clauses>+<query>
+
+    <solver> names the engine to use (see sat_solvers)
     """
     c = None
     if verbose:
@@ -43,53 +59,446 @@ def minisat(clauses, query = None, variable = None, value = True, verbose = Fals
         c = clauses
     else:
         c = clauses + [query]
-    m = msat.Minisat()
+    m = sat_solvers[solver]()
     s = m.solve(c, variable, value)
     if verbose:
         print s.success
     return s
 
+def minisat_assuming(clauses, assumption_sets, verbose = False, solver = 'minisat'):
+    """ Interface to minisat for a batch of SAT tests over the same <clauses>
+    Each entry of <assumption_sets> is a list of literals assumed True for
+    one test; <clauses> are translated to Dimacs only once for the batch.
+    Returns one Solution per assumption set.
+    """
+    if verbose:
+        print 'minisat_assuming({0}):'.format(assumption_sets),
+    m = sat_solvers[solver]()
+    solutions = m.solve_assuming(clauses, assumption_sets)
+    if verbose:
+        print [s.success for s in solutions]
+    return solutions
+
+# Thread pools shared by all PropKB_SATs, by number of workers
+worker_pools = {}
+
+def worker_pool(workers):
+    """ Return the shared pool of <workers> threads, starting it if needed """
+    if workers not in worker_pools:
+        worker_pools[workers] = ThreadPool(workers)
+    return worker_pools[workers]
+
 #-------------------------------------------------------------------------------
 
 class PropKB_SAT(PropKB):
+    """
+    Every clause told to the KB is encoded once by self.translator (an
+    incremental msat.AIMA_to_Dimacs_Translator), and kept only as int
+    literals in its msat.ClauseStore, so a query only has to translate the
+    clauses told since the previous query.  self.clauses is a read-only
+    view of the store that decodes the clauses back to AIMA cnf on demand.
+    session := optional msat.MinisatSession; when given, its translator is
+               used, and queries are answered by the session instead of by
+               a fresh minisat process.
+    solver := SAT solver used when there is no session (see sat_solvers)
+    model_cache_size := number of recent models (varmaps of SAT results) of
+               the current KB to keep; ask and backbone use them to skip
+               SAT tests whose answer a cached model already shows.  The
+               cache is emptied whenever the KB changes.
+    workers := when > 1 and there is no session, the SAT tests of a batch
+               (solve_assuming) are fanned out across a pool of this many
+               threads, each making its own solver call.  This gives real
+               parallelism with the external minisat, as each thread just
+               waits on its own minisat process; the in-process solvers
+               hold the GIL, so gain nothing.  1 := solve serially.
+    definitional_cnf := if True, tell converts sentences with
+               to_cnf(sentence, definitional=True), whose size is linear in
+               the sentence but which introduces auxiliary symbols.  These
+               never appear in the models (varmaps) the KB returns or
+               caches.  Sentences told this way can't be retracted.
+    dedup_clauses := if True, clauses told that are duplicates, tautologies
+               or subsumed by clauses the KB already holds are dropped
+               rather than stored (see msat.ClauseIndex); self.clause_index
+               counts them.  Retracting a clause then also loses the
+               clauses that were dropped as subsumed by it.
+    propagate_units := if True, the KB keeps the literals its clauses make
+               true by unit propagation (see msat.KnownLiterals): clauses
+               told are simplified by them (or dropped, if satisfied),
+               and ask and backbone answer queries on a known literal
+               without a SAT test (counted in self.known_literal_hits).
+               Retracting a clause then also loses what the clauses told
+               after it learned from it.
+    """
+
+    def __init__(self, sentence=None, session=None, solver='minisat',
+                 model_cache_size=16, workers=1, definitional_cnf=False,
+                 dedup_clauses=False, propagate_units=False):
+        self.session = session
+        self.definitional_cnf = definitional_cnf
+        self.dedup_clauses = dedup_clauses
+        self.propagate_units = propagate_units
+        self.solver = solver
+        self.workers = workers
+        if session:
+            self.translator = session.translator
+        else:
+            self.translator = msat.AIMA_to_Dimacs_Translator()
+        if dedup_clauses:
+            self.translator.use_clause_index()
+        if propagate_units:
+            self.translator.use_known_literals()
+        self.models = deque(maxlen=model_cache_size)
+        self.model_cache_hits = 0 # number of SAT tests skipped
+        self.known_literal_hits = 0 # number of queries answered by known literals
+        # PropKB.__init__ is not called, as self.clauses is not a list here
+        if sentence:
+            self.tell(sentence)
+
+    @property
+    def clauses(self):
+        return self.translator.clause_view()
+
+    @property
+    def clause_index(self):
+        return self.translator.clause_index
+
+    @property
+    def known_literals(self):
+        return self.translator.known_literals
+
+    def known_value(self, symbol):
+        """ True (False) if <symbol> (~<symbol>) is a known literal of the
+        KB (see propagate_units), else None """
+        known = self.translator.known_literals
+        if known is None or known.conflict:
+            return None
+        v = self.translator.varname_dict.get(symbol)
+        if v is None:
+            return None
+        if v in known.literals:
+            return True
+        if -v in known.literals:
+            return False
+        return None
 
     def tell(self, sentence):
-        if sentence: super(PropKB_SAT,self).tell(sentence)
+        if sentence:
+            self.tell_clauses(conjuncts(to_cnf(sentence, self.definitional_cnf)))
+
+    def tell_clauses(self, clauses):
+        """ Add <clauses>, already in AIMA cnf, to the KB """
+        if clauses:
+            self.models.clear()
+            self.translator.add_clauses(clauses)
+
+    def tell_literal_clauses(self, clauses):
+        """ Add <clauses>, each a sequence of literal strings (as made by
+        the clause generators of wumpus_kb), to the KB """
+        if clauses:
+            self.models.clear()
+            self.translator.add_literal_clauses(clauses)
+
+    def tell_entailed_units(self, literals):
+        """ Add a unit clause for each of <literals> (strings), which the KB
+        must already entail: every model cached is then still a model, so
+        the model cache is kept """
+        self.translator.add_literal_clauses([(literal,) for literal in literals])
+
+    def tell_template_clauses(self, template, t):
+        """ Add the clauses of wumpus_kb.ClauseTemplate <template> at
+        time <t> to the KB """
+        if len(template):
+            self.models.clear()
+            self.translator.add_mapped_clauses(template.lits, template.ends,
+                                               template.symbols_at(t))
+
+    def retract(self, sentence):
+        """ The encoding is append-only, so retracting rebuilds it """
+        clauses = list(self.clauses)
+        for c in conjuncts(to_cnf(sentence)):
+            if c in clauses:
+                clauses.remove(c)
+        self.models.clear()
+        if self.session:
+            self.session = self.session.__class__(clauses)
+            self.translator = self.session.translator
+        else:
+            self.translator = msat.AIMA_to_Dimacs_Translator()
+            self.translator.add_clauses(clauses)
+        if self.dedup_clauses:
+            self.translator.use_clause_index()
+        if self.propagate_units:
+            self.translator.use_known_literals()
 
     def load_sentences(self, sentences):
         for sentence in sentences: self.tell(sentence)
 
+    def solve_assuming(self, assumption_sets):
+        """ One SAT test of the KB per list of assumed literals;
+        the models found are added to the model cache """
+        if self.session:
+            solutions = self.session.solve_assuming(assumption_sets)
+        elif self.workers > 1 and len(assumption_sets) > 1:
+            solutions = self.solve_in_parallel(assumption_sets)
+        else:
+            solutions = sat_solvers[self.solver]().solve_encoded(self.translator,
+                                                                 assumption_sets)
+        hidden = self.translator.aux_symbols
+        for s in solutions:
+            if s.success:
+                for symbol in hidden:
+                    s.varmap.pop(symbol, None)
+                self.models.appendleft(s.varmap)
+        return solutions
+
+    def solve_in_parallel(self, assumption_sets):
+        """
+        solve_assuming for the solver of self.solver, one solver call per
+        assumption set, run by the worker pool; results are in order.
+        """
+        # Number any new symbols and bring the Dimacs text up to date here,
+        # so that the worker threads only read the translator
+        for assumptions in assumption_sets:
+            for lit in assumptions:
+                self.translator.encode_literal(lit)
+        self.translator.dimacs_body()
+        solver, translator = sat_solvers[self.solver], self.translator
+        def solve(assumptions):
+            return solver().solve_encoded(translator, [assumptions])[0]
+        return worker_pool(self.workers).map(solve, assumption_sets)
+
     def ask(self, query):
-        """ Assumes query is a single positive proposition """
+        """ Assumes query is a single positive proposition
+        Tests KB & query and KB & ~query as assumptions against one
+        encoding of the KB, rather than re-encoding the KB for each.
+        A cached model in which query is True (False) already shows
+        KB & query (KB & ~query) is SAT, so that test is skipped. """
         if isinstance(query,str):
             query = expr(query)
-        sT = minisat(self.clauses, None, variable=query, value=True, verbose=False)
-        sF = minisat(self.clauses, None, variable=query, value=False, verbose=False)
-        if sT.success == sF.success:
+        value = self.known_value(query)
+        if value is not None:
+            self.known_literal_hits += 1
+            return value
+        success = dict((value, True) for value in (True, False)
+                       if any(model.get(query) == value for model in self.models))
+        tests = [value for value in (True, False) if value not in success]
+        self.model_cache_hits += 2 - len(tests)
+        solutions = self.solve_assuming([[query if value else ~query] for value in tests])
+        success.update(zip(tests, [s.success for s in solutions]))
+        if success[True] == success[False]:
             return None
         else:
-            return sT.success
+            return success[True]
+
+    def entails(self, query):
+        """ Is the single positive proposition <query> True in every model
+        of the KB?  Takes one SAT test (of KB & ~query), or none if query
+        is a known literal or a cached model has it False.  An empty KB
+        entails nothing. """
+        if isinstance(query,str):
+            query = expr(query)
+        value = self.known_value(query)
+        if value is not None:
+            self.known_literal_hits += 1
+            return value
+        if any(model.get(query) == False for model in self.models):
+            self.model_cache_hits += 1
+            return False
+        return self.solve_assuming([[~query]])[0].success == False
+
+    def ask_many(self, queries):
+        """
+        Batch version of ask, for many single positive propositions (Exprs
+        or strings) against the same KB: all are answered by one backbone
+        computation.  Returns a dict from each query, as given, to
+        True/False/None as ask would return.
+        """
+        symbols = dict((query, expr(query) if isinstance(query,str) else query)
+                       for query in queries)
+        results = self.backbone(symbols.values())
+        return dict((query, results[symbol]) for query, symbol in symbols.items())
+
+    def backbone(self, symbols):
+        """
+        Answer ask(s) for every proposition s in <symbols> at once; returns
+        a dict from symbol to True/False (its value in every model of the
+        KB) or None (unknown, or the KB is empty or inconsistent).
+        The values shared by the cached models (or else by one new model)
+        of the KB are the candidates; each is tested with one SAT test of
+        KB & ~candidate.  UNSAT puts it in the backbone, while a model (SAT)
+        rules out every candidate it disagrees with, so the number of SAT
+        tests is usually far smaller than the two per symbol that ask would
+        make.  With workers > 1, that many candidates are tested at a time.
+        """
+        values = dict((symbol, None) for symbol in symbols)
+        unknown = []
+        for symbol in values:
+            values[symbol] = self.known_value(symbol)
+            if values[symbol] is None:
+                unknown.append(symbol)
+        self.known_literal_hits += len(values) - len(unknown)
+        if not unknown:
+            return values
+        if self.models:
+            self.model_cache_hits += 1
+        elif not self.solve_assuming([[]])[0].success:
+            return dict((symbol, None) for symbol in values)
+        first = self.models[0]
+        candidates = dict((symbol, first[symbol]) for symbol in unknown
+                          if symbol in first
+                          and all(model.get(symbol) == first[symbol] for model in self.models))
+        while candidates:
+            batch = [candidates.popitem()
+                     for i in range(min(self.workers, len(candidates)))]
+            models = self.solve_assuming([[~symbol if value else symbol]
+                                          for symbol, value in batch])
+            for (symbol, value), model in zip(batch, models):
+                if not model.success:
+                    values[symbol] = value
+                    continue
+                for other, other_value in candidates.items():
+                    if model.varmap.get(other) != other_value:
+                        del candidates[other]
+        return values
 
 #-------------------------------------------------------------------------------
 
-class Proposition(agents.Thing):
-    """ Used for debugging, to display proposition in WumpusEnvironment """
+class AtemporalFactCache(object):
+    """
+    The atemporal location propositions (P, W, B, S<x>_<y>) decided so far
+    by an agent's KB.  These never change truth value once entailed, so
+    queries on them are answered from here rather than by the KB.
+    facts := dict from proposition (Expr) to True/False
+    hits, misses := number of atemporal queries answered from facts, or not
+    (hits also count OK queries answered from them, see ok_value)
+    """
+
+    def __init__(self):
+        self.facts = {}
+        self.hits = 0
+        self.misses = 0
+
+    def answer(self, queries):
+        """ Split <queries> into a dict of the answers known here and a
+        list of the queries left for the KB """
+        known = {}
+        unknown = []
+        for query in queries:
+            value = self.facts.get(query)
+            if value is not None:
+                self.hits += 1
+                known[query] = value
+            else:
+                if is_atemporal_location_str(query.op):
+                    self.misses += 1
+                unknown.append(query)
+        return known, unknown
+
+    def record(self, results):
+        """ Keep the atemporal queries decided in <results> (a dict from
+        query to True/False/None); returns their literals, as strings """
+        literals = []
+        for query, value in results.items():
+            if value is not None and query not in self.facts \
+               and is_atemporal_location_str(query.op):
+                self.facts[query] = value
+                literals.append(query.op if value else '~' + query.op)
+        return literals
 
-    def __init__(self, name, value = '?'):
-        self.name = '{0}={1}'.format(name, value)
+    def ok_value(self, x, y):
+        """ OK<x>_<y>_<t> (at any t) as the facts decide it, by the OK axiom
+        (see axiom_generator_location_OK): False if there is a pit, True if
+        there is neither pit nor wumpus, else None (counted as a hit if
+        decided) """
+        pit = self.facts.get(expr(pit_str(x,y)))
+        if pit is None:
+            return None
+        if pit or self.facts.get(expr(wumpus_str(x,y))) == False:
+            self.hits += 1
+            return not pit
+        return None
 
-    def display(self):
-        return self.name
+    def hit_rate(self):
+        return float(self.hits) / max(self.hits + self.misses, 1)
 
-    def to_string(self):
-        return self.name
+    def __repr__(self):
+        return '<AtemporalFactCache: {0} facts, {1} hits, {2} misses ({3:.0%} hit rate)>'.format(
+            len(self.facts), self.hits, self.misses, self.hit_rate())
 
 #-------------------------------------------------------------------------------
 
 class HybridWumpusAgent(Explorer):
     "An agent for the wumpus world that does logical inference. [Fig. 7.19]"""
-    def __init__(self, heading='east', environment=None, verbose=True, keep_axioms=True):
+    def __init__(self, heading='east', environment=None, verbose=True, keep_axioms=True,
+                 incremental=False, sat_solver='minisat', workers=1, cnf_axioms=False,
+                 definitional_cnf=False, full_location_ssa=False, dedup_clauses=True,
+                 compact_every=0, propagate_units=True, axiom_templates=False,
+                 amo_encoding='auto', track_location=True, cache_atemporal=True,
+                 frontier_queries=True, tracer=None, step_budget=None):
         self.keep_axioms = keep_axioms # for debugging: if True, keep easier-to-read PL form
+        # if True, keep one in-process solver session for the life of the KB
+        # rather than calling minisat afresh for every query
+        self.incremental = incremental
+        # SAT backend: a name in sat_solvers, or 'session' (same as incremental)
+        if sat_solver != 'session' and sat_solver not in sat_solvers:
+            raise Exception("Unknown SAT backend '{0}', expected one of: {1}".format(
+                sat_solver, ', '.join(sorted(sat_solvers) + ['session'])))
+        self.sat_solver = sat_solver
+        # number of threads making SAT tests in parallel (see PropKB_SAT)
+        self.workers = workers
+        # if True, tell the KB the clauses of the wumpus_kb clause generators
+        # rather than parsing the axiom strings and converting them to cnf
+        # (kept axioms are then the clauses, in PL form)
+        self.cnf_axioms = cnf_axioms
+        # if True, the KB converts axioms to definitional CNF (see PropKB_SAT)
+        self.definitional_cnf = definitional_cnf
+        # if True, assert the full at_location SSA for every location at each
+        # step, rather than the one for the current location and the one
+        # ahead; best with definitional_cnf or cnf_axioms
+        self.full_location_ssa = full_location_ssa
+        # if True, the KB drops duplicate and subsumed clauses (see PropKB_SAT)
+        self.dedup_clauses = dedup_clauses
+        # if True, the KB simplifies clauses by the literals it knows by unit
+        # propagation, and answers queries on them without SAT tests
+        # (see PropKB_SAT)
+        self.propagate_units = propagate_units
+        # if True, add the temporal axioms as instances of the clause
+        # templates of temporal_clause_templates, compiled once per grid
+        # size (and location, heading for the at_location SSA)
+        self.axiom_templates = axiom_templates
+        # encoding of the at most one wumpus, heading and action constraints
+        # made by the clause generators (see at_most_one_clauses); the axiom
+        # strings use it for the at most one wumpus only, as their heading
+        # and action constraints are pairwise over a few literals
+        # (see initial_wumpus_axioms)
+        if amo_encoding != 'auto' and amo_encoding not in amo_encodings:
+            raise Exception("Unknown at-most-one encoding '{0}', expected one of: {1}".format(
+                amo_encoding, ', '.join(amo_encodings + ['auto'])))
+        self.amo_encoding = amo_encoding
+        # if True, the location is inferred by checking that the KB entails
+        # the one expected from the last action (see expected_location),
+        # and by querying every location only if it doesn't
+        self.track_location = track_location
+        # if True, the atemporal location propositions decided by the KB are
+        # kept in an AtemporalFactCache, and told back to the KB as units
+        self.cache_atemporal = cache_atemporal
+        # if True, OK<x>_<y>_<t> is queried only at the locations where it can
+        # be entailed and is not yet known (see query_OK_locations)
+        self.frontier_queries = frontier_queries
+        # if > 0, replace the KB with a summary of what it entails about the
+        # current time step (see compact_kb) every compact_every steps
+        self.compact_every = compact_every
+        # if not None, seconds (of wall clock time) each step should take:
+        # past this deadline the agent stops querying the KB and plans with
+        # what it knows (see agent_program)
+        if step_budget is not None and step_budget <= 0:
+            raise Exception("Step budget must be positive, got {0}".format(step_budget))
+        self.step_budget = step_budget
+        # Tracer of the events of the agent loop (see wumpus_trace): by
+        # default, printed to the console at the trace level if verbose
+        if tracer is None:
+            tracer = console_tracer() if verbose else null_tracer
+        self.tracer = tracer
         super(HybridWumpusAgent, self).__init__(self.agent_program, heading, environment, verbose)
 
     def reset(self):
@@ -99,6 +508,31 @@ class HybridWumpusAgent(Explorer):
                           for x in range(1,self.width+1)
                           for y in range(1,self.height+1)]
         self.kb = self.create_wumpus_KB()
+        # time of the last compact_kb, and the steps since whose location
+        # was not inferred (see compact_kb)
+        self.last_compaction = 0
+        self.unlocated_times = []
+        # last action taken, and number of times the location was (not)
+        # confirmed as expected (see infer_and_set_belief_location)
+        self.last_action = None
+        self.location_tracker_hits = 0
+        self.location_tracker_misses = 0
+        self.atemporal_cache = AtemporalFactCache() if self.cache_atemporal else None
+        # locations believed visited so far, locations known to be OK (which
+        # they then stay), and number of OK queries made
+        self.visited = set()
+        self.settled_OK = set()
+        self.OK_queries = 0
+        # deadline of the current step, the deadline tier hit this step if
+        # any, and number of steps each tier was hit (see past_deadline);
+        # the OK locations left unqueried by the deadline, the number of
+        # Wait actions taken for it, and whether the last action was one
+        self.deadline = None
+        self.deadline_tier = None
+        self.deadline_tiers = dict((tier, 0) for tier in deadline_tiers)
+        self.unqueried_OK = set()
+        self.holds = 0
+        self.held = False
         if self.verbose:
             self.number_of_clauses_over_epochs = []
             # current location is queried at each epoch, so collecting
@@ -107,106 +541,345 @@ class HybridWumpusAgent(Explorer):
             self.belief_loc_query_times = []
 
     def create_wumpus_KB(self):
-        if self.verbose:
-            print "HWA.create_wumpus_KB(): adding initial wumpus axioms"
-        axioms = initial_wumpus_axioms(self.belief_location[0],self.belief_location[1],
-                                       self.width,self.height,
-                                       self.heading_str(self.belief_heading))
-        if self.verbose:
-            start_time = clock()
-            print "    total number of axioms={0}".format(len(axioms))
-        kb = PropKB_SAT()
-        for sentence in axioms:
-            kb.tell(sentence)
-        if self.keep_axioms:
-            kb.axioms = axioms
-        if self.verbose:
-            end_time = clock()
-            print "    total number of clauses={0}".format(len(kb.clauses))
-            print "          >>> time elapsed: {0}".format(end_time-start_time)
+        tracer = self.tracer
+        if tracer.debug: start_time = clock()
+        if self.cnf_axioms:
+            axioms = initial_wumpus_clauses(self.belief_location[0],self.belief_location[1],
+                                            self.width,self.height,
+                                            self.heading_str(self.belief_heading),
+                                            self.amo_encoding)
+        else:
+            axioms = initial_wumpus_axioms(self.belief_location[0],self.belief_location[1],
+                                           self.width,self.height,
+                                           self.heading_str(self.belief_heading),
+                                           self.amo_encoding)
+        kb = self.new_KB()
+        if self.cnf_axioms:
+            kb.tell_literal_clauses(axioms)
+            if self.keep_axioms:
+                kb.axioms = map(clause_str, axioms)
+        else:
+            for sentence in axioms:
+                kb.tell(sentence)
+            if self.keep_axioms:
+                kb.axioms = axioms
+        if tracer.debug:
+            tracer.event(DEBUG, 'kb.create', 0, axioms=len(axioms), clauses=len(kb.clauses),
+                         dropped=kb.clause_index, known=kb.known_literals,
+                         seconds=clock()-start_time)
         return kb
 
+    def new_KB(self):
+        """ An empty KB with the agent's solver options """
+        if self.incremental or self.sat_solver == 'session':
+            session = msat.MinisatSession()
+        else:
+            session = None
+        return PropKB_SAT(session=session, solver=self.sat_solver, workers=self.workers,
+                          definitional_cnf=self.definitional_cnf,
+                          dedup_clauses=self.dedup_clauses,
+                          propagate_units=self.propagate_units)
+
+    def compact_kb(self, percept):
+        """
+        Replace the KB by the clauses it entails about the current time step:
+        the atemporal axioms, the pit/wumpus/breeze/stench facts learned so
+        far, the location, heading, arrow and alive fluents at this time and
+        the percepts.  Only done if these fluents are all determined, and
+        so is the breeze and stench of every location the agent may have
+        been at in the steps of unlocated_times: the percepts of a step
+        whose location was not inferred tell them only as a disjunction
+        over those locations, which the summary would lose, but once they
+        are all determined it adds nothing to the unit facts kept.
+        Otherwise the KB is kept and False is returned.
+        Clauses about earlier time steps are dropped, so the KB stays about
+        the same size however long the game.
+        """
+        x, y = self.belief_location
+        heading = self.heading_str(self.belief_heading)
+        fluents = [expr(state_loc_str(x,y,self.time)),
+                   expr(add_time_stamp('Heading' + heading.capitalize(), self.time)),
+                   expr(state_have_arrow_str(self.time)),
+                   expr(state_wumpus_alive_str(self.time))]
+        atemporal = self.atemporal_symbols()
+        history = dict((t, [((i,j), expr(state_loc_str(i,j,t)))
+                            for i in range(1,self.width+1) for j in range(1,self.height+1)])
+                       for t in self.unlocated_times)
+        tracer = self.tracer
+        if tracer.info: start_time = clock()
+        values = self.kb.backbone(fluents + atemporal
+                                  + [query for queries in history.values() for loc, query in queries])
+        if values[fluents[0]] is not True or values[fluents[1]] is not True \
+           or values[fluents[2]] is None or values[fluents[3]] is None:
+            if tracer.debug:
+                tracer.event(DEBUG, 'kb.compact_skipped', self.time,
+                             reason='fluents not determined')
+            return False
+        # the locations the agent may have been at in the unlocated steps
+        unlocated = set()
+        for queries in history.values():
+            unlocated.update([loc for loc, query in queries if values[query] is True]
+                             or [loc for loc, query in queries if values[query] is not False])
+        if any(values[expr(prop(*loc))] is None
+               for loc in unlocated for prop in (breeze_str, stench_str)):
+            if tracer.debug:
+                tracer.event(DEBUG, 'kb.compact_skipped', self.time,
+                             reason='percepts at unknown locations not determined',
+                             locations=sorted(unlocated))
+            return False
+        clauses = atemporal_wumpus_clauses(self.initial_location[0],self.initial_location[1],
+                                           self.width,self.height,self.amo_encoding)
+        clauses += [(str(symbol) if values[symbol] else '~' + str(symbol),)
+                    for symbol in atemporal if values[symbol] is not None]
+        if self.atemporal_cache:
+            self.atemporal_cache.record(dict((symbol, values[symbol]) for symbol in atemporal))
+        clauses += clause_generator_only_in_one_location(x,y,1,self.width,1,self.height,self.time)
+        clauses += clause_generator_only_one_heading(heading,self.time)
+        clauses += [(str(symbol) if values[symbol] else '~' + str(symbol),)
+                    for symbol in fluents[2:]]
+        clauses += clause_generator_percept_sentence(self.time, percept)
+        clauses_before = len(self.kb.clauses)
+        self.kb = self.new_KB()
+        self.kb.tell_literal_clauses(clauses)
+        if self.keep_axioms:
+            self.kb.axioms = map(clause_str, clauses)
+        self.last_compaction = self.time
+        self.unlocated_times = []
+        if tracer.info:
+            tracer.event(INFO, 'kb.compact', self.time, before=clauses_before,
+                         after=len(self.kb.clauses), seconds=clock()-start_time)
+        return True
+
     def make_percept_sentence(self, raw_percepts):
         sentence = axiom_generator_percept_sentence(self.time,raw_percepts)
-        if self.verbose: print "   HWA.make_percept_sentence(): {0}".format(sentence)
+        if self.tracer.info:
+            self.tracer.event(INFO, 'percepts', self.time, sentence=sentence)
         return sentence
 
     def add_temporal_axioms(self):
-        if self.verbose: print "       HWA.add_temporal_axioms()"
+        if self.axiom_templates:
+            return self.add_template_clauses()
+        if self.cnf_axioms:
+            return self.add_temporal_clauses()
+        tracer = self.tracer
+        counts = {}
         axioms = generate_square_OK_axioms(self.time,1,self.width,1,self.height)
-        if self.verbose:
-            ax_so_far = len(axioms)
-            print "           number of location_OK axioms:         {0}".format(ax_so_far)
+        if tracer.debug: counts['location_OK'] = len(axioms)
         axioms += generate_breeze_percept_and_location_axioms(self.time,1,self.width,1,self.height)
         axioms += generate_stench_percept_and_location_axioms(self.time,1,self.width,1,self.height)
-        if self.verbose:
-            new_ax_so_far = len(axioms)
-            perc_to_loc = new_ax_so_far - ax_so_far
-            print "           number of percept_to_loc axioms:      {0}".format(perc_to_loc)
-            ax_so_far = new_ax_so_far
-        axioms += generate_at_location_ssa(self.time,self.belief_location[0],self.belief_location[1],
-                                           1,self.width,1,self.height,
-                                           self.heading_str(self.belief_heading))
-        if self.verbose:
-            new_ax_so_far = len(axioms)
-            local_loc_at = new_ax_so_far - ax_so_far
-            print "           number of at_location ssa axioms:     {0}".format(local_loc_at)
-            ax_so_far = new_ax_so_far
+        if tracer.debug: counts['percept_to_loc'] = len(axioms) - sum(counts.values())
+        if self.full_location_ssa:
+            axioms += generate_full_at_location_ssa(self.time,1,self.width,1,self.height)
+        else:
+            axioms += generate_at_location_ssa(self.time,self.belief_location[0],self.belief_location[1],
+                                               1,self.width,1,self.height,
+                                               self.heading_str(self.belief_heading))
+        if tracer.debug: counts['at_location_ssa'] = len(axioms) - sum(counts.values())
         axioms += generate_non_location_ssa(self.time)
-        if self.verbose:
-            new_ax_so_far = len(axioms)
-            remaining_ssa_at_time = new_ax_so_far - ax_so_far
-            print "           number of non-location ssa axioms:    {0}".format(remaining_ssa_at_time)
-            ax_so_far = new_ax_so_far
+        if tracer.debug: counts['non_location_ssa'] = len(axioms) - sum(counts.values())
         axioms += generate_mutually_exclusive_axioms(self.time)
-        if self.verbose:
-            new_ax_so_far = len(axioms)
-            mutually_exclusive = new_ax_so_far - ax_so_far
-            print "           number of mutually_exclusive axioms:  {0}".format(mutually_exclusive)
-        
-        if self.verbose: print "       Total number of axioms being added:  {0}".format(len(axioms))
-        
+        if tracer.debug:
+            counts['mutually_exclusive'] = len(axioms) - sum(counts.values())
+            tracer.event(DEBUG, 'axioms.add', self.time, kind='axioms', total=len(axioms),
+                         **counts)
+
         for sentence in axioms:
             self.kb.tell(sentence)
         if self.keep_axioms:
             self.kb.axioms += axioms
 
+    def add_temporal_clauses(self):
+        """ As add_temporal_axioms, but with the wumpus_kb clause generators """
+        clauses = temporal_clauses(self.time,self.belief_location[0],self.belief_location[1],
+                                   self.width,self.height,
+                                   self.heading_str(self.belief_heading),
+                                   self.full_location_ssa,self.amo_encoding)
+        if self.tracer.debug:
+            self.tracer.event(DEBUG, 'axioms.add', self.time, kind='clauses',
+                              total=len(clauses))
+        self.kb.tell_literal_clauses(clauses)
+        if self.keep_axioms:
+            self.kb.axioms += map(clause_str, clauses)
+
+    def add_template_clauses(self):
+        """ As add_temporal_clauses, with the temporal_clause_templates """
+        templates = temporal_clause_templates(self.belief_location[0],self.belief_location[1],
+                                              self.width,self.height,
+                                              self.heading_str(self.belief_heading),
+                                              self.full_location_ssa,self.amo_encoding)
+        if self.tracer.debug:
+            self.tracer.event(DEBUG, 'axioms.add', self.time, kind='templates',
+                              total=sum(map(len, templates)))
+        for template in templates:
+            self.kb.tell_template_clauses(template, self.time)
+            if self.keep_axioms:
+                self.kb.axioms += map(clause_str, template.literal_clauses(self.time))
+
     def wumpus_alive_query(self):
-        if self.verbose:
-            print "       Ask if Wumpus is Alive:"
+        """ Whether the wumpus is alive, or None if unknown (which it should
+        not be) """
         query = expr(state_wumpus_alive_str(self.time))
-        result = self.kb.ask(query)
-        if self.verbose:
-            if result == None:
-                print "         Is Wumpus Alive? : Unknown!   (This should be known)"
-            else:
-                print "         Is Wumpus Alive? : {0}".format(result)
+        return self.kb.ask(query)
+
+    def query_locations(self, proposition_str, known=None, locations=None):
+        """
+        Answer the query proposition_str(x,y) at every location, with one
+        backbone computation over the KB rather than an ask per location.
+        known := optional function of x,y giving the answer at x,y where it
+                 is known without the KB, else None
+        locations := the locations to query, if not all of them
+        Returns a list of ((x,y), <query>, <result as from kb.ask>).
+        """
+        if locations is None:
+            locations = [(x,y)
+                         for x in range(1,self.width+1)
+                         for y in range(1,self.height+1)]
+        queries = [expr(proposition_str(x,y)) for x,y in locations]
+        results = {}
+        if known:
+            for (x,y), query in zip(locations, queries):
+                value = known(x,y)
+                if value is not None:
+                    results[query] = value
+        results.update(self.ask_many_cached([query for query in queries
+                                             if query not in results]))
+        return [(loc, query, results[query]) for loc, query in zip(locations, queries)]
+
+    def ask_many_cached(self, queries):
+        """
+        kb.ask_many(<queries>), with the atemporal location propositions
+        answered by the atemporal_cache where it can.  Those newly decided
+        are added to the cache, and told to the KB as unit clauses so that
+        later SAT tests start from them.
+        """
+        cache = self.atemporal_cache
+        if cache is None:
+            return self.kb.ask_many(queries)
+        results, unknown = cache.answer(queries)
+        if unknown:
+            answers = self.kb.ask_many(unknown)
+            literals = cache.record(answers)
+            if literals:
+                self.kb.tell_entailed_units(literals)
+                if self.keep_axioms:
+                    self.kb.axioms += literals
+            results.update(answers)
+        return results
+
+    def harvest_atemporal_facts(self):
+        """ Add the atemporal location propositions that are known literals
+        of the KB (see PropKB_SAT.propagate_units) to the atemporal_cache;
+        this takes no SAT tests """
+        if not self.atemporal_cache or not self.kb.known_literals:
+            return
+        self.atemporal_cache.record(dict((symbol, self.kb.known_value(symbol))
+                                         for symbol in self.atemporal_symbols()))
+
+    def atemporal_symbols(self):
+        return [expr(prop(x,y))
+                for prop in (pit_str, wumpus_str, breeze_str, stench_str)
+                for x in range(1,self.width+1)
+                for y in range(1,self.height+1)]
+
+    def query_OK_locations(self):
+        """
+        query_locations for OK<x>_<y>_<t>.  With frontier_queries, only the
+        frontier is queried: the visited locations and their neighbors, but
+        for those in settled_OK.  Once OK, a location stays OK (the wumpus
+        never comes back to life), so these are carried over as True.
+        Any other location is answered None (unknown) without a query, as
+        the KB can't decide its pit, and can decide its wumpus only if all
+        other locations are known to have none.  That can't be unless it is
+        the only location off the frontier, so then it is queried too.
+        With a step deadline, the locations are queried nearest first, by
+        distance from the belief location; those farther than its neighbors
+        are left unqueried (None, and in unqueried_OK) once it has passed.
+        """
+        ok_str = lambda x,y: state_OK_str(x,y,self.time)
+        known = self.atemporal_cache.ok_value if self.atemporal_cache else None
+        locations = [(x,y)
+                     for x in range(1,self.width+1)
+                     for y in range(1,self.height+1)]
+        if self.frontier_queries:
+            frontier = set()
+            for (x,y) in self.visited:
+                frontier.update(neighbors_in_bounds(x,y,1,self.width,1,self.height))
+            frontier.update(self.visited)
+            off_frontier = [loc for loc in locations if loc not in frontier]
+            if len(off_frontier) == 1:
+                frontier.update(off_frontier)
+            pending = [loc for loc in locations
+                       if loc in frontier and loc not in self.settled_OK]
+        else:
+            pending = locations
+        if self.deadline is None:
+            rings = [pending]
+        else:
+            bx, by = self.belief_location
+            distance = dict(((x,y), max(1, abs(x - bx) + abs(y - by))) for x,y in pending)
+            rings = [[loc for loc in pending if distance[loc] == d]
+                     for d in sorted(set(distance.values()))]
+        self.unqueried_OK = set()
+        results = {}
+        for i, ring in enumerate(rings):
+            if i > 0 and self.past_deadline('OK'):
+                for unqueried in rings[i:]:
+                    self.unqueried_OK.update(unqueried)
+                break
+            self.OK_queries += len(ring)
+            for loc, query, result in self.query_locations(ok_str, known, ring):
+                results[loc] = (query, result)
+                if result and self.frontier_queries:
+                    self.settled_OK.add(loc)
+        return [(loc,) + results[loc] if loc in results
+                else (loc, expr(ok_str(*loc)), True if loc in self.settled_OK else None)
+                for loc in locations]
+
+    def known_locations(self, proposition_str):
+        """
+        As query_locations, for an atemporal proposition_str, but answered
+        without SAT tests: from the atemporal_cache and the KB known
+        literals, else None.
+        """
+        locations = [(x,y)
+                     for x in range(1,self.width+1)
+                     for y in range(1,self.height+1)]
+        queries = [expr(proposition_str(x,y)) for x,y in locations]
+        results = {}
+        if self.atemporal_cache:
+            results, unknown = self.atemporal_cache.answer(queries)
+        return [(loc, query, results[query] if query in results
+                 else self.kb.known_value(query))
+                for loc, query in zip(locations, queries)]
+
+    def past_deadline(self, tier):
+        """ True if the deadline of this step (see step_budget) has passed.
+        The first time it is found passed in a step, <tier> (in
+        deadline_tiers) is counted in deadline_tiers as where it was hit. """
+        if self.deadline is None or wall_clock() < self.deadline:
+            return False
+        if self.deadline_tier is None:
+            self.deadline_tier = tier
+            self.deadline_tiers[tier] += 1
+            if self.tracer.info:
+                self.tracer.event(INFO, 'deadline', self.time, tier=tier,
+                                  late=wall_clock() - self.deadline)
+        return True
 
     def find_OK_locations(self):
-        if self.verbose:
-            print "     HWA.find_OK_locations()"
-            
-            self.wumpus_alive_query()
-            
-            display_env = WumpusEnvironment(self.width, self.height)
+        tracer = self.tracer
+        if tracer.debug:
+            tracer.event(DEBUG, 'wumpus_alive', self.time, alive=self.wumpus_alive_query())
             start_time = clock()
-        safe_loc = []
-        for x in range(1,self.width+1):
-            for y in range(1,self.height+1):
-                query = expr(state_OK_str(x,y,self.time))
-                result = self.kb.ask(query)
-                if result:
-                    safe_loc.append((x,y))
-                if self.verbose:
-                    if result == None:
-                        display_env.add_thing(Proposition(query,'?'),(x,y))
-                    else:
-                        display_env.add_thing(Proposition(query,result),(x,y))
-        if self.verbose:
-            end_time = clock()
-            print "          >>> time elapsed while making OK location queries:" \
-                  + " {0}".format(end_time-start_time)
-            print display_env.to_string(self.time, title="Find OK locations queries")
+        results = self.query_OK_locations()
+        safe_loc = [(x,y) for (x,y), query, result in results if result]
+        if tracer.debug:
+            tracer.event(DEBUG, 'query.OK', self.time, locations=safe_loc,
+                         seconds=clock()-start_time)
+        if tracer.trace:
+            tracer.grid(TRACE, 'grid.OK', self.time, self.width, self.height,
+                        [(x, y, query, result) for (x,y), query, result in results],
+                        title="Find OK locations queries")
         return safe_loc
 
     def update_unvisited_locations(self):
@@ -217,217 +890,220 @@ class HybridWumpusAgent(Explorer):
             (rather than from the beginning of time)
         Could make even more efficient by making no inference at all, by
         keeping track of current belief location and just subtracting that
-        from self.unvisited.  But what's the fun in that ??! """
-        if self.verbose:
-            print "     HWA.update_unvisited_locations()"
-            display_env = WumpusEnvironment(self.width, self.height)
-            already_visited = [(x,y)
-                               for x in range(1,self.width+1)
-                               for y in range(1,self.height+1)
-                               if (x,y) not in self.unvisited]
-            for vis_loc in already_visited:
-                display_env.add_thing(Proposition(expr('~Vis'),'T'),(x,y))
-            start_time = clock()
-        for (x,y) in self.unvisited:
-            query = expr(state_loc_str(x,y,self.time))
-            vis_query_result = self.kb.ask(query)
-            if vis_query_result:
-                self.unvisited.remove((x,y))
-        if self.verbose:
-            end_time = clock()
-            print "          >>> time elapsed while making unvisited locations" \
-                  + " queries: {0}".format(end_time-start_time)
-            for vis_loc in self.unvisited:
-                display_env.add_thing(Proposition(expr('~Vis'),'F'),(x,y))
+        from self.unvisited.  But what's the fun in that ??!
+        (Which is done past the step deadline: the visited belief locations
+        are subtracted.) """
+        tracer = self.tracer
+        if tracer.debug: start_time = clock()
+        if self.past_deadline('planning'):
+            self.unvisited = [loc for loc in self.unvisited if loc not in self.visited]
+        else:
+            queries = dict(((x,y), expr(state_loc_str(x,y,self.time)))
+                           for (x,y) in self.unvisited)
+            results = self.kb.ask_many(queries.values())
+            self.unvisited = [loc for loc in self.unvisited if not results[queries[loc]]]
+        if tracer.debug:
+            tracer.event(DEBUG, 'query.unvisited', self.time, locations=self.unvisited,
+                         seconds=clock()-start_time)
         return self.unvisited
 
-    def display_locations_utility(self, locations, prop=state_loc_str,
-                                  title="Safe univisited locations:"):
-        display_env = WumpusEnvironment(self.width, self.height)
-        for x,y in locations:
-            if isinstance(prop,str):
-                loc_prop = prop + '{0}'.format((x,y,self.time))
-            else:
-                loc_prop = expr(prop(x,y,self.time))
-            display_env.add_thing(Proposition(loc_prop,'T'),(x,y))
-        print display_env.to_string(self.time, title=title)
-
     def find_possible_wumpus_locations(self):
-        if self.verbose:
-            print "     HWA.find_possible_wumpus_locations()"
-            display_env = WumpusEnvironment(self.width, self.height)
-            start_time = clock()
-        possible_wumpus_loc = []
-        for x in range(1,self.width+1):
-            for y in range(1,self.height+1):
-                query = expr(wumpus_str(x,y))
-                result = self.kb.ask(query)
-                if result != False:
-                    possible_wumpus_loc.append((x,y))
-                if self.verbose:
-                    if result == None:
-                        display_env.add_thing(Proposition(query,'?'),(x,y))
-                    else:
-                        display_env.add_thing(Proposition(query,result),(x,y))
-        if self.verbose:
-            end_time = clock()
-            print "          >>> time elapsed while making possible wumpus location queries:" \
-                  + " {0}".format(end_time-start_time)
-            print display_env.to_string(self.time, title="Possible Wumpus Location queries")
-            print "Possible locations: {0}".format(possible_wumpus_loc)
+        tracer = self.tracer
+        if tracer.debug: start_time = clock()
+        if self.past_deadline('planning'):
+            results = self.known_locations(wumpus_str)
+        else:
+            results = self.query_locations(wumpus_str)
+        possible_wumpus_loc = [(x,y) for (x,y), query, result in results if result != False]
+        if tracer.debug:
+            tracer.event(DEBUG, 'query.wumpus', self.time, locations=possible_wumpus_loc,
+                         seconds=clock()-start_time)
+        if tracer.trace:
+            tracer.grid(TRACE, 'grid.wumpus', self.time, self.width, self.height,
+                        [(x, y, query, result) for (x,y), query, result in results],
+                        title="Possible Wumpus Location queries")
         return possible_wumpus_loc
 
     def find_not_unsafe_locations(self):
-        if self.verbose:
-            print "   HWA.find_not_unsafe_locations()"
-            display_env = WumpusEnvironment(self.width, self.height)
-            start_time = clock()
-        not_unsafe = []
-        for x in range(1,self.width+1):
-            for y in range(1,self.height+1):
-                query = expr(state_OK_str(x,y,self.time))
-                result = self.kb.ask(query)
-                if result != False:
-                    not_unsafe.append((x,y))
-                if self.verbose:
-                    if result != False:
-                        if result == None:
-                            display_env.add_thing(Proposition(query,'?'),(x,y))
-                        else:
-                            display_env.add_thing(Proposition(query,'T'),(x,y))
-        if self.verbose:
-            end_time = clock()
-            print "          >>> time elapsed while making not unsafe location queries:" \
-                  + " {0}".format(end_time-start_time)
-            print display_env.to_string(self.time, title="Not Unsafe Location queries")
-            # print "Not Unsafe locations: {0}".format(not_unsafe)
+        tracer = self.tracer
+        if tracer.debug: start_time = clock()
+        results = self.query_OK_locations()
+        # (the locations left unqueried by the deadline may be unsafe)
+        not_unsafe = [(x,y) for (x,y), query, result in results
+                      if result != False and (x,y) not in self.unqueried_OK]
+        if tracer.debug:
+            tracer.event(DEBUG, 'query.not_unsafe', self.time, locations=not_unsafe,
+                         seconds=clock()-start_time)
+        if tracer.trace:
+            tracer.grid(TRACE, 'grid.not_unsafe', self.time, self.width, self.height,
+                        [(x, y, query, result) for (x,y), query, result in results
+                         if result != False],
+                        title="Not Unsafe Location queries")
         return not_unsafe
 
-    def infer_and_set_belief_location(self):
-        if self.verbose: start_time = clock()
+    def expected_location(self, percept):
+        """ Where the last action should have taken the agent: ahead of the
+        belief location if it moved Forward and felt no Bump, else the
+        belief location """
+        x, y = self.belief_location
+        if self.last_action == action_forward_str(None) and not percept[3]:
+            dx, dy = dict(heading_moves)[self.heading_str(self.belief_heading).capitalize()]
+            if 1 <= x + dx <= self.width and 1 <= y + dy <= self.height:
+                return (x + dx, y + dy)
+        return (x, y)
+
+    def infer_and_set_belief_location(self, percept=None):
+        """ Set the belief location to the one location the KB entails the
+        agent is at.  With track_location (and the <percept>), the expected
+        location is checked first, and every location is queried only if
+        the KB doesn't entail it. """
+        tracer = self.tracer
+        timed = tracer.info or self.verbose
+        if timed: start_time = clock()
+        if self.track_location and percept is not None:
+            x, y = self.expected_location(percept)
+            if self.kb.entails(expr(state_loc_str(x,y,self.time))):
+                self.location_tracker_hits += 1
+                self.belief_location = (x,y)
+                if timed:
+                    self.record_belief_location('tracked', clock()-start_time)
+                return
+            self.location_tracker_misses += 1
+            if tracer.debug:
+                tracer.event(DEBUG, 'location.untracked', self.time, expected=(x,y))
         self.belief_location = None
-        for x in range(1,self.width+1):
-            for y in range(1,self.height+1):
-                query = expr(state_loc_str(x,y,self.time))
-                result = self.kb.ask(query)
-                if result:
-                    self.belief_location = loc_proposition_to_tuple('{0}'.format(query))
+        for (x,y), query, result in \
+                self.query_locations(lambda x,y: state_loc_str(x,y,self.time)):
+            if result:
+                self.belief_location = loc_proposition_to_tuple('{0}'.format(query))
         if not self.belief_location:
-            if self.verbose:
-                print "        --> FAILED TO INFER belief location, assuming at initial location (entrance)."
+            if tracer.info:
+                tracer.event(INFO, 'location.failed', self.time, assumed=self.initial_location)
+            self.unlocated_times.append(self.time)
             self.belief_location = self.initial_location
+        if timed:
+            self.record_belief_location('inferred', clock()-start_time)
+
+    def record_belief_location(self, how, seconds):
+        """ Keep the time the belief location took (if verbose), and
+        trace it (at info level) """
         if self.verbose:
-            end_time = clock()
-            print "        Current believed location (inferred): {0}".format(self.belief_location)
-            print "          >>> time elapsed while making current location queries:" \
-                  + " {0}".format(end_time-start_time)
-            self.belief_loc_query_times.append(end_time-start_time)
+            self.belief_loc_query_times.append(seconds)
+        if self.tracer.info:
+            self.tracer.event(INFO, 'location', self.time, location=self.belief_location,
+                              how=how, seconds=seconds)
 
     def infer_and_set_belief_heading(self):
+        tracer = self.tracer
         self.belief_heading = None
-        if self.verbose: start_time = clock()
-        if self.kb.ask(expr(state_heading_north_str(self.time))):
-            self.belief_heading = Explorer.heading_str_to_num['north']
-        elif self.kb.ask(expr(state_heading_west_str(self.time))):
-            self.belief_heading = Explorer.heading_str_to_num['west']
-        elif self.kb.ask(expr(state_heading_south_str(self.time))):
-            self.belief_heading = Explorer.heading_str_to_num['south']
-        elif self.kb.ask(expr(state_heading_east_str(self.time))):
-            self.belief_heading = Explorer.heading_str_to_num['east']
-
+        if tracer.info: start_time = clock()
+        headings = [('north', state_heading_north_str(self.time)),
+                    ('west', state_heading_west_str(self.time)),
+                    ('south', state_heading_south_str(self.time)),
+                    ('east', state_heading_east_str(self.time))]
+        results = self.kb.ask_many([query for heading, query in headings])
+        for heading, query in headings:
+            if results[query]:
+                self.belief_heading = Explorer.heading_str_to_num[heading]
+                break
         else:
-            print "        --> FAILED TO INFER belief heading, assuming initial heading."
+            if tracer.info:
+                tracer.event(INFO, 'heading.failed', self.time,
+                             assumed=self.heading_str(self.initial_heading))
             self.belief_heading = self.initial_heading
-            
-        if self.verbose:
-            end_time = clock()
-            print "        Current inferred heading: {0}".format(self.heading_str(self.belief_heading))
-            print "          >>> time elapsed while making belief heading queries:" \
-                  + "{0}".format(end_time-start_time)
-            
+
+        if tracer.info:
+            tracer.event(INFO, 'heading', self.time, heading=self.heading_str(self.belief_heading),
+                         seconds=clock()-start_time)
 
     def agent_program(self, percept):
         " Implementation of Hybrid-Wumpus-Agent of [Fig. 7.20], p.270 "
-        if self.verbose: print "HWA.agent_program(): at time {0}".format(self.time)
-        
+        tracer = self.tracer
+        if self.step_budget is not None:
+            self.deadline = wall_clock() + self.step_budget
+            self.deadline_tier = None
+
         percept_sentence = self.make_percept_sentence(percept)
-        if self.verbose:
-            print "     HWA.agent_program(): kb.tell(percept_sentence):"
-            print "         {0}".format(percept_sentence)
         self.kb.tell(percept_sentence) # update the agent's KB based on percepts
         if self.keep_axioms:
             self.kb.axioms.append(percept_sentence)
 
         # update belief location and heading based on current KB knowledge state
-        if self.verbose: print "     HWA.infer_and_set_belief_location()"
-        self.infer_and_set_belief_location()
-        if self.verbose: print "     HWA.infer_and_set_belief_heading()"
+        self.infer_and_set_belief_location(percept)
+        self.visited.add(self.belief_location)
         self.infer_and_set_belief_heading()
 
-        if self.verbose:
-            clauses_before = len(self.kb.clauses)
-            print "     HWA.agent_program(): Prepare to add temporal axioms"
-            print "         Number of clauses in KB before: {0}".format(clauses_before)
+        # (compaction can wait for a step with time to spare)
+        late = self.past_deadline('belief')
+        if self.compact_every and self.time - self.last_compaction >= self.compact_every \
+           and not late:
+            self.compact_kb(percept)
+
+        if tracer.debug: clauses_before = len(self.kb.clauses)
         self.add_temporal_axioms()
+        self.harvest_atemporal_facts()
+        if tracer.debug:
+            tracer.event(DEBUG, 'kb.size', self.time, before=clauses_before,
+                         after=len(self.kb.clauses), dropped=self.kb.clause_index,
+                         known=self.kb.known_literals,
+                         known_literal_hits=self.kb.known_literal_hits,
+                         atemporal=self.atemporal_cache)
         if self.verbose:
-            clauses_after = len(self.kb.clauses)
-            print "         Number of clauses in KB after: {0}".format(clauses_after)
-            print "         Total clauses added to KB: {0}".format(clauses_after - clauses_before)
             self.number_of_clauses_over_epochs.append(len(self.kb.clauses))
 
         safe = None
+        # why the plan was made, for the trace
+        reason = 'continue'
 
         # If Glitter, Grab gold and leave
         if self.kb.ask(percept_glitter_str(self.time)):
-            if self.verbose: print "   HWA.agent_program(): Grab gold and leave!"
+            reason = 'grab'
             safe = self.find_OK_locations()
-            if self.verbose: start_time = clock()
+            if tracer.debug: start_time = clock()
             self.plan = [action_grab_str(None)] \
                         + plan_route(self.belief_location, self.belief_heading,
                                      [self.initial_location], safe) \
                         + [action_climb_str(None)]
-            if self.verbose:
-                end_time = clock()
-                print "          >>> time elapsed while executing plan_route():" \
-                      + " {0}".format(end_time-start_time)
+            if tracer.debug:
+                tracer.event(DEBUG, 'plan_route', self.time, seconds=clock()-start_time)
 
         # Update safe locations only if we don't have a plan
-        if self.plan:
-            if self.verbose:
-                print "   HWA.agent_program(): Already have plan" \
-                      + " (with {0} actions left),".format(len(self.plan)) \
-                      + " continue executing..."
-        elif safe == None:
-            if self.verbose: print "   HWA.agent_program(): No current plan, find one..."
+        if not self.plan and safe == None:
             safe = self.find_OK_locations()
 
         # Visit unvisited safe square
         if not self.plan:
-            if self.verbose: print "   HWA.agent_program(): Plan to visit safe square..."
+            reason = 'visit'
             unvisited = self.update_unvisited_locations() # find_unvisited_locations()
             safe_unvisited = list(set(unvisited).intersection(set(safe)))
-            if self.verbose:
-                self.display_locations_utility(safe_unvisited, prop=state_loc_str,
-                                               title="Safe univisited locations:")
-                start_time = clock()
+            if tracer.trace:
+                tracer.grid(TRACE, 'grid.safe_unvisited', self.time, self.width, self.height,
+                            [(x, y, expr(state_loc_str(x,y,self.time)), True)
+                             for x,y in safe_unvisited],
+                            title="Safe univisited locations:")
+            if tracer.debug: start_time = clock()
             self.plan = plan_route(self.belief_location, self.belief_heading, safe_unvisited, safe)
-            if self.verbose:
-                end_time = clock()
-                print "          >>> time elapsed while executing plan_route():" \
-                      + " {0}".format(end_time-start_time)
+            if tracer.debug:
+                tracer.event(DEBUG, 'plan_route', self.time, seconds=clock()-start_time)
+        # Past the deadline with OK locations left unqueried, rather than
+        # shoot, take a risk or leave on what is known, Wait and query
+        # further at the next step (the OK locations found carry over);
+        # but not twice in a row
+        if not self.plan and self.unqueried_OK and not self.held:
+            reason = 'hold'
+            self.plan = [action_wait_str(None)]
+            self.holds += 1
         # Shoot wumpus to try to clear path
         if not self.plan and self.kb.ask(expr(state_have_arrow_str(self.time))):
-            if self.verbose: print "   HWA.agent_program(): Plan to shoot wumpus..."
+            reason = 'shoot'
             possible_wumpus = self.find_possible_wumpus_locations()
-            if self.verbose: start_time = clock()
+            if tracer.debug: start_time = clock()
             self.plan = plan_shot(self.belief_location, self.belief_heading, possible_wumpus, safe)
-            if self.verbose:
-                end_time = clock()
-                print "          >>> time elapsed while executing plan_shot():" \
-                      + " {0}".format(end_time-start_time)
+            if tracer.debug:
+                tracer.event(DEBUG, 'plan_shot', self.time, seconds=clock()-start_time)
         # No safe choice, take risk with an unknown square
         if not self.plan:
-            if self.verbose: print "   HWA.agent_program(): No safe choice, take risk..."
+            reason = 'risk'
             not_unsafe = self.find_not_unsafe_locations()
 
             # print "univisited: ", unvisited
@@ -441,31 +1117,30 @@ class HybridWumpusAgent(Explorer):
 
             # print "safe_and_not_unsafe_unvisited", safe_and_not_unsafe_unvisited
             
-            if self.verbose: start_time = clock()
+            if tracer.debug: start_time = clock()
             self.plan = plan_route(self.belief_location, self.belief_heading, not_unsafe_unvisited,
                                    safe_and_not_unsafe_unvisited)
-            if self.verbose:
-                end_time = clock()
-                print "          >>> time elapsed while executing plan_route():" \
-                      + " {0}".format(end_time-start_time)
+            if tracer.debug:
+                tracer.event(DEBUG, 'plan_route', self.time, seconds=clock()-start_time)
         # No choices left, leave!
         if not self.plan:
-            if self.verbose:
-                print "   HWA.agent_program(): No choices left, leave!..."
-                start_time = clock()
+            reason = 'leave'
+            if tracer.debug: start_time = clock()
             self.plan = plan_route(self.belief_location, self.belief_heading,
                                    self.initial_location, safe) \
                         + [action_climb_str(None)]
-            if self.verbose:
-                end_time = clock()
-                print "          >>> time elapsed while executing plan_route():" \
-                      + " {0}".format(end_time-start_time)
+            if tracer.debug:
+                tracer.event(DEBUG, 'plan_route', self.time, seconds=clock()-start_time)
 
-        if self.verbose: print "   HWA.agent_program(): Plan:\n    {0}".format(self.plan)
+        if tracer.info:
+            tracer.event(INFO, 'plan', self.time, reason=reason, plan=self.plan)
 
         action = self.plan.pop(0) # take next action in plan
+        self.last_action = action
+        self.held = reason == 'hold'
 
-        if self.verbose: print "   HWA.agent_program(): Action: {0}".format(action)
+        if tracer.info:
+            tracer.event(INFO, 'action', self.time, action=action)
 
         # update KB with selected action
         self.kb.tell(add_time_stamp(action, self.time))
@@ -0,0 +1,912 @@
+# wumpus_benchmark.py
+# -------------------
+# Licensing Information:
+# Please DO NOT DISTRIBUTE OR PUBLISH solutions to this project.
+# You are free to use and extend these projects for EDUCATIONAL PURPOSES ONLY.
+# The Hunt The Wumpus AI project was developed at University of Arizona
+# by Clay Morrison (clayton@sista.arizona.edu), spring 2013.
+# This project extends the python code provided by Peter Norvig as part of
+# the Artificial Intelligence: A Modern Approach (AIMA) book example code;
+# see http://aima.cs.berkeley.edu/code.html
+# In particular, the following files come directly from the AIMA python
+# code: ['agents.py', 'logic.py', 'search.py', 'utils.py']
+# ('logic.py' has been modified by Clay Morrison in locations with the
+# comment 'CTM')
+# The file ['minisat.py'] implements a slim system call wrapper to the minisat
+# (see http://minisat.se) SAT solver, and is directly based on the satispy
+# python project, see https://github.com/netom/satispy .
+
+"""
+Benchmarks for the inference machinery behind HybridWumpusAgent.
+Run from the command line, e.g.:
+    python wumpus_benchmark.py -b solvers
+    python wumpus_benchmark.py -b solvers -l wumpus_4x4_book -s cdcl,minisat
+    python wumpus_benchmark.py -b ask_many
+    python wumpus_benchmark.py -b workers -w 1,4,16
+    python wumpus_benchmark.py -b transport
+    python wumpus_benchmark.py -b clause_store
+    python wumpus_benchmark.py -b axioms
+    python wumpus_benchmark.py -b parse
+    python wumpus_benchmark.py -b location_ssa
+    python wumpus_benchmark.py -b dedup
+    python wumpus_benchmark.py -b compact
+    python wumpus_benchmark.py -b propagate
+    python wumpus_benchmark.py -b amo
+    python wumpus_benchmark.py -b track
+    python wumpus_benchmark.py -b atemporal
+    python wumpus_benchmark.py -b frontier
+    python wumpus_benchmark.py -b trace
+    python wumpus_benchmark.py -b deadline
+"""
+
+from wumpus import *
+from distutils.spawn import find_executable
+import inspect
+import logic
+import re
+import time
+
+
+#-------------------------------------------------------------------------------
+# Agent KBs
+#-------------------------------------------------------------------------------
+
+class KBRecordingAgent(HybridWumpusAgent):
+    """
+    A quiet HybridWumpusAgent that keeps a copy of its KB clauses each time
+    the temporal axioms for a new time step have been added.
+    kb_snapshots := list of (<time>, <list of clauses>)
+    """
+
+    def __init__(self, heading='north', **kwargs):
+        kwargs.setdefault('verbose', False)
+        kwargs.setdefault('sat_solver', 'cdcl')
+        super(KBRecordingAgent, self).__init__(heading, **kwargs)
+
+    def reset(self):
+        self.kb_snapshots = []
+        super(KBRecordingAgent, self).reset()
+
+    def add_temporal_axioms(self):
+        super(KBRecordingAgent, self).add_temporal_axioms()
+        self.kb_snapshots.append((self.time, list(self.kb.clauses)))
+
+
+def run_agent_quietly(layout, agent, max_steps=100):
+    """
+    Run <agent> on <layout> without printing the environment at each step.
+    Returns a note describing how the run ended.
+    """
+    s = WumpusWorldScenario(layout_file=layout, agent=agent, trace=False)
+    try:
+        for step in range(max_steps):
+            if s.env.is_done():
+                return 'finished, score={0}'.format(agent.performance_measure)
+            s.env.step()
+    except Exception, e:
+        return 'stopped at time {0}: {1}: {2}'.format(agent.time, e.__class__.__name__, e)
+    return 'stopped after {0} steps'.format(max_steps)
+
+
+def collect_agent_kbs(layout, max_steps=100, **agent_options):
+    """
+    Play <layout> with a KBRecordingAgent (given <agent_options>), whose
+    kb_snapshots then hold the KB it built at each time step.
+    Returns (<agent>, <note on how the run ended>).
+    """
+    agent = KBRecordingAgent(**agent_options)
+    note = run_agent_quietly(layout, agent, max_steps)
+    return agent, note
+
+
+def kb_from_clauses(clauses, solver, **kwargs):
+    """
+    A PropKB_SAT holding <clauses> (already in cnf, so not re-converted).
+    solver := a name in sat_solvers, or 'session' for a msat.MinisatSession
+    kwargs := other PropKB_SAT options
+    """
+    if solver == 'session':
+        kb = PropKB_SAT(session=msat.MinisatSession(), **kwargs)
+    else:
+        kb = PropKB_SAT(solver=solver, **kwargs)
+    kb.tell_clauses(clauses)
+    return kb
+
+#-------------------------------------------------------------------------------
+# SAT solvers
+#-------------------------------------------------------------------------------
+
+def solver_available(name):
+    return name not in ('minisat', 'minisat_pipe') or find_executable('minisat') is not None
+
+
+def time_entailment_queries(clauses, queries, solver):
+    """
+    Seconds taken by <solver> to test KB & q and KB & ~q for each query.
+    solver := a name in sat_solvers, or 'session' for one msat.MinisatSession
+              (built inside the timed region) answering all of the queries
+    """
+    start = time.time()
+    if solver == 'session':
+        session = msat.MinisatSession(clauses)
+        for q in queries:
+            session.solve_assuming([[q], [~q]])
+    else:
+        for q in queries:
+            minisat_assuming(clauses, [[q], [~q]], solver=solver)
+    return time.time() - start
+
+
+def benchmark_solvers(layouts=('wumpus_4x4_book', 'wumpus_4x4_2'),
+                      solvers=('cdcl', 'session', 'minisat', 'dpll'),
+                      dpll_max_clauses=800, dpll_max_queries=1):
+    """
+    Compare the SAT solvers on the KBs the HybridWumpusAgent builds while
+    playing <layouts>.  At every time step each solver answers the
+    OK<x>_<y>_<t> queries that find_OK_locations makes, and the mean time
+    per query (two SAT tests) is reported.
+    logic.dpll is very slow, so it is only run on KBs with at most
+    <dpll_max_clauses> clauses, for at most <dpll_max_queries> queries each.
+    """
+    for name in solvers:
+        if not solver_available(name):
+            print "Skipping '{0}': not found on PATH".format(name)
+    solvers = filter(solver_available, solvers)
+    totals = dict((name, [0.0, 0]) for name in solvers)
+    for layout in layouts:
+        agent, note = collect_agent_kbs(layout)
+        print "Layout '{0}': {1} KBs (agent {2})".format(layout, len(agent.kb_snapshots), note)
+        print "   time  clauses  " + ''.join('{0:>12}'.format(name) for name in solvers) \
+              + "   (ms per query)"
+        for t, clauses in agent.kb_snapshots:
+            layout_queries = [expr(state_OK_str(x, y, t))
+                              for x in range(1, agent.width + 1)
+                              for y in range(1, agent.height + 1)]
+            row = '   {0:>4}  {1:>7}  '.format(t, len(clauses))
+            for name in solvers:
+                queries = layout_queries
+                if name == 'dpll':
+                    if len(clauses) > dpll_max_clauses:
+                        row += '{0:>12}'.format('-')
+                        continue
+                    queries = queries[:dpll_max_queries]
+                elapsed = time_entailment_queries(clauses, queries, name)
+                totals[name][0] += elapsed
+                totals[name][1] += len(queries)
+                row += '{0:>12.2f}'.format(1000 * elapsed / len(queries))
+            print row
+    print "Mean over all KBs (ms per query):"
+    for name in solvers:
+        elapsed, count = totals[name]
+        if count:
+            print "   {0:>8}: {1:.2f}  ({2} queries)".format(name, 1000 * elapsed / count, count)
+
+def benchmark_transport(layouts=('wumpus_4x4_book',),
+                        solvers=('minisat', 'minisat_pipe', 'cdcl'),
+                        calls=20, min_clauses=5000):
+    """
+    Per-call overhead of the solvers (e.g. temp files and a shell for
+    'minisat' against pipes for 'minisat_pipe'): mean time of one SAT test
+    of a KB holding a single clause, and of the first KB of at least
+    <min_clauses> clauses the HybridWumpusAgent builds playing <layouts>.
+    The agent keeps duplicate clauses and doesn't propagate units, as
+    these keep its KB well under <min_clauses>.
+    """
+    for name in solvers:
+        if not solver_available(name):
+            print "Skipping '{0}': not found on PATH".format(name)
+    solvers = filter(solver_available, solvers)
+    kbs = [('1 clause', [expr('A')])]
+    for layout in layouts:
+        agent, note = collect_agent_kbs(layout, dedup_clauses=False, propagate_units=False)
+        for t, clauses in agent.kb_snapshots:
+            if len(clauses) >= min_clauses:
+                kbs.append(("'{0}' t={1}".format(layout, t), clauses))
+                break
+        else:
+            raise Exception("Layout '{0}': no KB of {1} clauses (agent {2})".format(
+                layout, min_clauses, note))
+    print "   {0:<26}  clauses  ".format('KB') + ''.join('{0:>14}'.format(name) for name in solvers) \
+          + "   (ms per call)"
+    for title, clauses in kbs:
+        row = '   {0:<26}  {1:>7}  '.format(title, len(clauses))
+        for name in solvers:
+            kb = kb_from_clauses(clauses, name, model_cache_size=0)
+            kb.solve_assuming([[]]) # translate to Dimacs before timing
+            start = time.time()
+            for i in range(calls):
+                kb.solve_assuming([[]])
+            row += '{0:>14.2f}'.format(1000 * (time.time() - start) / calls)
+        print row
+
+#-------------------------------------------------------------------------------
+# KB representation
+#-------------------------------------------------------------------------------
+
+def expr_nbytes(e, seen=None):
+    """
+    Memory taken by Expr <e> and the Exprs under it.  Atoms are interned
+    (see logic.Expr), so one object is shared by every clause of a KB in
+    which it occurs: pass the same <seen> set (of ids) for all the clauses
+    of a KB to count each shared Expr once.
+    """
+    if seen is None:
+        seen = set()
+    if id(e) in seen:
+        return 0
+    seen.add(id(e))
+    return sys.getsizeof(e) + sys.getsizeof(e.__dict__) + sys.getsizeof(e.args) \
+           + sum(expr_nbytes(arg, seen) for arg in e.args)
+
+
+def benchmark_clause_store(layouts=('wumpus_4x4_book',)):
+    """
+    Compare, on the KBs the HybridWumpusAgent builds while playing
+    <layouts>, the list of Expr clauses (as PropKB keeps) and its
+    translation to Dimacs from scratch on every solve, against the
+    msat.ClauseStore of an incremental translator and the translation of
+    just the clauses told since the previous time step.
+    """
+    for layout in layouts:
+        agent, note = collect_agent_kbs(layout)
+        print "Layout '{0}': {1} KBs (agent {2})".format(layout, len(agent.kb_snapshots), note)
+        print "   time  clauses   bytes/clause: Expr  store" \
+              + "   ms to Dimacs: all Exprs  new clauses"
+        io = msat.AIMA_to_Dimacs_Translator()
+        for t, clauses in agent.kb_snapshots:
+            start = time.time()
+            msat.AIMA_to_Dimacs_Translator().to_dimacs_string(clauses)
+            full_time = time.time() - start
+
+            start = time.time()
+            io.add_clauses(clauses[len(io.int_clauses):])
+            io.dimacs_body()
+            delta_time = time.time() - start
+
+            seen = set()
+            expr_bytes = sum(expr_nbytes(clause, seen) for clause in clauses)
+            print '   {0:>4}  {1:>7}  {2:>18.1f}  {3:>5.1f}  {4:>23.2f}  {5:>11.2f}'.format(
+                t, len(clauses), float(expr_bytes) / len(clauses),
+                float(io.int_clauses.nbytes()) / len(clauses),
+                1000 * full_time, 1000 * delta_time)
+
+#-------------------------------------------------------------------------------
+# Axiom compilation
+#-------------------------------------------------------------------------------
+
+def time_axiom_strings(size, steps):
+    """ Seconds to tell a KB the initial, and <steps> of the temporal,
+    axiom strings of a <size> x <size> world """
+    start = time.time()
+    kb = PropKB_SAT(solver='cdcl')
+    for axiom in initial_wumpus_axioms(1, 1, size, size, 'east'):
+        kb.tell(axiom)
+    initial_time = time.time() - start
+    start = time.time()
+    for t in range(steps):
+        axioms = generate_square_OK_axioms(t, 1, size, 1, size)
+        axioms += generate_breeze_percept_and_location_axioms(t, 1, size, 1, size)
+        axioms += generate_stench_percept_and_location_axioms(t, 1, size, 1, size)
+        axioms += generate_at_location_ssa(t, 1, 1, 1, size, 1, size, 'east')
+        axioms += generate_non_location_ssa(t)
+        axioms += generate_mutually_exclusive_axioms(t)
+        for axiom in axioms:
+            kb.tell(axiom)
+    return initial_time, time.time() - start
+
+def benchmark_axioms(sizes=(4, 8, 16), steps=10):
+    """
+    Time to tell a KB the initial wumpus axioms and <steps> time steps of
+    temporal axioms for square worlds of <sizes>, as axiom strings (parsed
+    by expr and converted by to_cnf) against the clauses generated
+    directly by the wumpus_kb clause generators, and against instances of
+    the temporal_clause_templates (compiled once, in <compile> ms).
+    """
+    print "  size   initial ms: strings  clauses   temporal ms/step: strings  clauses" \
+          + "  templates  compile"
+    for size in sizes:
+        try:
+            initial_strings, temporal_strings = time_axiom_strings(size, steps)
+        except RuntimeError:
+            # expr and to_cnf recurse once per operand of the (flat) at
+            # most one wumpus axiom, which overflows the stack on big worlds
+            initial_strings = temporal_strings = float('nan')
+
+        start = time.time()
+        kb = PropKB_SAT(solver='cdcl')
+        kb.tell_literal_clauses(initial_wumpus_clauses(1, 1, size, size, 'east'))
+        initial_clauses = time.time() - start
+        start = time.time()
+        for t in range(steps):
+            kb.tell_literal_clauses(temporal_clauses(t, 1, 1, size, size, 'east'))
+        temporal_clauses_time = time.time() - start
+
+        temporal_templates.clear()
+        start = time.time()
+        templates = temporal_clause_templates(1, 1, size, size, 'east')
+        compile_time = time.time() - start
+        kb = PropKB_SAT(solver='cdcl')
+        kb.tell_literal_clauses(initial_wumpus_clauses(1, 1, size, size, 'east'))
+        start = time.time()
+        for t in range(steps):
+            for template in templates:
+                kb.tell_template_clauses(template, t)
+        temporal_templates_time = time.time() - start
+        print "  {0:>4}  {1:>19.1f}  {2:>7.1f}  {3:>25.1f}  {4:>7.1f}  {5:>9.1f}  {6:>7.1f}".format(
+            size, 1000 * initial_strings, 1000 * initial_clauses,
+            1000 * temporal_strings / steps, 1000 * temporal_clauses_time / steps,
+            1000 * temporal_templates_time / steps, 1000 * compile_time)
+
+def benchmark_amo(sizes=(4, 8, 16, 32), solvers=('cdcl', 'session'),
+                  encodings=tuple(amo_encodings)):
+    """
+    Size of the initial KB of square worlds of <sizes> with each encoding
+    of the at most one wumpus constraint (see at_most_one_clauses), the
+    time to build it (generate the clauses and tell a PropKB_SAT), and the
+    time per SAT test of asking whether there is a wumpus in the far corner
+    once a stench has been perceived next to the entrance.
+    """
+    print "  size  encoding    solver      clauses  aux symbols  build ms  ask ms"
+    for size in sizes:
+        for encoding in encodings:
+            for name in solvers:
+                start = time.time()
+                clauses = initial_wumpus_clauses(1, 1, size, size, 'east', encoding)
+                if name == 'session':
+                    kb = PropKB_SAT(session=msat.MinisatSession())
+                else:
+                    kb = PropKB_SAT(solver=name)
+                kb.tell_literal_clauses(clauses)
+                build_time = time.time() - start
+                kb.tell_literal_clauses([(stench_str(1, 1),)])
+                start = time.time()
+                kb.ask(wumpus_str(size, size))
+                ask_time = time.time() - start
+                print "  {0:>4}  {1:<10}  {2:<10}  {3:>7}  {4:>11}  {5:>8.1f}  {6:>6.1f}".format(
+                    size, encoding, name, len(kb.clauses), len(kb.translator.aux_symbols),
+                    1000 * build_time, 1000 * ask_time / 2)
+
+def benchmark_location_ssa(sizes=(4, 8, 16)):
+    """
+    Clauses and time for one time step of the full at_location SSA (every
+    location) of square worlds of <sizes>: converted by to_cnf, by
+    definitional CNF, and generated directly as clauses.
+    """
+    print "  size   clauses: to_cnf  definitional  generated" \
+          + "   ms: to_cnf  definitional  generated"
+    for size in sizes:
+        axioms = generate_full_at_location_ssa(0, 1, size, 1, size)
+        counts, times = [], []
+        for convert in (lambda a: conjuncts(to_cnf(a)),
+                        lambda a: conjuncts(to_cnf(a, definitional=True))):
+            start = time.time()
+            counts.append(sum(len(convert(axiom)) for axiom in axioms))
+            times.append(time.time() - start)
+        start = time.time()
+        counts.append(len(generate_full_at_location_ssa_clauses(0, 1, size, 1, size)))
+        times.append(time.time() - start)
+        print "  {0:>4}  {1:>14}  {2:>12}  {3:>9}  {4:>10.1f}  {5:>12.1f}  {6:>9.1f}".format(
+            size, *(counts + [1000 * t for t in times]))
+
+#-------------------------------------------------------------------------------
+# Clause deduplication
+#-------------------------------------------------------------------------------
+
+def benchmark_dedup(layouts=('wumpus_4x4_book',), solvers=('session', 'cdcl')):
+    """
+    Play <layouts> with the HybridWumpusAgent with and without dropping
+    duplicate and subsumed clauses (see msat.ClauseIndex): final KB size,
+    clauses dropped and run time, per SAT solver.
+    """
+    for layout in layouts:
+        print "Layout '{0}':".format(layout)
+        print "   solver        dedup  clauses  duplicate  tautological  subsumed  seconds  result"
+        for name in solvers:
+            for dedup in (False, True):
+                agent = HybridWumpusAgent('north', verbose=False, sat_solver=name,
+                                          dedup_clauses=dedup)
+                start = time.time()
+                note = run_agent_quietly(layout, agent)
+                elapsed = time.time() - start
+                index = agent.kb.clause_index
+                print "   {0:<12}  {1:<5}  {2:>7}  {3:>9}  {4:>12}  {5:>8}  {6:>7.2f}  {7}".format(
+                    name, str(dedup), len(agent.kb.clauses),
+                    index.duplicates if index else '-', index.tautologies if index else '-',
+                    index.subsumed if index else '-', elapsed, note)
+
+def benchmark_propagate(layouts=('wumpus_4x4_book',), solvers=('session', 'cdcl')):
+    """
+    Play <layouts> with the HybridWumpusAgent with and without the KB
+    keeping the literals known by unit propagation (see msat.KnownLiterals):
+    final KB size and literal count, known literals, queries answered by
+    them and run time, per SAT solver.
+    """
+    for layout in layouts:
+        print "Layout '{0}':".format(layout)
+        print "   solver        propagate  clauses  literals  known  answered  seconds  result"
+        for name in solvers:
+            for propagate in (False, True):
+                agent = HybridWumpusAgent('north', verbose=False, sat_solver=name,
+                                          propagate_units=propagate)
+                start = time.time()
+                note = run_agent_quietly(layout, agent)
+                elapsed = time.time() - start
+                known = agent.kb.known_literals
+                print "   {0:<12}  {1:<9}  {2:>7}  {3:>8}  {4:>5}  {5:>8}  {6:>7.2f}  {7}".format(
+                    name, str(propagate), len(agent.kb.clauses),
+                    len(agent.kb.translator.int_clauses.lits),
+                    len(known.literals) if known else '-',
+                    agent.kb.known_literal_hits, elapsed, note)
+
+
+def benchmark_track(layouts=('wumpus_4x4_book',), solvers=('session', 'cdcl')):
+    """
+    Play <layouts> with the HybridWumpusAgent with and without the location
+    tracker (see HybridWumpusAgent.infer_and_set_belief_location): SAT
+    tests made, locations confirmed by the tracker or not, and run time,
+    per SAT solver.
+    """
+    for layout in layouts:
+        print "Layout '{0}':".format(layout)
+        print "   solver        track  SAT tests  confirmed  scanned  seconds  result"
+        for name in solvers:
+            for track in (False, True):
+                agent = HybridWumpusAgent('north', verbose=False, sat_solver=name,
+                                          track_location=track)
+                msat.backend_stats.clear()
+                start = time.time()
+                note = run_agent_quietly(layout, agent)
+                elapsed = time.time() - start
+                stats = msat.backend_stats.get(name)
+                print "   {0:<12}  {1:<5}  {2:>9}  {3:>9}  {4:>7}  {5:>7.2f}  {6}".format(
+                    name, str(track), stats.calls if stats else 0,
+                    agent.location_tracker_hits, agent.location_tracker_misses, elapsed, note)
+
+
+def benchmark_atemporal(layouts=('wumpus_4x4_book',), solvers=('session', 'cdcl'), repeats=5):
+    """
+    Play <layouts> with the HybridWumpusAgent with and without its
+    AtemporalFactCache: SAT tests and run time, then SAT tests and time of
+    <repeats> rounds of the manual 'qpl' queries (P, W, B and S at every
+    location) on the final KB, and the cache statistics, per SAT solver.
+    """
+    for layout in layouts:
+        print "Layout '{0}':".format(layout)
+        print "   solver        cache  SAT tests  seconds  qpl SAT tests  qpl ms  cache"
+        for name in solvers:
+            for cache in (False, True):
+                agent = HybridWumpusAgent('north', verbose=False, sat_solver=name,
+                                          cache_atemporal=cache)
+                msat.backend_stats.clear()
+                start = time.time()
+                run_agent_quietly(layout, agent)
+                elapsed = time.time() - start
+                stats = msat.backend_stats.get(name)
+                calls = stats.calls if stats else 0
+                start = time.time()
+                for i in range(repeats):
+                    for prop in (pit_str, wumpus_str, breeze_str, stench_str):
+                        agent.query_locations(prop)
+                qpl_time = time.time() - start
+                stats = msat.backend_stats.get(name)
+                print "   {0:<12}  {1:<5}  {2:>9}  {3:>7.2f}  {4:>13}  {5:>6.1f}  {6}".format(
+                    name, str(cache), calls, elapsed, (stats.calls if stats else 0) - calls,
+                    1000 * qpl_time, agent.atemporal_cache or '-')
+
+
+def benchmark_frontier(layouts=('wumpus_4x4_book',), solvers=('session', 'cdcl')):
+    """
+    Play <layouts> with the HybridWumpusAgent querying OK<x>_<y>_<t> at
+    every location, or only at the frontier (see
+    HybridWumpusAgent.query_OK_locations): OK queries, SAT tests and run
+    time, per SAT solver.
+    """
+    for layout in layouts:
+        print "Layout '{0}':".format(layout)
+        print "   solver        frontier  OK queries  SAT tests  seconds  result"
+        for name in solvers:
+            for frontier in (False, True):
+                agent = HybridWumpusAgent('north', verbose=False, sat_solver=name,
+                                          frontier_queries=frontier)
+                msat.backend_stats.clear()
+                start = time.time()
+                note = run_agent_quietly(layout, agent)
+                elapsed = time.time() - start
+                stats = msat.backend_stats.get(name)
+                print "   {0:<12}  {1:<8}  {2:>10}  {3:>9}  {4:>7.2f}  {5}".format(
+                    name, str(frontier), agent.OK_queries, stats.calls if stats else 0,
+                    elapsed, note)
+
+
+def benchmark_trace(layouts=('wumpus_4x4_book',), solvers=('session',), repeats=3):
+    """
+    Play <layouts> with the HybridWumpusAgent traced (see wumpus_trace) at
+    each level, with its events dropped, printed or written as JSON lines
+    (both to os.devnull): best run time of <repeats>, per SAT solver.
+    """
+    import os
+    sinks = [('null', NullSink),
+             ('console', lambda stream: ConsoleSink(stream)),
+             ('json', JSONLinesSink)]
+    for layout in layouts:
+        print "Layout '{0}':".format(layout)
+        print "   solver        level  sink     seconds  result"
+        for name in solvers:
+            for level in trace_levels:
+                for sink_name, make_sink in (sinks[:1] if level == 'off' else sinks):
+                    best = None
+                    for repeat in range(repeats):
+                        devnull = open(os.devnull, 'w')
+                        sink = make_sink(devnull) if sink_name != 'null' else make_sink()
+                        agent = HybridWumpusAgent('north', verbose=False, sat_solver=name,
+                                                  tracer=Tracer(level, [sink]))
+                        start = time.time()
+                        note = run_agent_quietly(layout, agent)
+                        elapsed = time.time() - start
+                        devnull.close()
+                        if best is None or elapsed < best:
+                            best = elapsed
+                    print "   {0:<12}  {1:<5}  {2:<7}  {3:>7.3f}  {4}".format(
+                        name, level, sink_name, best, note)
+
+
+class StepTimingAgent(HybridWumpusAgent):
+    """
+    A quiet HybridWumpusAgent that keeps the wall clock time of each step.
+    step_times := list of seconds
+    """
+
+    def __init__(self, heading='north', **kwargs):
+        kwargs.setdefault('verbose', False)
+        super(StepTimingAgent, self).__init__(heading, **kwargs)
+
+    def reset(self):
+        self.step_times = []
+        super(StepTimingAgent, self).reset()
+
+    def agent_program(self, percept):
+        start = time.time()
+        action = super(StepTimingAgent, self).agent_program(percept)
+        self.step_times.append(time.time() - start)
+        return action
+
+
+def benchmark_deadline(layouts=('wumpus_4x4_book',), solvers=('session', 'cdcl'),
+                       budgets=(None, 0.05, 0.01, 0.001)):
+    """
+    Play <layouts> with a StepTimingAgent given each step budget in
+    <budgets> (None: no deadline; see HybridWumpusAgent.step_budget): mean
+    and longest step, number of steps each deadline tier was hit and of
+    Wait actions taken for the deadline, per SAT solver.
+    The agent adds its temporal axioms from templates, as the deadline
+    doesn't cut that short, and parsing the axiom strings would take most
+    of each step.
+    """
+    for layout in layouts:
+        print "Layout '{0}':".format(layout)
+        print "   solver        budget  steps  mean ms  max ms  " \
+              + '  '.join('{0:>8}'.format(tier) for tier in deadline_tiers) \
+              + "  waits  result"
+        for name in solvers:
+            for budget in budgets:
+                agent = StepTimingAgent(sat_solver=name, step_budget=budget,
+                                        axiom_templates=True)
+                note = run_agent_quietly(layout, agent)
+                times = agent.step_times or [0]
+                print "   {0:<12}  {1:>6}  {2:>5}  {3:>7.1f}  {4:>6.1f}  ".format(
+                    name, budget, len(agent.step_times), 1000 * sum(times) / len(times),
+                    1000 * max(times)) \
+                    + '  '.join('{0:>8}'.format(agent.deadline_tiers[tier])
+                                for tier in deadline_tiers) \
+                    + "  {0:>5}  {1}".format(agent.holds, note)
+
+
+class SpinningAgent(HybridWumpusAgent):
+    """
+    A quiet HybridWumpusAgent that turns left for its first <spins> steps
+    (so a game can be made as long as wanted) before playing as usual.
+    Keeps the KB size and the time taken to infer the location at each step.
+    kb_sizes := list of (<time>, <clauses>, <seconds to infer location>)
+    """
+
+    def __init__(self, heading='north', spins=100, **kwargs):
+        kwargs.setdefault('verbose', False)
+        self.spins = spins
+        super(SpinningAgent, self).__init__(heading, **kwargs)
+
+    def reset(self):
+        self.kb_sizes = []
+        super(SpinningAgent, self).reset()
+
+    def infer_and_set_belief_location(self, percept=None):
+        start = time.time()
+        super(SpinningAgent, self).infer_and_set_belief_location(percept)
+        self.location_query_time = time.time() - start
+
+    def add_temporal_axioms(self):
+        super(SpinningAgent, self).add_temporal_axioms()
+        self.kb_sizes.append((self.time, len(self.kb.clauses), self.location_query_time))
+
+    def agent_program(self, percept):
+        if self.time < self.spins:
+            self.plan = [action_turn_left_str(None)]
+        return super(SpinningAgent, self).agent_program(percept)
+
+
+def benchmark_compact(layouts=('wumpus_4x4_book',), solvers=('session', 'cdcl'),
+                      spins=100, every=(0, 1, 10), report=10):
+    """
+    Play <layouts> with a SpinningAgent, so games last over <spins> steps,
+    compacting the KB every n steps for n in <every> (0: never; see
+    HybridWumpusAgent.compact_kb).  Reports KB size and the time to infer
+    the location every <report> steps, and the time of the whole run.
+    """
+    for layout in layouts:
+        print "Layout '{0}':".format(layout)
+        for name in solvers:
+            for n in every:
+                agent = SpinningAgent('north', spins, sat_solver=name, compact_every=n)
+                start = time.time()
+                note = run_agent_quietly(layout, agent, max_steps=spins + 100)
+                elapsed = time.time() - start
+                print "   solver={0}, compact_every={1}: {2:.2f} seconds, {3}".format(
+                    name, n, elapsed, note)
+                print "      time  clauses  ms to infer location"
+                for t, clauses, seconds in agent.kb_sizes:
+                    if t % report == 0:
+                        print "      {0:>4}  {1:>7}  {2:>8.2f}".format(t, clauses, 1000 * seconds)
+
+#-------------------------------------------------------------------------------
+# Parsing
+#-------------------------------------------------------------------------------
+
+def eval_expr(s):
+    """ logic.expr as it was before ExprParser: rewrite to Python and eval """
+    s = s.replace('==>', '>>').replace('<==', '<<')
+    s = s.replace('<=>', '%').replace('=/=', '^')
+    s = re.sub(r'([a-zA-Z0-9_.]+)', r'Expr("\1")', s)
+    return eval(s, {'Expr':Expr})
+
+def benchmark_parse(sizes=(4, 8), steps=10, repeats=5):
+    """
+    Parse throughput (strings/s) of eval_expr, of ExprParser and of expr
+    (ExprParser behind the LRU cache) on the axiom strings for <steps>
+    time steps of a <size> x <size> world, and on the proposition strings
+    the agent queries at each of those steps.  Every workload is parsed
+    <repeats> times, as the agent re-parses its queries every step.
+    """
+    print "  size  workload   strings   strings/s: eval    parser  cached expr"
+    for size in sizes:
+        axioms = []
+        queries = []
+        for t in range(steps):
+            axioms += generate_square_OK_axioms(t, 1, size, 1, size)
+            axioms += generate_breeze_percept_and_location_axioms(t, 1, size, 1, size)
+            axioms += generate_at_location_ssa(t, 1, 1, 1, size, 1, size, 'east')
+            axioms += generate_non_location_ssa(t)
+            axioms += generate_mutually_exclusive_axioms(t)
+            queries += [prop(x, y, t) for prop in (state_OK_str, state_loc_str)
+                        for x in range(1, size + 1) for y in range(1, size + 1)]
+            queries += [pit_str(x, y) for x in range(1, size + 1) for y in range(1, size + 1)]
+        for name, strings in (('axioms', axioms), ('queries', queries)):
+            rates = []
+            for parse in (eval_expr, lambda s: ExprParser(s).parse(), expr):
+                logic.expr_cache.clear()
+                start = time.time()
+                for i in range(repeats):
+                    for s in strings:
+                        parse(s)
+                rates.append(repeats * len(strings) / (time.time() - start))
+            print "  {0:>4}  {1:<8}  {2:>7}  {3:>15.0f}  {4:>8.0f}  {5:>11.0f}".format(
+                size, name, len(strings), *rates)
+
+#-------------------------------------------------------------------------------
+# Batched queries
+#-------------------------------------------------------------------------------
+
+def location_queries(width, height, t):
+    """ Every location-based proposition the agent or the manual KB
+    commands query at time <t> """
+    return [expr('{0}{1}_{2}'.format(p, x, y))
+            for p in proposition_bases_atemporal_location
+            for x in range(1, width + 1) for y in range(1, height + 1)] \
+           + [expr('{0}{1}_{2}_{3}'.format(p, x, y, t))
+              for p in proposition_bases_location_fluents
+              for x in range(1, width + 1) for y in range(1, height + 1)]
+
+
+def benchmark_ask_many(layouts=('wumpus_4x4_book', 'wumpus_4x4_2'),
+                       solvers=('session', 'cdcl')):
+    """
+    Query throughput (queries per second) of PropKB_SAT.ask, one query at a
+    time with the model cache off (as before ask_many), against ask_many,
+    on the KBs the HybridWumpusAgent builds while playing <layouts>.
+    Each query set is every location-based proposition at that time step.
+    """
+    solvers = filter(solver_available, solvers)
+    totals = dict(((name, method), [0.0, 0]) for name in solvers
+                  for method in ('ask', 'ask_many'))
+    for layout in layouts:
+        agent, note = collect_agent_kbs(layout)
+        print "Layout '{0}': {1} KBs (agent {2})".format(layout, len(agent.kb_snapshots), note)
+        print "   time  clauses  queries  " \
+              + ''.join('{0:>22}'.format(name + ' ask/ask_many') for name in solvers) \
+              + "   (queries per sec)"
+        for t, clauses in agent.kb_snapshots:
+            queries = location_queries(agent.width, agent.height, t)
+            row = '   {0:>4}  {1:>7}  {2:>7}  '.format(t, len(clauses), len(queries))
+            for name in solvers:
+                kb = kb_from_clauses(clauses, name, model_cache_size=0)
+                start = time.time()
+                answers = dict((q, kb.ask(q)) for q in queries)
+                ask_time = time.time() - start
+
+                kb = kb_from_clauses(clauses, name)
+                start = time.time()
+                batch_answers = kb.ask_many(queries)
+                ask_many_time = time.time() - start
+                if batch_answers != answers:
+                    raise Exception("ask_many disagrees with ask at time {0}".format(t))
+
+                for method, elapsed in (('ask', ask_time), ('ask_many', ask_many_time)):
+                    totals[(name, method)][0] += elapsed
+                    totals[(name, method)][1] += len(queries)
+                row += '{0:>22}'.format('{0:.0f} / {1:.0f}'.format(len(queries) / ask_time,
+                                                                    len(queries) / ask_many_time))
+            print row
+    print "Over all KBs (queries per sec):"
+    for name in solvers:
+        rates = []
+        for method in ('ask', 'ask_many'):
+            elapsed, count = totals[(name, method)]
+            rates.append(count / elapsed if elapsed else 0.0)
+        print "   {0:>8}: ask {1:.0f}, ask_many {2:.0f}  ({3:.1f}x)".format(name, rates[0], rates[1],
+                                                                        rates[1] / rates[0])
+
+def benchmark_workers(layouts=('wumpus_4x4_book',), solvers=('minisat',),
+                      workers=(1, 2, 4, 8, 16)):
+    """
+    Time ask_many over every location-based proposition on the KBs the
+    HybridWumpusAgent builds while playing <layouts>, with the SAT tests
+    fanned out across each number of <workers> (see PropKB_SAT), and
+    report the speedup over the first entry of <workers>.
+    Only solvers that run per call are meaningful here; the speedup needs
+    the external minisat and as many cores as workers.
+    """
+    for name in solvers:
+        if name == 'session' or not solver_available(name):
+            print "Skipping '{0}': not a per-call solver on PATH".format(name)
+            continue
+        totals = dict((n, 0.0) for n in workers)
+        for layout in layouts:
+            agent, note = collect_agent_kbs(layout)
+            print "Layout '{0}', solver '{1}': {2} KBs (agent {3})".format(layout, name,
+                                                                      len(agent.kb_snapshots), note)
+            print "   time  clauses  " + ''.join('{0:>10}'.format(n) for n in workers) \
+                  + "   (ms per ask_many, by number of workers)"
+            for t, clauses in agent.kb_snapshots:
+                queries = location_queries(agent.width, agent.height, t)
+                row = '   {0:>4}  {1:>7}  '.format(t, len(clauses))
+                for n in workers:
+                    kb = kb_from_clauses(clauses, name, workers=n)
+                    start = time.time()
+                    kb.ask_many(queries)
+                    elapsed = time.time() - start
+                    totals[n] += elapsed
+                    row += '{0:>10.1f}'.format(1000 * elapsed)
+                print row
+        print "Speedup over {0} worker(s), solver '{1}':".format(workers[0], name)
+        for n in workers:
+            print "   {0:>4} workers: {1:.2f}x".format(n, totals[workers[0]] / totals[n])
+
+#-------------------------------------------------------------------------------
+# Command-line interface
+#-------------------------------------------------------------------------------
+
+benchmarks = {'solvers': benchmark_solvers,
+              'ask_many': benchmark_ask_many,
+              'workers': benchmark_workers,
+              'transport': benchmark_transport,
+              'clause_store': benchmark_clause_store,
+              'axioms': benchmark_axioms,
+              'parse': benchmark_parse,
+              'location_ssa': benchmark_location_ssa,
+              'dedup': benchmark_dedup,
+              'compact': benchmark_compact,
+              'propagate': benchmark_propagate,
+              'amo': benchmark_amo,
+              'track': benchmark_track,
+              'atemporal': benchmark_atemporal,
+              'frontier': benchmark_frontier,
+              'trace': benchmark_trace,
+              'deadline': benchmark_deadline}
+
+def readCommand( argv ):
+    """
+    Processes the command used to run wumpus_benchmark.py from the command line.
+    """
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:     python wumpus_benchmark.py <options>
+    EXAMPLES:  (1) python wumpus_benchmark.py -b solvers
+                   - compare the SAT solvers on the KBs built by the
+                   HybridWumpusAgent playing the layouts in layouts/
+               (2) python wumpus_benchmark.py -b ask_many -s session
+                   - query throughput of PropKB_SAT.ask vs. ask_many
+               (3) python wumpus_benchmark.py -b workers -w 1,4,16
+                   - speedup of ask_many with SAT tests run in parallel
+               (4) python wumpus_benchmark.py -b transport
+                   - per-call overhead of the minisat transports
+               (5) python wumpus_benchmark.py -b clause_store
+                   - memory and Dimacs translation time of the KB clauses
+               (6) python wumpus_benchmark.py -b axioms
+                   - time to tell the KB the axioms, as strings vs. clauses vs. templates
+               (7) python wumpus_benchmark.py -b parse
+                   - throughput of logic.expr, with and without its cache
+               (8) python wumpus_benchmark.py -b location_ssa
+                   - size and time of the CNF of the full at_location SSA
+               (9) python wumpus_benchmark.py -b dedup
+                   - KB size and run time with duplicate and subsumed clauses dropped
+               (10) python wumpus_benchmark.py -b compact
+                   - KB size and query time over a long game, with the KB compacted
+               (11) python wumpus_benchmark.py -b propagate
+                   - KB size, queries answered and run time with unit propagation in the KB
+               (12) python wumpus_benchmark.py -b amo
+                   - initial KB size, build and ask time per at-most-one encoding, 4x4 to 32x32
+               (13) python wumpus_benchmark.py -b track
+                   - SAT tests and run time with the belief location tracked
+               (14) python wumpus_benchmark.py -b atemporal
+                   - SAT tests and query time with atemporal facts cached
+               (15) python wumpus_benchmark.py -b frontier
+                   - OK queries, SAT tests and run time with only the frontier queried
+               (16) python wumpus_benchmark.py -b trace
+                   - run time of the agent traced at each level, per trace sink
+               (17) python wumpus_benchmark.py -b deadline
+                   - step times and deadline tiers hit with a time budget per step
+    """
+    parser = OptionParser(usageStr)
+
+    parser.add_option('-b', '--benchmark', dest='benchmark', default='solvers',
+                      help=default("Benchmark to run, one of: " \
+                                   + ', '.join(sorted(benchmarks))))
+    parser.add_option('-l', '--layout', dest='layouts', action='append', default=None,
+                      help="Layout to play (may be repeated)" \
+                           + " [Default: wumpus_4x4_book and wumpus_4x4_2]")
+    parser.add_option('-s', '--solvers', dest='solvers', default=None,
+                      help="Comma-separated SAT solvers to compare" \
+                           + " [Default: depends on the benchmark]")
+    parser.add_option('-w', '--workers', dest='workers', default=None,
+                      help="Comma-separated numbers of workers for the workers benchmark" \
+                           + " [Default: 1,2,4,8,16]")
+
+    options, otherjunk = parser.parse_args(argv)
+
+    if len(otherjunk) != 0:
+        raise Exception("Command line input not understood: " + str(otherjunk))
+    if options.benchmark not in benchmarks:
+        raise Exception("Unknown benchmark: " + options.benchmark)
+
+    return options
+
+def run_command(options):
+    kwargs = {}
+    if options.layouts:
+        kwargs['layouts'] = options.layouts
+    if options.solvers:
+        kwargs['solvers'] = options.solvers.split(',')
+    if options.workers:
+        kwargs['workers'] = map(int, options.workers.split(','))
+    # not every benchmark plays layouts or compares solvers
+    benchmark = benchmarks[options.benchmark]
+    accepted = inspect.getargspec(benchmark).args
+    for keyword in sorted(kwargs):
+        if keyword not in accepted:
+            print "Benchmark '{0}' takes no {1} option, ignored".format(options.benchmark, keyword)
+            del kwargs[keyword]
+    benchmark(**kwargs)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    options = readCommand( sys.argv[1:] )
+    run_command( options )
@@ -17,6 +17,10 @@
 # (see http://minisat.se) SAT solver, and is directly based on the satispy
 # python project, see https://github.com/netom/satispy .
 
+from array import array
+import itertools
+import math
+import re
 import utils
 
 # -------------------------------------------------------------------------------
@@ -27,6 +31,13 @@ import utils
 
 proposition_bases_atemporal_location = ['P', 'W', 'S', 'B']
 
+atemporal_location_re = re.compile(r'({0})\d+_\d+$'.format(
+    '|'.join(proposition_bases_atemporal_location)))
+
+def is_atemporal_location_str(s):
+    "Is <s> the name of an atemporal location proposition, e.g. P1_2?"
+    return atemporal_location_re.match(s) is not None
+
 
 def pit_str(x, y):
     "There is a Pit at <x>,<y>"
@@ -763,20 +774,27 @@ def axiom_generator_have_arrow_and_wumpus_alive(t=0):
 
 
 
-def initial_wumpus_axioms(xi, yi, width, height, heading='east'):
+def initial_wumpus_axioms(xi, yi, width, height, heading='east', encoding='auto'):
     """
     Generate all of the initial wumpus axioms
 
     xi,yi = initial location
     width,height = dimensions of world
     heading = str representation of the initial agent heading
+    encoding = encoding of the at most one wumpus (see at_most_one_clauses);
+        unless it is pairwise, the constraint is the clauses of
+        clause_generator_at_most_one_wumpus, one axiom per clause
     """
     axioms = [axiom_generator_initial_location_assertions(xi, yi)]
     axioms.extend(generate_pit_and_breeze_axioms(1, width, 1, height))
     axioms.extend(generate_wumpus_and_stench_axioms(1, width, 1, height))
 
     axioms.append(axiom_generator_at_least_one_wumpus(1, width, 1, height))
-    axioms.append(axiom_generator_at_most_one_wumpus(1, width, 1, height))
+    if encoding == 'pairwise' or (encoding == 'auto' and width * height <= amo_pairwise_max):
+        axioms.append(axiom_generator_at_most_one_wumpus(1, width, 1, height))
+    else:
+        axioms.extend(map(clause_str, clause_generator_at_most_one_wumpus(1, width, 1, height,
+                                                                          encoding)))
 
     axioms.append(axiom_generator_only_in_one_location(xi, yi, 1, width, 1, height))
     axioms.append(axiom_generator_only_one_heading(heading))
@@ -1108,6 +1126,59 @@ def generate_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax, heading):
     return filter(lambda s: s != '', axioms)
 
 
+# The full at_location SSA: the agent moves into x,y from a neighbor only
+# when it heads towards x,y, and stays put if it doesn't move Forward or
+# bumps into a wall.  Unlike axiom_generator_at_location_ssa, this is
+# sound for every location at once, so it can be asserted for all of them.
+
+# (dx, dy) of the neighbor the agent comes from, and the heading it needs
+entering_moves = [((-1, 0), 'East'), ((0, 1), 'South'), ((1, 0), 'West'), ((0, -1), 'North')]
+# (dx, dy) of the location Forward would move to, by heading
+heading_moves = [('West', (-1, 0)), ('North', (0, 1)), ('East', (1, 0)), ('South', (0, -1))]
+
+def at_location_ssa_full_terms(x, y, xmin, xmax, ymin, ymax):
+    """
+    The ways the agent can be at x,y at time t+1: a list of
+    ((nx, ny), <heading>) for each neighbor it can move in from, and the
+    headings in which Forward at x,y bumps into a wall.
+    """
+    entering = [((x + dx, y + dy), heading) for ((dx, dy), heading) in entering_moves
+                if agent_position_boundery_check(x + dx, y + dy, xmin, xmax, ymin, ymax)]
+    bumping = [heading for (heading, (dx, dy)) in heading_moves
+               if not agent_position_boundery_check(x + dx, y + dy, xmin, xmax, ymin, ymax)]
+    return entering, bumping
+
+
+def axiom_generator_at_location_ssa_full(t, x, y, xmin, xmax, ymin, ymax):
+    """
+    Assert the conditions at time t under which the agent is in location
+    x,y at time t+1, taking the heading and walls into account.
+    x,y := location
+    t := time
+    xmin, xmax, ymin, ymax := the bounds of the environment.
+    """
+    entering, bumping = at_location_ssa_full_terms(x, y, xmin, xmax, ymin, ymax)
+    forward = action_forward_str(t)
+    terms = ['({0} & {1} & {2})'.format(state_loc_str(nx, ny, t), forward,
+                                        add_time_stamp('Heading' + heading, t))
+             for ((nx, ny), heading) in entering]
+    terms.append('({0} & ~{1})'.format(state_loc_str(x, y, t), forward))
+    if bumping:
+        terms.append('({0} & {1} & ({2}))'.format(
+            state_loc_str(x, y, t), forward,
+            ' | '.join(add_time_stamp('Heading' + heading, t) for heading in bumping)))
+    return '{0} <=> ({1})'.format(state_loc_str(x, y, t + 1), ' | '.join(terms))
+
+
+def generate_full_at_location_ssa(t, xmin, xmax, ymin, ymax):
+    """
+    The full at_location SSA for every location.  Its CNF by to_cnf is
+    large; tell it with definitional CNF (see PropKB_SAT).
+    """
+    return [axiom_generator_at_location_ssa_full(t, x, y, xmin, xmax, ymin, ymax)
+            for x in range(xmin, xmax + 1) for y in range(ymin, ymax + 1)]
+
+
 # ----------------------------------
 ##################################################################11
 def axiom_generator_have_arrow_ssa(t):
@@ -1789,3 +1860,507 @@ def generate_mutually_exclusive_axioms(t):
     # -------------------------------------------------------------------------------
 
 
+# -------------------------------------------------------------------------------
+# Clause Generators: the axioms above, emitted directly in CNF
+#
+# Each clause_generator_* fn returns the same axiom as the matching
+# axiom_generator_* fn (logically equivalent, not necessarily the same
+# clauses), but as a list of clauses, each a tuple of literals: a
+# proposition string, or '~' followed by one.  This skips building the
+# axiom string, parsing it with expr and converting it with to_cnf.
+# See PropKB_SAT.tell_literal_clauses in wumpus_agent.py.
+# -------------------------------------------------------------------------------
+
+def negate_literal(literal):
+    if literal[0] == '~':
+        return literal[1:]
+    return '~' + literal
+
+
+def clause_str(clause):
+    """ PL form of a clause, e.g. '~B1_1 | P1_2' """
+    return ' | '.join(clause)
+
+
+def iff_or_clauses(head, literals):
+    """ Clauses for: head <=> (literals[0] | literals[1] | ...) """
+    clauses = [('~' + head,) + tuple(literals)]
+    clauses.extend((head, negate_literal(literal)) for literal in literals)
+    return clauses
+
+
+def iff_and_clauses(head, literals):
+    """ Clauses for: head <=> (literals[0] & literals[1] & ...) """
+    clauses = [('~' + head, literal) for literal in literals]
+    clauses.append((head,) + tuple(negate_literal(literal) for literal in literals))
+    return clauses
+
+
+def iff_dnf_clauses(head, terms):
+    """
+    Clauses for: head <=> (term_0 | term_1 | ...), where each term is a
+    list of literals in conjunction.  Clauses of the head => terms
+    direction take one literal from each term; tautologies are dropped.
+    """
+    clauses = [tuple(negate_literal(literal) for literal in term) + (head,)
+               for term in terms]
+    for choice in itertools.product(*terms):
+        literals = set(choice)
+        if not any(negate_literal(literal) in literals for literal in literals):
+            clauses.append(('~' + head,) + tuple(sorted(literals)))
+    return clauses
+
+
+# Encodings of at_most_one_clauses; 'auto' picks pairwise for at most
+# amo_pairwise_max literals and sequential beyond
+amo_encodings = ['pairwise', 'sequential', 'commander', 'product']
+amo_pairwise_max = 16
+
+def at_most_one_clauses(literals, aux_name, encoding='auto'):
+    """
+    Clauses for: at most one of <literals> is true, for n literals, in one
+    of amo_encodings:
+    pairwise := ~a | ~b for every pair: n(n-1)/2 clauses, no new symbols
+    sequential := sequential counter, S_i meaning one of the first i is
+        true: 3n-4 clauses, n-1 new symbols
+    commander := groups of 3, each with a commander symbol that holds iff
+        one of the group does, and at most one commander, recursively:
+        about 3.5n clauses, n/2 new symbols
+    product := literal i,j of a sqrt(n) x sqrt(n) grid implies row symbol
+        U_i and column symbol V_j, and at most one U and one V, recursively:
+        2n + O(sqrt(n)) clauses, 2 sqrt(n) new symbols
+    The new symbols are auxiliary (see logic.is_aux_symbol): they are named
+    aux_name.format(i) for i = 1, 2, ..., so <aux_name> should start with
+    'Aux_' and differ between constraints.
+    """
+    if encoding == 'auto':
+        encoding = 'pairwise' if len(literals) <= amo_pairwise_max else 'sequential'
+    if encoding not in amo_encodings:
+        raise Exception("Unknown at-most-one encoding '{0}', expected one of: {1}".format(
+            encoding, ', '.join(amo_encodings + ['auto'])))
+    counter = itertools.count(1)
+    def new_symbol():
+        return aux_name.format(next(counter))
+    return amo_encoders[encoding](list(literals), new_symbol)
+
+
+def exactly_one_clauses(literals, aux_name, encoding='auto'):
+    """ Clauses for: exactly one of <literals> is true (see
+    at_most_one_clauses) """
+    return [tuple(literals)] + at_most_one_clauses(literals, aux_name, encoding)
+
+
+def amo_pairwise(literals, new_symbol=None):
+    return [(negate_literal(a), negate_literal(b))
+            for (a, b) in itertools.combinations(literals, 2)]
+
+
+def amo_sequential(literals, new_symbol):
+    if len(literals) <= 2:
+        return amo_pairwise(literals)
+    counters = [new_symbol() for literal in literals[:-1]]
+    clauses = [(negate_literal(literals[0]), counters[0])]
+    for i in range(1, len(literals) - 1):
+        literal = negate_literal(literals[i])
+        clauses += [(literal, counters[i]),
+                    ('~' + counters[i - 1], counters[i]),
+                    (literal, '~' + counters[i - 1])]
+    clauses.append((negate_literal(literals[-1]), '~' + counters[-1]))
+    return clauses
+
+
+def amo_commander(literals, new_symbol, group_size=3):
+    if len(literals) <= group_size + 1:
+        return amo_pairwise(literals)
+    clauses = []
+    commanders = []
+    for i in range(0, len(literals), group_size):
+        group = literals[i:i + group_size]
+        commander = new_symbol()
+        clauses += amo_pairwise(group)
+        clauses += iff_or_clauses(commander, group)
+        commanders.append(commander)
+    return clauses + amo_commander(commanders, new_symbol, group_size)
+
+
+def amo_product(literals, new_symbol):
+    if len(literals) <= 4:
+        return amo_pairwise(literals)
+    columns = int(math.ceil(math.sqrt(len(literals))))
+    rows = [new_symbol() for i in range(0, len(literals), columns)]
+    cols = [new_symbol() for j in range(columns)]
+    clauses = []
+    for k, literal in enumerate(literals):
+        clauses += [(negate_literal(literal), rows[k // columns]),
+                    (negate_literal(literal), cols[k % columns])]
+    return clauses + amo_product(rows, new_symbol) + amo_product(cols, new_symbol)
+
+
+amo_encoders = {'pairwise': amo_pairwise,
+                'sequential': amo_sequential,
+                'commander': amo_commander,
+                'product': amo_product}
+
+
+def clause_generator_percept_sentence(t, tvec):
+    return [(add_time_stamp(percept, t) if value else '~' + add_time_stamp(percept, t),)
+            for percept, value in zip(proposition_bases_perceptual_fluents, tvec)]
+
+
+def clause_generator_initial_location_assertions(x, y):
+    return [('~' + wumpus_str(x, y),), ('~' + pit_str(x, y),)]
+
+
+def neighbors_in_bounds(x, y, xmin, xmax, ymin, ymax):
+    """ The location x,y and its neighbors, as in find_adjecent_to_location """
+    return [(nx, ny) for (nx, ny) in find_adjecent_to_location(x, y)
+            if agent_position_boundery_check(nx, ny, xmin, xmax, ymin, ymax)]
+
+
+def clause_generator_pits_and_breezes(x, y, xmin, xmax, ymin, ymax):
+    return iff_or_clauses(breeze_str(x, y),
+                          [pit_str(nx, ny) for (nx, ny)
+                           in neighbors_in_bounds(x, y, xmin, xmax, ymin, ymax)])
+
+
+def clause_generator_wumpus_and_stench(x, y, xmin, xmax, ymin, ymax):
+    return iff_or_clauses(stench_str(x, y),
+                          [wumpus_str(nx, ny) for (nx, ny)
+                           in neighbors_in_bounds(x, y, xmin, xmax, ymin, ymax)])
+
+
+def clause_generator_at_least_one_wumpus(xmin, xmax, ymin, ymax):
+    return [tuple(wumpus_str(x, y)
+                  for x in range(xmin, xmax + 1) for y in range(ymin, ymax + 1))]
+
+
+def clause_generator_at_most_one_wumpus(xmin, xmax, ymin, ymax, encoding='auto'):
+    wumpi = [wumpus_str(x, y)
+             for x in range(xmin, xmax + 1) for y in range(ymin, ymax + 1)]
+    return at_most_one_clauses(wumpi, 'Aux_Wumpus{0}', encoding)
+
+
+def clause_generator_only_in_one_location(xi, yi, xmin, xmax, ymin, ymax, t=0):
+    return [(state_loc_str(x, y, t) if (x, y) == (xi, yi) else '~' + state_loc_str(x, y, t),)
+            for x in range(xmin, xmax + 1) for y in range(ymin, ymax + 1)]
+
+
+def clause_generator_only_one_heading(heading='north', t=0):
+    return [(add_time_stamp('Heading' + d, t) if d.lower() == heading.lower()
+             else '~' + add_time_stamp('Heading' + d, t),)
+            for d in fetch_direction_array('Directions')]
+
+
+def clause_generator_have_arrow_and_wumpus_alive(t=0):
+    return [(state_wumpus_alive_str(t),), (state_have_arrow_str(t),)]
+
+
+def atemporal_wumpus_clauses(xi, yi, width, height, encoding='auto'):
+    """ The clauses of the initial axioms that don't depend on time:
+    those about pits, wumpi, breezes and stenches
+    encoding := of the at most one wumpus constraint (see at_most_one_clauses) """
+    clauses = clause_generator_initial_location_assertions(xi, yi)
+    for x in range(1, width + 1):
+        for y in range(1, height + 1):
+            clauses += clause_generator_pits_and_breezes(x, y, 1, width, 1, height)
+    for x in range(1, width + 1):
+        for y in range(1, height + 1):
+            clauses += clause_generator_wumpus_and_stench(x, y, 1, width, 1, height)
+    clauses += clause_generator_at_least_one_wumpus(1, width, 1, height)
+    clauses += clause_generator_at_most_one_wumpus(1, width, 1, height, encoding)
+    return clauses
+
+
+def initial_wumpus_clauses(xi, yi, width, height, heading='east', encoding='auto'):
+    """ The clauses of initial_wumpus_axioms """
+    clauses = atemporal_wumpus_clauses(xi, yi, width, height, encoding)
+    clauses += clause_generator_only_in_one_location(xi, yi, 1, width, 1, height)
+    clauses += clause_generator_only_one_heading(heading)
+    clauses += clause_generator_have_arrow_and_wumpus_alive()
+    return clauses
+
+
+def clause_generator_location_OK(x, y, t):
+    # OK <=> (~P & (~W | (W & ~WumpusAlive))), where the disjunction
+    # simplifies to (~W | ~WumpusAlive)
+    ok, pit, wumpus = state_OK_str(x, y, t), pit_str(x, y), wumpus_str(x, y)
+    alive = state_wumpus_alive_str(t)
+    return [('~' + ok, '~' + pit),
+            ('~' + ok, '~' + wumpus, '~' + alive),
+            (ok, pit, wumpus),
+            (ok, pit, alive)]
+
+
+def generate_square_OK_clauses(t, xmin, xmax, ymin, ymax):
+    clauses = []
+    for x in range(xmin, xmax + 1):
+        for y in range(ymin, ymax + 1):
+            clauses += clause_generator_location_OK(x, y, t)
+    return clauses
+
+
+def percept_and_location_clauses(location, percept, property):
+    """ Clauses for: location >> (percept <=> property) """
+    return [('~' + location, '~' + percept, property),
+            ('~' + location, percept, '~' + property)]
+
+
+def clause_generator_breeze_percept_and_location_property(x, y, t):
+    return percept_and_location_clauses(state_loc_str(x, y, t),
+                                        percept_breeze_str(t), breeze_str(x, y))
+
+
+def generate_breeze_percept_and_location_clauses(t, xmin, xmax, ymin, ymax):
+    clauses = []
+    for x in range(xmin, xmax + 1):
+        for y in range(ymin, ymax + 1):
+            clauses += clause_generator_breeze_percept_and_location_property(x, y, t)
+    return clauses
+
+
+def clause_generator_stench_percept_and_location_property(x, y, t):
+    return percept_and_location_clauses(state_loc_str(x, y, t),
+                                        percept_stench_str(t), stench_str(x, y))
+
+
+def generate_stench_percept_and_location_clauses(t, xmin, xmax, ymin, ymax):
+    clauses = []
+    for x in range(xmin, xmax + 1):
+        for y in range(ymin, ymax + 1):
+            clauses += clause_generator_stench_percept_and_location_property(x, y, t)
+    return clauses
+
+
+def clause_generator_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax):
+    # L' <=> ((N_1 | ... | N_k) & Forward) | (L & ~Forward), for the
+    # neighbors N_i at time t, gives 3 clauses for => and k+1 for <=
+    loc_next, loc, forward = state_loc_str(x, y, t + 1), state_loc_str(x, y, t), action_forward_str(t)
+    neighbors = tuple(state_loc_str(nx, ny, t)
+                      for (nx, ny) in [(x - 1, y), (x, y + 1), (x + 1, y), (x, y - 1)]
+                      if agent_position_boundery_check(nx, ny, xmin, xmax, ymin, ymax))
+    clauses = [('~' + loc_next,) + neighbors + (loc,),
+               ('~' + loc_next,) + neighbors + ('~' + forward,),
+               ('~' + loc_next, forward, loc),
+               ('~' + loc, forward, loc_next)]
+    clauses.extend(('~' + neighbor, '~' + forward, loc_next) for neighbor in neighbors)
+    return clauses
+
+
+def generate_at_location_ssa_clauses(t, x, y, xmin, xmax, ymin, ymax, heading):
+    """ The clauses of generate_at_location_ssa """
+    clauses = clause_generator_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax)
+    if heading == 'west' and x - 1 >= xmin:
+        clauses += clause_generator_at_location_ssa(t, x - 1, y, xmin, xmax, ymin, ymax)
+    if heading == 'east' and x + 1 <= xmax:
+        clauses += clause_generator_at_location_ssa(t, x + 1, y, xmin, xmax, ymin, ymax)
+    if heading == 'south' and y - 1 >= ymin:
+        clauses += clause_generator_at_location_ssa(t, x, y - 1, xmin, xmax, ymin, ymax)
+    if heading == 'north' and y + 1 <= ymax:
+        clauses += clause_generator_at_location_ssa(t, x, y + 1, xmin, xmax, ymin, ymax)
+    return clauses
+
+
+def clause_generator_at_location_ssa_full(t, x, y, xmin, xmax, ymin, ymax):
+    # Each way of moving in gets an auxiliary symbol (named Aux_..., see
+    # logic.is_aux_symbol) that implies its conjuncts, which keeps the
+    # L' => ... direction from multiplying out
+    entering, bumping = at_location_ssa_full_terms(x, y, xmin, xmax, ymin, ymax)
+    loc_next, loc, forward = state_loc_str(x, y, t + 1), state_loc_str(x, y, t), action_forward_str(t)
+    clauses = []
+    moves = []
+    for ((nx, ny), heading) in entering:
+        move = 'Aux_Move{0}_{1}_To{2}_{3}_{4}'.format(nx, ny, x, y, t)
+        literals = [state_loc_str(nx, ny, t), forward, add_time_stamp('Heading' + heading, t)]
+        clauses.extend(('~' + move, literal) for literal in literals)
+        clauses.append(tuple('~' + literal for literal in literals) + (loc_next,))
+        moves.append(move)
+    bumps = tuple(add_time_stamp('Heading' + heading, t) for heading in bumping)
+    clauses.append(('~' + loc_next,) + tuple(moves) + (loc,))
+    clauses.append(('~' + loc_next,) + tuple(moves) + ('~' + forward,) + bumps)
+    clauses.append(('~' + loc, forward, loc_next))
+    clauses.extend(('~' + loc, '~' + forward, '~' + bump, loc_next) for bump in bumps)
+    return clauses
+
+
+def generate_full_at_location_ssa_clauses(t, xmin, xmax, ymin, ymax):
+    """ The clauses of generate_full_at_location_ssa """
+    clauses = []
+    for x in range(xmin, xmax + 1):
+        for y in range(ymin, ymax + 1):
+            clauses += clause_generator_at_location_ssa_full(t, x, y, xmin, xmax, ymin, ymax)
+    return clauses
+
+
+def clause_generator_have_arrow_ssa(t):
+    return iff_and_clauses(state_have_arrow_str(t + 1),
+                           ['~' + action_shoot_str(t), state_have_arrow_str(t)])
+
+
+def clause_generator_wumpus_alive_ssa(t):
+    return iff_and_clauses(state_wumpus_alive_str(t + 1),
+                           ['~' + percept_scream_str(t + 1), state_wumpus_alive_str(t)])
+
+
+# headings in clockwise order
+headings_clockwise = ['North', 'East', 'South', 'West']
+
+def clause_generator_heading_ssa(heading, t):
+    """
+    heading := one of headings_clockwise.  The heading holds at t+1 if it
+    held at t without turning, or the agent turned into it from the
+    heading clockwise (TurnLeft) or counter-clockwise (TurnRight) of it.
+    """
+    i = headings_clockwise.index(heading)
+    heading_t = lambda h: add_time_stamp('Heading' + h, t)
+    left, right = action_turn_left_str(t), action_turn_right_str(t)
+    return iff_dnf_clauses(add_time_stamp('Heading' + heading, t + 1),
+                           [[heading_t(heading), '~' + right, '~' + left],
+                            [heading_t(headings_clockwise[(i + 1) % 4]), left],
+                            [heading_t(headings_clockwise[(i - 1) % 4]), right]])
+
+
+def generate_non_location_ssa_clauses(t):
+    """ The clauses of generate_non_location_ssa """
+    clauses = clause_generator_have_arrow_ssa(t) + clause_generator_wumpus_alive_ssa(t)
+    for heading in headings_clockwise:
+        clauses += clause_generator_heading_ssa(heading, t)
+    return clauses
+
+
+def clause_generator_heading_only(heading, t):
+    """ Heading<heading>t <=> none of the other headings hold at t """
+    return iff_and_clauses(add_time_stamp('Heading' + heading, t),
+                           ['~' + add_time_stamp('Heading' + other, t)
+                            for other in headings_clockwise if other != heading])
+
+
+def clause_generator_only_one_action_axioms(t, encoding='auto'):
+    """ Exactly one action at t: the same as each action holding iff
+    none of the others does """
+    actions = [add_time_stamp(action, t) for action in fetch_agent_action_type('Action_List')]
+    return exactly_one_clauses(actions, add_time_stamp('Aux_Action{0}_', t), encoding)
+
+
+def generate_mutually_exclusive_clauses(t, encoding='auto'):
+    """ The clauses of generate_mutually_exclusive_axioms: exactly one
+    heading at t+1 (as clause_generator_heading_only for each heading) and
+    exactly one action at t """
+    headings = [add_time_stamp('Heading' + heading, t + 1) for heading in headings_clockwise]
+    clauses = exactly_one_clauses(headings, add_time_stamp('Aux_Heading{0}_', t + 1), encoding)
+    clauses += clause_generator_only_one_action_axioms(t, encoding)
+    return clauses
+
+
+def temporal_clauses(t, x, y, width, height, heading, full_location_ssa=False,
+                     encoding='auto'):
+    """
+    The clauses of all the temporal axioms added at time t, for the
+    agent at x,y facing heading (see HybridWumpusAgent.add_temporal_axioms)
+    full_location_ssa := if True, the full at_location SSA for every
+    location rather than the one restricted to x,y and the location ahead
+    encoding := of the exactly one heading and action constraints
+    (see at_most_one_clauses)
+    """
+    clauses = generate_square_OK_clauses(t, 1, width, 1, height)
+    clauses += generate_breeze_percept_and_location_clauses(t, 1, width, 1, height)
+    clauses += generate_stench_percept_and_location_clauses(t, 1, width, 1, height)
+    if full_location_ssa:
+        clauses += generate_full_at_location_ssa_clauses(t, 1, width, 1, height)
+    else:
+        clauses += generate_at_location_ssa_clauses(t, x, y, 1, width, 1, height, heading)
+    clauses += generate_non_location_ssa_clauses(t)
+    clauses += generate_mutually_exclusive_clauses(t, encoding)
+    return clauses
+
+
+# -------------------------------------------------------------------------------
+# Temporal clause templates
+# -------------------------------------------------------------------------------
+
+class ClauseTemplate(object):
+    """
+    The clauses made by <generate>(t) (sequences of literal strings, as made
+    by the clause generators above) compiled once for any time step t:
+    symbols are numbered 1..len(bases) and the clauses are kept flat, as in
+    msat.ClauseStore, as +/- these numbers: clause i is lits[ends[i-1]:ends[i]]
+    (from 0 for i = 0).  Symbol i is bases[i-1] time stamped with t+offsets[i-1],
+    or just bases[i-1] if its offset is None (an atemporal symbol).
+    The time steps are found by generating the clauses for template_time,
+    so that only symbols about times t and t+1 are told apart.
+    symbols_at(t) gives the names of the symbols at time t, so a translator
+    can instantiate the clauses by remapping the numbers to its own ids.
+    """
+    template_time = 1000000
+
+    def __init__(self, generate):
+        t0 = self.template_time
+        stamps = [(str(t0 + 1), 1), (str(t0), 0)]
+        numbers = {}
+        self.bases = []
+        self.offsets = []
+        self.lits = array('i')
+        self.ends = array('l')
+        for clause in generate(t0):
+            lits = self.lits
+            for literal in clause:
+                name = literal.lstrip('~')
+                v = numbers.get(name)
+                if v is None:
+                    base, offset = name, None
+                    for stamp, stamp_offset in stamps:
+                        if name.endswith(stamp):
+                            base, offset = name[:-len(stamp)], stamp_offset
+                            break
+                    self.bases.append(base)
+                    self.offsets.append(offset)
+                    v = numbers[name] = len(self.bases)
+                lits.append(-v if literal[0] == '~' else v)
+            self.ends.append(len(lits))
+
+    def symbols_at(self, t):
+        return [base if offset is None else add_time_stamp(base, t + offset)
+                for base, offset in zip(self.bases, self.offsets)]
+
+    def literal_clauses(self, t):
+        """ The clauses for time t, as literal strings """
+        names = self.symbols_at(t)
+        literals = [names[v - 1] if v > 0 else '~' + names[-v - 1] for v in self.lits]
+        return [tuple(literals[start:end])
+                for start, end in zip([0] + list(self.ends[:-1]), self.ends)]
+
+    def __len__(self):
+        return len(self.ends)
+
+
+# ClauseTemplates compiled so far by temporal_clause_templates
+temporal_templates = {}
+
+def temporal_clause_templates(x, y, width, height, heading, full_location_ssa=False,
+                              encoding='auto'):
+    """
+    ClauseTemplates whose clauses at time t are those of temporal_clauses
+    (in another order): one for the axioms that depend only on the grid
+    size, and, unless full_location_ssa, one for the at_location SSA of x,y
+    and the location ahead.  Each is compiled on first use and kept in
+    temporal_templates.
+    """
+    key = ('grid', width, height, full_location_ssa, encoding)
+    if key not in temporal_templates:
+        def generate(t):
+            clauses = generate_square_OK_clauses(t, 1, width, 1, height)
+            clauses += generate_breeze_percept_and_location_clauses(t, 1, width, 1, height)
+            clauses += generate_stench_percept_and_location_clauses(t, 1, width, 1, height)
+            if full_location_ssa:
+                clauses += generate_full_at_location_ssa_clauses(t, 1, width, 1, height)
+            clauses += generate_non_location_ssa_clauses(t)
+            clauses += generate_mutually_exclusive_clauses(t, encoding)
+            return clauses
+        temporal_templates[key] = ClauseTemplate(generate)
+    templates = [temporal_templates[key]]
+    if not full_location_ssa:
+        key = ('location', x, y, width, height, heading)
+        if key not in temporal_templates:
+            temporal_templates[key] = ClauseTemplate(
+                lambda t: generate_at_location_ssa_clauses(t, x, y, 1, width, 1, height, heading))
+        templates.append(temporal_templates[key])
+    return templates
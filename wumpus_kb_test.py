@@ -1,4 +1,11 @@
 from wumpus_kb import *
+from logic import expr, to_cnf, conjuncts, prop_symbols, pl_true, dpll, associate, ExprParser
+from wumpus_benchmark import eval_expr, collect_agent_kbs, kb_from_clauses, location_queries
+from distutils.spawn import find_executable
+import itertools
+import random
+import minisat as msat
+import cdcl
 
 
 def test_axiom_generation():
@@ -83,4 +90,257 @@ def test_axiom_generation():
     print only_one_action
 
 
+def entails_clauses(num_vars, clauses, others):
+    """ True if the int literal <clauses> entail every clause of <others> """
+    solver = cdcl.Solver()
+    solver.ensure_vars(num_vars)
+    for clause in clauses:
+        solver.add_clause(list(clause))
+    return not any(solver.solve([-lit for lit in clause]) for clause in others)
+
+
+def check_clauses_equivalent(name, axioms, clauses):
+    """ Check (with SAT) that the axiom strings and the generated clauses
+    are logically equivalent """
+    if isinstance(axioms, str):
+        axioms = [axioms]
+    io = msat.AIMA_to_Dimacs_Translator()
+    for axiom in axioms:
+        io.add_clauses(conjuncts(to_cnf(expr(axiom))))
+    num_string_clauses = len(io.int_clauses)
+    io.add_literal_clauses(clauses)
+    all_clauses = list(io.int_clauses)
+    string_cnf, direct_cnf = all_clauses[:num_string_clauses], all_clauses[num_string_clauses:]
+    equivalent = (entails_clauses(io.num_vars, string_cnf, direct_cnf)
+                  and entails_clauses(io.num_vars, direct_cnf, string_cnf))
+    print '{0}: {1} clauses via to_cnf, {2} direct, equivalent: {3}'.format(
+        name, len(string_cnf), len(direct_cnf), equivalent)
+    return equivalent
+
+
+def check_clauses_extend(name, axiom, clauses):
+    """ Check (with SAT, for every assignment to the symbols of the axiom
+    string) that the clauses, which may add auxiliary symbols, are
+    satisfiable exactly when the axiom is true """
+    axiom = expr(axiom)
+    io = msat.AIMA_to_Dimacs_Translator()
+    if isinstance(clauses[0], tuple):
+        io.add_literal_clauses(clauses)
+    else:
+        io.add_clauses(clauses)
+    symbols = sorted(prop_symbols(axiom), key=repr)
+    ids = [io.symbol_id(symbol) for symbol in symbols]
+    solver = cdcl.Solver()
+    solver.ensure_vars(io.num_vars)
+    for clause in io.int_clauses:
+        solver.add_clause(list(clause))
+    extends = all(bool(pl_true(axiom, dict(zip(symbols, values))))
+                  == solver.solve([v if value else -v for v, value in zip(ids, values)])
+                  for values in itertools.product((True, False), repeat=len(symbols)))
+    print '{0}: {1} symbols, {2} clauses, {3} auxiliary, extends: {4}'.format(
+        name, len(symbols), len(io.int_clauses), len(io.aux_symbols), extends)
+    return extends
+
+
+def test_clause_generation():
+    print '\nclause generators vs. axiom generators:'
+    tvec = (True, True, False, True, False)
+    checks = [
+        ('percept_sentence', axiom_generator_percept_sentence(0, tvec),
+         clause_generator_percept_sentence(0, tvec)),
+        ('initial_location_assertions', axiom_generator_initial_location_assertions(2, 3),
+         clause_generator_initial_location_assertions(2, 3)),
+        ('pits_and_breezes', axiom_generator_pits_and_breezes(2, 3, 0, 4, 0, 4),
+         clause_generator_pits_and_breezes(2, 3, 0, 4, 0, 4)),
+        ('wumpus_and_stench', axiom_generator_wumpus_and_stench(0, 4, 0, 4, 0, 4),
+         clause_generator_wumpus_and_stench(0, 4, 0, 4, 0, 4)),
+        ('at_least_one_wumpus', axiom_generator_at_least_one_wumpus(0, 2, 0, 2),
+         clause_generator_at_least_one_wumpus(0, 2, 0, 2)),
+        ('at_most_one_wumpus', axiom_generator_at_most_one_wumpus(0, 2, 0, 2),
+         clause_generator_at_most_one_wumpus(0, 2, 0, 2)),
+        ('only_in_one_location', axiom_generator_only_in_one_location(2, 3, 0, 4, 0, 4, t=5),
+         clause_generator_only_in_one_location(2, 3, 0, 4, 0, 4, t=5)),
+        ('only_one_heading', axiom_generator_only_one_heading('east', 8),
+         clause_generator_only_one_heading('east', 8)),
+        ('have_arrow_and_wumpus_alive', axiom_generator_have_arrow_and_wumpus_alive(8),
+         clause_generator_have_arrow_and_wumpus_alive(8)),
+        ('location_OK', axiom_generator_location_OK(2, 3, 8),
+         clause_generator_location_OK(2, 3, 8)),
+        ('breeze_percept_and_location_property',
+         axiom_generator_breeze_percept_and_location_property(2, 3, 8),
+         clause_generator_breeze_percept_and_location_property(2, 3, 8)),
+        ('stench_percept_and_location_property',
+         axiom_generator_stench_percept_and_location_property(2, 3, 8),
+         clause_generator_stench_percept_and_location_property(2, 3, 8)),
+        ('at_location_ssa', axiom_generator_at_location_ssa(8, 2, 3, 0, 5, 0, 5),
+         clause_generator_at_location_ssa(8, 2, 3, 0, 5, 0, 5)),
+        ('at_location_ssa (corner)', axiom_generator_at_location_ssa(8, 0, 5, 0, 5, 0, 5),
+         clause_generator_at_location_ssa(8, 0, 5, 0, 5, 0, 5)),
+        ('have_arrow_ssa', axiom_generator_have_arrow_ssa(8), clause_generator_have_arrow_ssa(8)),
+        ('wumpus_alive_ssa', axiom_generator_wumpus_alive_ssa(8), clause_generator_wumpus_alive_ssa(8)),
+        ('heading_ssa', generate_heading_ssa(8),
+         sum([clause_generator_heading_ssa(heading, 8) for heading in headings_clockwise], [])),
+        ('heading_only_one_direction', generate_heading_only_one_direction_axioms(8),
+         sum([clause_generator_heading_only(heading, 8) for heading in headings_clockwise], [])),
+        ('only_one_action', axiom_generator_only_one_action_axioms(8),
+         clause_generator_only_one_action_axioms(8)),
+        ('initial_wumpus_axioms', initial_wumpus_axioms(1, 1, 4, 4, 'east'),
+         initial_wumpus_clauses(1, 1, 4, 4, 'east')),
+        ('initial_wumpus_axioms (5x5)', initial_wumpus_axioms(1, 1, 5, 5, 'east'),
+         initial_wumpus_clauses(1, 1, 5, 5, 'east'))]
+    for (x, y, heading) in [(1, 1, 'east'), (2, 3, 'north'), (4, 4, 'west'), (3, 1, 'south')]:
+        axioms = generate_square_OK_axioms(3, 1, 4, 1, 4)
+        axioms += generate_breeze_percept_and_location_axioms(3, 1, 4, 1, 4)
+        axioms += generate_stench_percept_and_location_axioms(3, 1, 4, 1, 4)
+        axioms += generate_at_location_ssa(3, x, y, 1, 4, 1, 4, heading)
+        axioms += generate_non_location_ssa(3)
+        axioms += generate_mutually_exclusive_axioms(3)
+        checks.append(('temporal axioms at {0},{1} heading {2}'.format(x, y, heading),
+                       axioms, temporal_clauses(3, x, y, 4, 4, heading)))
+    failed = [name for (name, axioms, clauses) in checks
+              if not check_clauses_equivalent(name, axioms, clauses)]
+    print 'not equivalent:', failed
+
+    print '\nclauses with auxiliary symbols vs. axiom generators:'
+    checks = []
+    for (x, y) in [(2, 3), (1, 1), (4, 2)]:
+        axiom = axiom_generator_at_location_ssa_full(8, x, y, 1, 4, 1, 4)
+        checks.append(('at_location_ssa_full({0},{1})'.format(x, y), axiom,
+                       clause_generator_at_location_ssa_full(8, x, y, 1, 4, 1, 4)))
+        checks.append(('to_cnf(at_location_ssa_full({0},{1}), definitional=True)'.format(x, y),
+                       axiom, conjuncts(to_cnf(axiom, definitional=True))))
+    for encoding in amo_encodings:
+        checks.append(('at_most_one_wumpus ({0})'.format(encoding),
+                       axiom_generator_at_most_one_wumpus(1, 3, 1, 3),
+                       clause_generator_at_most_one_wumpus(1, 3, 1, 3, encoding)))
+        checks.append(('only_one_action ({0})'.format(encoding),
+                       axiom_generator_only_one_action_axioms(8),
+                       clause_generator_only_one_action_axioms(8, encoding)))
+    for axiom in generate_heading_ssa(8) + [axiom_generator_location_OK(2, 3, 8)]:
+        checks.append(('to_cnf({0}..., definitional=True)'.format(axiom[:12]),
+                       axiom, conjuncts(to_cnf(axiom, definitional=True))))
+    failed = [name for (name, axiom, clauses) in checks
+              if not check_clauses_extend(name, axiom, clauses)]
+    print 'not extending:', failed
+
+    print '\ntemporal clause templates vs. temporal_clauses:'
+    failed = []
+    for (x, y, heading, full) in [(1, 1, 'east', False), (2, 3, 'north', False),
+                                  (4, 4, 'west', True)]:
+        for t in (0, 7, 12):
+            instances = sum([template.literal_clauses(t) for template
+                             in temporal_clause_templates(x, y, 4, 4, heading, full)], [])
+            if sorted(instances) != sorted(temporal_clauses(t, x, y, 4, 4, heading, full)):
+                failed.append((x, y, heading, full, t))
+    print 'different:', failed
+
+
+def test_expr_parser():
+    """ ExprParser builds the same Exprs as the eval-based expr it replaced
+    (wumpus_benchmark.eval_expr) on the axiom and query strings """
+    print '\nExprParser vs. eval on the axiom strings:'
+    strings = initial_wumpus_axioms(1, 1, 4, 4, 'east')
+    strings += initial_wumpus_axioms(2, 3, 5, 5, 'north', 'pairwise')
+    for t in (0, 8):
+        strings += generate_square_OK_axioms(t, 1, 4, 1, 4)
+        strings += generate_breeze_percept_and_location_axioms(t, 1, 4, 1, 4)
+        strings += generate_stench_percept_and_location_axioms(t, 1, 4, 1, 4)
+        strings += generate_at_location_ssa(t, 2, 3, 1, 4, 1, 4, 'west')
+        strings += generate_non_location_ssa(t)
+        strings += generate_mutually_exclusive_axioms(t)
+        strings.append(axiom_generator_at_location_ssa_full(t, 2, 3, 1, 4, 1, 4))
+        strings.append(axiom_generator_percept_sentence(t, (True, False, True, False, True)))
+        strings += [state_OK_str(x, y, t) for x in range(1, 5) for y in range(1, 5)]
+    failed = [s for s in strings
+              if ExprParser(s).parse() != eval_expr(s)
+              or repr(ExprParser(s).parse()) != repr(eval_expr(s))]
+    print '{0} strings, different:'.format(len(strings)), failed
+
+
+def test_known_literals(layout='wumpus_4x4_book', times=(0, 4, 8, 12)):
+    """ On the KBs the agent built playing <layout>, recorded without
+    ClauseIndex and KnownLiterals, a KB that drops clauses (dedup_clauses)
+    and/or answers by known literals (propagate_units) gives the same
+    ask and ask_many answers as plain ask (with no model cache) """
+    print '\nClauseIndex and KnownLiterals vs. plain ask on the KBs of {0}:'.format(layout)
+    agent, note = collect_agent_kbs(layout, dedup_clauses=False, propagate_units=False)
+    print 'agent run', note
+    failed = []
+    for t, clauses in agent.kb_snapshots:
+        if t not in times:
+            continue
+        queries = location_queries(4, 4, t) \
+                  + [expr(base + str(t)) for base in proposition_bases_state_fluents
+                     + proposition_bases_perceptual_fluents]
+        plain = kb_from_clauses(clauses, 'cdcl', model_cache_size=0)
+        answers = [plain.ask(query) for query in queries]
+        for dedup, propagate in [(True, False), (False, True), (True, True)]:
+            kb = kb_from_clauses(clauses, 'cdcl', dedup_clauses=dedup,
+                                 propagate_units=propagate)
+            batch = kb.ask_many(queries)
+            if [kb.ask(query) for query in queries] != answers \
+               or [batch[query] for query in queries] != answers:
+                failed.append((t, dedup, propagate))
+            print 't={0} dedup={1} propagate={2}: {3} clauses of {4}, {5} known answers'.format(
+                t, dedup, propagate, len(kb.clauses), len(clauses), kb.known_literal_hits)
+    print '{0} queries per KB, different:'.format(len(queries)), failed
+
+
+def random_cnf(rng, num_vars, num_clauses):
+    """ <num_clauses> random clauses of 3 int literals over <num_vars> """
+    return [[v if rng.random() < 0.5 else -v for v in rng.sample(range(1, num_vars + 1), 3)]
+            for i in range(num_clauses)]
+
+
+def test_random_cnf(seed=3, instances=60):
+    """ cdcl.Solver vs. DPLL (and minisat, if installed) on random cnfs near
+    the 3-SAT threshold: the same SAT/UNSAT answer, with and without
+    assumptions, and every model found satisfies the clauses and the
+    assumptions.  The assumption sets are solved one after another by the
+    same cdcl.Solver, so that the clauses it learns are kept across them. """
+    print '\ncdcl.Solver vs. DPLL and minisat on random cnfs (seed {0}):'.format(seed)
+    rng = random.Random(seed)
+    minisat = msat.Minisat() if find_executable('minisat') else None
+    if minisat is None:
+        print 'minisat not found, checking against DPLL only'
+    def literal(lit):
+        return expr('X{0}'.format(lit) if lit > 0 else '~X{0}'.format(-lit))
+    failed = []
+    counts = {True: 0, False: 0}
+    for i in range(instances):
+        num_vars = rng.randint(4, 12)
+        int_clauses = random_cnf(rng, num_vars, int(round(4.3 * num_vars)))
+        clauses = [associate('|', map(literal, clause)) for clause in int_clauses]
+        symbols = [expr('X{0}'.format(v)) for v in range(1, num_vars + 1)]
+        solver = cdcl.Solver()
+        solver.ensure_vars(num_vars)
+        for clause in int_clauses:
+            solver.add_clause(list(clause))
+        assumption_sets = [[]] + [[v if rng.random() < 0.5 else -v
+                                   for v in rng.sample(range(1, num_vars + 1), rng.randint(1, 3))]
+                                  for j in range(3)]
+        for assumptions in assumption_sets:
+            units = [literal(lit) for lit in assumptions]
+            sat = solver.solve(assumptions)
+            if sat and not all(any(solver.model_value(lit) for lit in clause)
+                               for clause in int_clauses + [[lit] for lit in assumptions]):
+                failed.append((i, assumptions, 'cdcl model'))
+            model = dpll(clauses + units, symbols, {})
+            if bool(model) != sat:
+                failed.append((i, assumptions, 'dpll'))
+            if minisat:
+                solution = minisat.solve_assuming(clauses, [units])[0]
+                if bool(solution.success) != sat:
+                    failed.append((i, assumptions, 'minisat'))
+                elif sat and not all(pl_true(clause, solution.varmap)
+                                     for clause in clauses + units):
+                    failed.append((i, assumptions, 'minisat model'))
+            counts[sat] += 1
+    print '{0} SAT, {1} UNSAT tests; different:'.format(counts[True], counts[False]), failed
+
+
 test_axiom_generation()
+test_clause_generation()
+test_expr_parser()
+test_known_literals()
+test_random_cnf()
@@ -0,0 +1,203 @@
+# wumpus_trace.py
+# ---------------
+# Licensing Information:
+# Please DO NOT DISTRIBUTE OR PUBLISH solutions to this project.
+# You are free to use and extend these projects for EDUCATIONAL PURPOSES ONLY.
+# The Hunt The Wumpus AI project was developed at University of Arizona
+# by Clay Morrison (clayton@sista.arizona.edu), spring 2013.
+# This project extends the python code provided by Peter Norvig as part of
+# the Artificial Intelligence: A Modern Approach (AIMA) book example code;
+# see http://aima.cs.berkeley.edu/code.html
+# In particular, the following files come directly from the AIMA python
+# code: ['agents.py', 'logic.py', 'search.py', 'utils.py']
+# ('logic.py' has been modified by Clay Morrison in locations with the
+# comment 'CTM')
+# The file ['minisat.py'] implements a slim system call wrapper to the minisat
+# (see http://minisat.se) SAT solver, and is directly based on the satispy
+# python project, see https://github.com/netom/satispy .
+
+"""
+Structured tracing of the HybridWumpusAgent loop.
+An event is a name, a level, the agent time and a set of named fields;
+a Tracer passes the events at or below its level to its sinks, which
+print them (ConsoleSink), write them as JSON lines (JSONLinesSink) or
+drop them (NullSink).  Call sites guard each event by the flag of its
+level, e.g.
+    if self.tracer.debug:
+        self.tracer.event(DEBUG, 'kb.size', self.time, clauses=len(kb.clauses))
+so a disabled level costs one attribute check, and the fields are not
+even computed.
+"""
+
+import agents
+import json
+import sys
+
+
+#-------------------------------------------------------------------------------
+
+# trace levels: info is one or two events per step (percepts, belief
+# location, plan and action), debug adds KB sizes, query results and
+# timings, trace adds the location query grids
+OFF, INFO, DEBUG, TRACE = range(4)
+trace_levels = ['off', 'info', 'debug', 'trace']
+
+def trace_level(level):
+    """ The trace level of a level name in trace_levels, or number """
+    if level in trace_levels:
+        return trace_levels.index(level)
+    if level in range(len(trace_levels)):
+        return level
+    raise Exception("Unknown trace level '{0}', expected one of: {1}".format(
+        level, ', '.join(trace_levels)))
+
+
+#-------------------------------------------------------------------------------
+
+class Proposition(agents.Thing):
+    """ Used for debugging, to display proposition in WumpusEnvironment """
+
+    def __init__(self, name, value = '?'):
+        self.name = '{0}={1}'.format(name, value)
+
+    def display(self):
+        return self.name
+
+    def to_string(self):
+        return self.name
+
+
+#-------------------------------------------------------------------------------
+
+class NullSink(object):
+    """ Drops every event """
+
+    def emit(self, level, name, t, fields):
+        pass
+
+    def grid(self, level, name, t, width, height, cells, title):
+        pass
+
+    def close(self):
+        pass
+
+
+class ConsoleSink(NullSink):
+    """
+    Prints events as lines of text, indented by level:
+        t=3     location: how=tracked, location=(2, 1), seconds=0.000651
+    and grid events as the WumpusEnvironment board, with the queried
+    proposition and its value in each cell.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, text):
+        print >>(self.stream or sys.stdout), text
+
+    def emit(self, level, name, t, fields):
+        values = ', '.join('{0}={1}'.format(key, self.format_value(fields[key]))
+                           for key in sorted(fields))
+        self.write('t={0} {1}{2}: {3}'.format(t, '  ' * level, name, values))
+
+    def grid(self, level, name, t, width, height, cells, title):
+        # imported here, as the board is only needed to print grid events
+        from wumpus_environment import WumpusEnvironment
+        display_env = WumpusEnvironment(width, height)
+        for x, y, query, value in cells:
+            display_env.add_thing(Proposition(query, '?' if value is None else value), (x,y))
+        # (to_string prints its title to stdout, so it is written here)
+        if title:
+            self.write(title)
+        self.write(display_env.to_string(t))
+
+    @staticmethod
+    def format_value(value):
+        if isinstance(value, float):
+            return '{0:.6f}'.format(value)
+        return value
+
+
+class JSONLinesSink(NullSink):
+    """
+    Writes each event as a JSON object on its own line:
+        {"event": "action", "level": "info", "t": 3, "action": "Forward"}
+    grid events with "cells", a list of [x, y, query, value].
+    out := file name or open file; a file named here is closed by close()
+    """
+
+    def __init__(self, out):
+        if isinstance(out, basestring):
+            self.stream = open(out, 'w')
+            self.owns_stream = True
+        else:
+            self.stream = out
+            self.owns_stream = False
+
+    def emit(self, level, name, t, fields):
+        record = dict(fields)
+        record.update(event=name, level=trace_levels[level], t=t)
+        self.stream.write(json.dumps(record, sort_keys=True, default=str))
+        self.stream.write('\n')
+
+    def grid(self, level, name, t, width, height, cells, title):
+        self.emit(level, name, t, {'width': width, 'height': height, 'title': title,
+                                   'cells': [[x, y, str(query), value]
+                                             for x, y, query, value in cells]})
+
+    def close(self):
+        if self.owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+#-------------------------------------------------------------------------------
+
+class Tracer(object):
+    """
+    Sends events to sinks.  info, debug and trace are True if events at
+    that level are traced; events above the tracer level are dropped.
+    level := a name in trace_levels or a level number
+    sinks := list of sinks, each with emit, grid and close (see NullSink)
+    """
+
+    def __init__(self, level=OFF, sinks=()):
+        self.sinks = list(sinks)
+        self.set_level(level)
+
+    def set_level(self, level):
+        self.level = trace_level(level)
+        self.info = self.level >= INFO
+        self.debug = self.level >= DEBUG
+        self.trace = self.level >= TRACE
+
+    def event(self, level, name, t=None, **fields):
+        if level > self.level:
+            return
+        for sink in self.sinks:
+            sink.emit(level, name, t, fields)
+
+    def grid(self, level, name, t, width, height, cells, title=None):
+        """ An event for the values of a query at the locations of a grid
+        cells := list of (x, y, query, value) """
+        if level > self.level:
+            return
+        for sink in self.sinks:
+            sink.grid(level, name, t, width, height, cells, title)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __repr__(self):
+        return '<Tracer {0} -> {1}>'.format(trace_levels[self.level],
+                                            ', '.join(sink.__class__.__name__
+                                                      for sink in self.sinks))
+
+# traces nothing
+null_tracer = Tracer(OFF)
+
+def console_tracer(level=TRACE, stream=None):
+    return Tracer(level, [ConsoleSink(stream)])